@@ -300,6 +300,11 @@ try {
             throw new Exception('Failed to save cropped image');
         }
 
+        if ($extension === 'webp') {
+            // Journal the change for image.php until image_manifest.py folds it into images/manifest.bin
+            file_put_contents("{$basePath}/images/manifest.pending", "put {$type} {$id}\n", FILE_APPEND | LOCK_EX);
+        }
+
         send_response(true, 'Image cropped successfully', [
             'path' => "/images/{$type}/{$folder}/{$id}.{$extension}",
             'dimensions' => [
@@ -135,6 +135,9 @@ try {
         ]);
     }
 
+    // Journal the change for image.php until image_manifest.py folds it into images/manifest.bin
+    file_put_contents("{$basePath}/images/manifest.pending", "del {$type} {$id}\n", FILE_APPEND | LOCK_EX);
+
     // Check if folder is empty and delete if it is
     $folderPath = dirname($targetFile);
     if (is_dir($folderPath) && count(glob("$folderPath/*")) === 0) {
@@ -202,16 +202,118 @@ function set_image_headers($cache = false) {
     }
 }
 
+/**
+ * Image manifest written by python_pricechartingscraper/image_manifest.py
+ *
+ * Answers existence checks from one read of images/manifest.bin (sorted ID
+ * arrays, binary searched) plus the manifest.pending journal of uploads and
+ * deletes since it was built, instead of a file_exists() per candidate path.
+ * Without a manifest, or with a pending journal grown past
+ * IMAGE_MANIFEST_MAX_PENDING bytes (the indexer isn't running), every check
+ * falls back to the filesystem. Once the manifest is older than
+ * IMAGE_MANIFEST_TTL seconds a miss is checked on the filesystem too, for
+ * images written by other tools since the last run.
+ */
+const IMAGE_MANIFEST_TTL = 3600;
+const IMAGE_MANIFEST_MAX_PENDING = 65536;
+
+function load_image_manifest($base_path) {
+    // The journal being folded in by a running indexer, then the one taking new lines
+    $journals = ["{$base_path}/images/manifest.pending.taken", "{$base_path}/images/manifest.pending"];
+    $journal_size = 0;
+    foreach ($journals as $file) {
+        $journal_size += (int)@filesize($file);
+    }
+    if ($journal_size > IMAGE_MANIFEST_MAX_PENDING) {
+        return null;
+    }
+    // Journals before the manifest: the indexer writes the manifest before dropping the taken journal
+    $lines = [];
+    foreach ($journals as $file) {
+        $lines = array_merge($lines, @file($file, FILE_IGNORE_NEW_LINES | FILE_SKIP_EMPTY_LINES) ?: []);
+    }
+    $data = @file_get_contents("{$base_path}/images/manifest.bin");
+    if ($data === false || strlen($data) < 24) {
+        return null;
+    }
+    $header = unpack('a4magic/Vformat/Vgenerated/Vflags/Vproducts/Vinventory', $data);
+    if ($header['magic'] !== 'IMGM' || $header['format'] !== 1
+        || strlen($data) !== 24 + 8 * ($header['products'] + $header['inventory'])) {
+        return null;
+    }
+    $manifest = [
+        'data' => $data,
+        'placeholder' => ($header['flags'] & 1) === 1,
+        'stale' => time() - $header['generated'] > IMAGE_MANIFEST_TTL,
+        'sections' => [
+            'product' => [24, $header['products']],
+            'inventory' => [24 + 8 * $header['products'], $header['inventory']]
+        ],
+        'pending' => []
+    ];
+    foreach ($lines as $line) {
+        $parts = explode(' ', trim($line));
+        if (count($parts) === 3 && isset($manifest['sections'][$parts[1]])) {
+            $manifest['pending']["{$parts[1]}/{$parts[2]}"] = $parts[0] === 'put';
+        }
+    }
+    return $manifest;
+}
+
+function manifest_has_image($manifest, $type, $id) {
+    if (isset($manifest['pending']["{$type}/{$id}"])) {
+        return $manifest['pending']["{$type}/{$id}"];
+    }
+    [$offset, $count] = $manifest['sections'][$type];
+    $id = (int)$id;
+    $low = 0;
+    $high = $count - 1;
+    while ($low <= $high) {
+        $middle = ($low + $high) >> 1;
+        $value = unpack('V', $manifest['data'], $offset + 4 * $middle)[1];
+        if ($value === $id) {
+            return true;
+        }
+        if ($value < $id) {
+            $low = $middle + 1;
+        } else {
+            $high = $middle - 1;
+        }
+    }
+    return false;
+}
+
+$imageManifest = load_image_manifest($base_path);
+
+function image_exists($path) {
+    global $imageManifest;
+    if ($imageManifest !== null) {
+        if (preg_match('#/images/(product|inventory)/\d+/(\d+)\.webp$#', $path, $match)) {
+            if (manifest_has_image($imageManifest, $match[1], $match[2])) {
+                return true;
+            }
+            // Journaled deletes are final, other misses only while the manifest is fresh
+            if (!$imageManifest['stale'] || isset($imageManifest['pending']["{$match[1]}/{$match[2]}"])) {
+                return false;
+            }
+        }
+        if (substr($path, -strlen('/images/placeholder.webp')) === '/images/placeholder.webp') {
+            return $imageManifest['placeholder'];
+        }
+    }
+    return file_exists($path);
+}
+
 // Unified image serving logic
 function serve_file($path, $check) {
     global $debugMode;
     
     if ($check) {
-        http_response_code(file_exists($path) ? 200 : 204);
+        http_response_code(image_exists($path) ? 200 : 204);
         exit;
     }
     
-    if (file_exists($path)) {
+    if (image_exists($path) && is_readable($path)) {
         set_image_headers(true);
         readfile($path);
         exit;
@@ -319,6 +319,10 @@ try {
 
     // Get the file extension from the actual saved file
     $extension = pathinfo($targetFile, PATHINFO_EXTENSION);
+    if ($extension === 'webp') {
+        // Journal the change for image.php until image_manifest.py folds it into images/manifest.bin
+        file_put_contents("{$basePath}/images/manifest.pending", "put {$type} {$id}\n", FILE_APPEND | LOCK_EX);
+    }
     send_response(true, 'Image uploaded successfully', [
         'path' => "/images/{$type}/{$folder}/{$id}.{$extension}",
         'size' => filesize($targetFile)
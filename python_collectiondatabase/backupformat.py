@@ -0,0 +1,126 @@
+import gzip
+import json
+from datetime import datetime
+
+# Data section encodings understood by databasebackup.py
+#   insert - one INSERT statement per row (works everywhere, largest and slowest)
+#   batch  - multi-row INSERT statements of BATCH_SIZE rows
+#   copy   - COPY ... FROM stdin blocks (psql only, smallest and fastest to load)
+DATA_FORMATS = ['insert', 'batch', 'copy']
+BATCH_SIZE = 500
+
+# Column types whose values are written as JSON text, whatever the API returned
+JSON_TYPES = ('json', 'jsonb')
+
+# File suffix appended to the backup file for each compression method
+COMPRESSION_SUFFIXES = {
+    'none': '',
+    'gzip': '.gz',
+    'zstd': '.zst'
+}
+
+def _pg_array_element(v):
+    if v is None:
+        return 'NULL'
+    if isinstance(v, list):
+        return _pg_array_literal(v)
+    if isinstance(v, dict):
+        v = json.dumps(v)
+    escaped = str(v).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{escaped}"'
+
+def _pg_array_literal(arr):
+    # Postgres array input syntax, e.g. {"5030917054035","5030917054036"}.
+    # Unlike ARRAY[...] it gets its element type from the target column, so
+    # empty arrays and enum arrays round-trip without explicit casts.
+    return '{' + ','.join(_pg_array_element(x) for x in arr) + '}'
+
+def _encode_value(v, column_type=None):
+    # The API returns json/jsonb values as plain Python values, so a jsonb
+    # list, string or number looks like an array, text or numeric column.
+    # With the column type known the encoding follows the column instead.
+    if v is None:
+        return None
+    if column_type in JSON_TYPES:
+        return json.dumps(v)
+    if isinstance(v, dict):
+        return json.dumps(v)
+    if isinstance(v, list):
+        # Array columns (ean_gtin, asin, epid, product_groups, ...)
+        return _pg_array_literal(v)
+    return v
+
+def format_sql_value(v, column_type=None):
+    v = _encode_value(v, column_type)
+    if isinstance(v, (str, datetime)):
+        # Use double quotes to avoid escaping issues
+        escaped = str(v).replace("'", "''")
+        return f"'{escaped}'"
+    if v is None:
+        return 'NULL'
+    return str(v)
+
+def format_copy_value(v, column_type=None):
+    # Value in COPY text format: tab separated, \N for NULL, backslash escapes
+    v = _encode_value(v, column_type)
+    if v is None:
+        return '\\N'
+    if isinstance(v, bool):
+        return 't' if v else 'f'
+    return (str(v)
+            .replace('\\', '\\\\')
+            .replace('\t', '\\t')
+            .replace('\n', '\\n')
+            .replace('\r', '\\r'))
+
+def write_insert_rows(f, table, rows, column_types=None):
+    column_types = column_types or {}
+    for row in rows:
+        columns = ', '.join(row.keys())
+        values = ', '.join(
+            format_sql_value(v, column_types.get(c)) for c, v in row.items()
+        )
+        f.write(f"INSERT INTO {table} ({columns}) VALUES ({values});\n")
+
+def write_batch_rows(f, table, rows, batch_size=BATCH_SIZE, column_types=None):
+    column_types = column_types or {}
+    columns = ', '.join(rows[0].keys())
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        values = ',\n'.join(
+            '(' + ', '.join(format_sql_value(v, column_types.get(c)) for c, v in row.items()) + ')'
+            for row in batch
+        )
+        f.write(f"INSERT INTO {table} ({columns}) VALUES\n{values};\n")
+
+def write_copy_rows(f, table, rows, column_types=None):
+    column_types = column_types or {}
+    columns = ', '.join(rows[0].keys())
+    f.write(f"COPY {table} ({columns}) FROM stdin;\n")
+    for row in rows:
+        f.write('\t'.join(format_copy_value(v, column_types.get(c)) for c, v in row.items()) + '\n')
+    f.write("\\.\n")
+
+def write_table_rows(f, table, rows, data_format='insert', column_types=None):
+    # column_types maps column name to its Postgres type (see get_column_types
+    # in databasebackup.py), without it values are encoded by their Python type
+    if not rows:
+        return
+    if data_format == 'batch':
+        write_batch_rows(f, table, rows, column_types=column_types)
+    elif data_format == 'copy':
+        write_copy_rows(f, table, rows, column_types)
+    else:
+        write_insert_rows(f, table, rows, column_types)
+
+def open_backup_file(path, mode='r', newline=None):
+    # Open a backup for streaming text I/O, picking the codec from the suffix
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', newline=newline)
+    if path.endswith('.zst'):
+        try:
+            import zstandard # type: ignore
+        except ImportError:
+            raise Exception("zstd compression requires the 'zstandard' package (pip install zstandard)")
+        return zstandard.open(path, mode + 't', encoding='utf-8', newline=newline)
+    return open(path, mode, encoding='utf-8', newline=newline)
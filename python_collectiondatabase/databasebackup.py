@@ -1,7 +1,58 @@
 from dotenv import load_dotenv # type: ignore
 import os
 from supabase import create_client # type: ignore
+import argparse
+import json
+import re
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from dumpstore import add_snapshot
+from backupformat import (
+    DATA_FORMATS, COMPRESSION_SUFFIXES, format_sql_value, open_backup_file,
+    write_table_rows
+)
+
+# Number of RPCs / table reads allowed in flight at once
+MAX_WORKERS = 8
+
+# PostgREST caps every select at 1000 rows, larger tables are read in pages
+PAGE_SIZE = 1000
+
+# Incremental backup state: high-water marks, key sets and the increment chain
+STATE_FILE = './dumps/incremental.json'
+
+# Tables whose changes can be found through a timestamp column. Every other
+# table is small and copied in full by each incremental backup.
+INCREMENTAL_COLUMNS = {
+    'products': 'products_updated_at',
+    'inventory': 'inventory_updated_at',
+    'product_prices': 'updated_at',
+    'products_history': 'changed_at',
+    'inventory_history': 'changed_at',
+    'currency_rates': 'updated_at',
+    'site_settings': 'last_updated',
+    'product_tag_relationships': 'created_at',
+    'inventory_tag_relationships': 'created_at'
+}
+
+# Tables whose rows are rewritten in place without touching their timestamp
+# column when another table changes: update_all_product_prices reprices every
+# product_prices row on a currency_rates change but keeps updated_at, and
+# increments are replayed with triggers off. When the source table has
+# changed rows the dependent table is copied in full.
+REPRICED_TABLES = {
+    'product_prices': 'currency_rates'
+}
+
+# Rendered function/index/trigger/view DDL keyed by catalog fingerprints
+CATALOG_CACHE_FILE = './dumps/catalog_cache.json'
+
+# Columns identifying a row, used to detect deletes (default: id)
+KEY_COLUMNS = {
+    'product_tag_relationships': ['product_id', 'tag_id'],
+    'inventory_tag_relationships': ['inventory_id', 'tag_id'],
+    'site_settings': ['key']
+}
 
 def read_credentials():
     load_dotenv('../.env')
@@ -12,16 +63,45 @@ def read_credentials():
         'supabase_key': os.getenv('VITE_SUPABASE_ANON_KEY')
     }
 
-def format_sql_value(v):
-    if isinstance(v, (str, datetime)):
-        # Use double quotes to avoid escaping issues
-        escaped = str(v).replace("'", "''")
-        return f"'{escaped}'"
-    if v is None:
-        return 'NULL'
-    return str(v)
+# information_schema data_type values that are not valid in DDL, the real
+# type is only in column_type (format_type(), see sql/get_all_table_schemas.sql)
+PLACEHOLDER_TYPES = ('ARRAY', 'USER-DEFINED')
+
+def build_create_table_sql(table, columns):
+    # Build CREATE TABLE statement manually
+    column_defs = []
+    
+    for col in columns:
+        # Skip debug info if column_name is None
+        if col['column_name'] is None:
+            continue
+            
+        # Build column definition, format_type() already includes lengths
+        if col.get('column_type'):
+            column_def = f"{col['column_name']} {col['column_type']}"
+        else:
+            if col['data_type'] in PLACEHOLDER_TYPES:
+                print(f"Warning: {table}.{col['column_name']} is {col['data_type']}, install "
+                      f"sql/get_all_table_schemas.sql for restorable DDL")
+            column_def = f"{col['column_name']} {col['data_type']}"
+            if col['character_maximum_length']:
+                column_def += f"({col['character_maximum_length']})"
+            
+        if col['is_nullable'] == 'NO':
+            column_def += " NOT NULL"
+            
+        if col['column_default']:
+            column_def += f" DEFAULT {col['column_default']}"
+            
+        column_defs.append(column_def)
+    
+    create_stmt = f"CREATE TABLE {table} (\n  " + \
+                  ",\n  ".join(column_defs) + \
+                  "\n);"
+    
+    return create_stmt
 
-def get_schema_sql(supabase, table):
+def get_schema_columns(supabase, table):
     # Call the stored procedure
     result = supabase.rpc(
         'get_table_schema',
@@ -41,33 +121,55 @@ def get_schema_sql(supabase, table):
     if result.data[0]['column_name'] is None:
         raise Exception(f"Table error: {result.data[0]['debug_info']}")
     
-    # Build CREATE TABLE statement manually
-    columns = []
-    
-    for col in result.data:
-        # Skip debug info if column_name is None
-        if col['column_name'] is None:
-            continue
-            
-        # Build column definition
-        column_def = f"{col['column_name']} {col['data_type']}"
-        
-        if col['character_maximum_length']:
-            column_def += f"({col['character_maximum_length']})"
-            
-        if col['is_nullable'] == 'NO':
-            column_def += " NOT NULL"
-            
-        if col['column_default']:
-            column_def += f" DEFAULT {col['column_default']}"
-            
-        columns.append(column_def)
-    
-    create_stmt = f"CREATE TABLE {table} (\n  " + \
-                  ",\n  ".join(columns) + \
-                  "\n);"
-    
-    return create_stmt
+    return result.data
+
+def get_all_table_columns(supabase, tables, executor):
+    # Fetch the columns of every table in one get_all_table_schemas() round trip
+    # (see sql/get_all_table_schemas.sql). Falls back to concurrent per-table
+    # get_table_schema() calls when the batched function is not installed.
+    try:
+        result = supabase.rpc('get_all_table_schemas').execute()
+    except Exception as e:
+        print(f"\nBatched schema call unavailable ({e}), falling back to per-table calls")
+        futures = {table: executor.submit(get_schema_columns, supabase, table) for table in tables}
+        return {table: future.result() for table, future in futures.items()}
+
+    # Rows are ordered by table and ordinal position, group them per table
+    columns_by_table = {}
+    for col in result.data or []:
+        columns_by_table.setdefault(col['table_name'], []).append(col)
+
+    print(f"\nFetched schema for {len(columns_by_table)} tables in one call")
+
+    for table in tables:
+        if table not in columns_by_table:
+            raise Exception(f"No schema information found for table {table}")
+    return {table: columns_by_table[table] for table in tables}
+
+def get_column_types(table_columns):
+    # {table: {column: type}}, picks the data encoding of json and array columns
+    return {
+        table: {col['column_name']: col.get('column_type') or col['data_type'] for col in columns if col['column_name']}
+        for table, columns in table_columns.items()
+    }
+
+def get_type_sql(supabase):
+    # CREATE TYPE statements for the enums used by column types and defaults,
+    # from get_enum_types() (see sql/get_enum_types.sql)
+    try:
+        result = supabase.rpc('get_enum_types').execute()
+    except Exception as e:
+        print(f"\nWarning: Enum types unavailable ({e}), install sql/get_enum_types.sql for restorable DDL")
+        return ""
+
+    print("\nFound types:")
+    sql_statements = []
+    for enum in result.data or []:
+        print(f"- {enum['type_name']}")
+        labels = ', '.join(format_sql_value(label) for label in enum['labels'])
+        sql_statements.append(f"DROP TYPE IF EXISTS {enum['type_name']} CASCADE;")
+        sql_statements.append(f"CREATE TYPE {enum['type_name']} AS ENUM ({labels});")
+    return "\n".join(sql_statements)
 
 def list_available_tables(supabase):
     result = supabase.rpc('list_all_tables').execute()
@@ -186,46 +288,365 @@ def get_view_sql(supabase):
     
     return "\n\n".join(sql_statements)
 
+# Catalog object types and the RPC based renderer of their backup section
+CATALOG_SECTIONS = {
+    'function': get_function_sql,
+    'index': get_index_sql,
+    'trigger': get_trigger_sql,
+    'view': get_view_sql
+}
+
+def get_catalog_fingerprints(supabase):
+    # {object_type: {object_name: md5 of definition}} from one
+    # get_catalog_fingerprints() call (see sql/get_catalog_fingerprints.sql),
+    # or None when the function is not installed
+    try:
+        result = supabase.rpc('get_catalog_fingerprints').execute()
+    except Exception as e:
+        print(f"\nCatalog fingerprints unavailable ({e}), fetching all definitions")
+        return None
+    fingerprints = {object_type: {} for object_type in CATALOG_SECTIONS}
+    for obj in result.data or []:
+        fingerprints.setdefault(obj['object_type'], {})[obj['object_name']] = obj['fingerprint']
+    return fingerprints
+
+def load_catalog_cache():
+    if not os.path.exists(CATALOG_CACHE_FILE):
+        return {}
+    try:
+        with open(CATALOG_CACHE_FILE, 'r') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"Warning: Ignoring unreadable catalog cache: {e}")
+        return {}
+
+def save_catalog_cache(cache):
+    tmp_file = CATALOG_CACHE_FILE + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp_file, CATALOG_CACHE_FILE)
+
+def get_catalog_sql(supabase, executor, use_cache=True):
+    # Returns {object_type: rendered section}. Sections whose fingerprints match
+    # the cache are reused as is; only types with new, changed or dropped objects
+    # are re-fetched, each with a single bulk RPC.
+    fingerprints = get_catalog_fingerprints(supabase)
+    cache = load_catalog_cache() if use_cache else {}
+
+    sections = {}
+    futures = {}
+    for object_type, fetch in CATALOG_SECTIONS.items():
+        cached = cache.get(object_type)
+        if fingerprints is not None and cached and cached['fingerprints'] == fingerprints[object_type]:
+            sections[object_type] = cached['sql']
+        else:
+            futures[object_type] = executor.submit(fetch, supabase)
+
+    reused = [object_type for object_type in CATALOG_SECTIONS if object_type in sections]
+    if reused:
+        print(f"\nReusing cached definitions for: {', '.join(reused)}")
+
+    for object_type, future in futures.items():
+        sections[object_type] = future.result()
+
+    if fingerprints is not None:
+        save_catalog_cache({
+            object_type: {'fingerprints': fingerprints[object_type], 'sql': sections[object_type]}
+            for object_type in CATALOG_SECTIONS
+        })
+    return sections
+
+def fetch_all_rows(build_query):
+    # build_query() must return a fresh query builder for every page, ordered
+    # by a unique key (see order_by_key) so pages neither skip nor repeat rows
+    rows = []
+    while True:
+        page = build_query().range(len(rows), len(rows) + PAGE_SIZE - 1).execute().data
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+
+def get_key_columns(table):
+    return KEY_COLUMNS.get(table, ['id'])
+
+def order_by_key(query, table):
+    for col in get_key_columns(table):
+        query = query.order(col)
+    return query
+
+def get_table_data(supabase, table):
+    return fetch_all_rows(lambda: order_by_key(supabase.table(table).select('*'), table))
+
+def row_key(table, row):
+    return [row[col] for col in get_key_columns(table)]
+
+def count_rows(supabase, table):
+    return supabase.table(table).select(get_key_columns(table)[0], count='exact').limit(1).execute().count
+
+def get_table_keys(supabase, table):
+    # Only the key columns, so finding deleted rows stays cheap. Returns None
+    # when the row count moved while paging: a key missing from an incomplete
+    # set would otherwise be written out as a delete.
+    columns = ','.join(get_key_columns(table))
+    before = count_rows(supabase, table)
+    rows = fetch_all_rows(lambda: order_by_key(supabase.table(table).select(columns), table))
+    after = count_rows(supabase, table)
+    if not before == after == len(rows):
+        print(f"Warning: {table} changed while reading its keys ({before} before, {len(rows)} read, {after} after), "
+              f"skipping its deletes this run")
+        return None
+    return [row_key(table, row) for row in rows]
+
+def get_changed_rows(supabase, table, since):
+    column = INCREMENTAL_COLUMNS[table]
+    if since is None:
+        return get_table_data(supabase, table)
+    # gte rather than gt: rows sharing the high-water timestamp are re-sent,
+    # the increment deletes and re-inserts changed keys so that is harmless
+    return fetch_all_rows(
+        lambda: order_by_key(supabase.table(table).select('*').gte(column, since).order(column), table)
+    )
+
+def parse_timestamp(value):
+    # Postgres trims trailing zeros from fractional seconds, which
+    # datetime.fromisoformat() only accepts from Python 3.11 on
+    value = re.sub(r'\.(\d+)', lambda m: '.' + m.group(1).ljust(6, '0')[:6], value)
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+def get_high_water_mark(table, rows, previous=None):
+    column = INCREMENTAL_COLUMNS[table]
+    marks = [row[column] for row in rows if row.get(column)]
+    if previous:
+        marks.append(previous)
+    if not marks:
+        return None
+    return max(marks, key=parse_timestamp)
+
+def has_changes(table, rows, previous_keys, current_keys, since):
+    # get_changed_rows re-sends rows at the high-water mark, only later ones are changes
+    if previous_keys - current_keys:
+        return True
+    column = INCREMENTAL_COLUMNS[table]
+    if since is None:
+        return bool(rows)
+    since = parse_timestamp(since)
+    return any(row.get(column) and parse_timestamp(row[column]) > since for row in rows)
+
+def format_key_condition(table, keys):
+    columns = get_key_columns(table)
+    values = [', '.join(format_sql_value(v) for v in key) for key in keys]
+    if len(columns) == 1:
+        return f"{columns[0]} IN ({', '.join(values)})"
+    return f"({', '.join(columns)}) IN ({', '.join(f'({v})' for v in values)})"
+
+def build_state(tables, table_data, base_file):
+    # State after a full backup: everything up to now is in base_file
+    state = {
+        'base': os.path.abspath(base_file),
+        'created_at': datetime.now().isoformat(),
+        'tables': tables,
+        'increments': [],
+        'high_water': {},
+        'keys': {}
+    }
+    for table in tables:
+        if table in INCREMENTAL_COLUMNS:
+            rows = table_data[table]
+            state['high_water'][table] = get_high_water_mark(table, rows)
+            state['keys'][table] = [row_key(table, row) for row in rows]
+    return state
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return None
+    with open(STATE_FILE, 'r') as f:
+        return json.load(f)
+
+def save_state(state):
+    tmp_file = STATE_FILE + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_file, STATE_FILE)
+
+def incremental_backup(supabase, data_format, suffix):
+    state = load_state()
+    if not state:
+        raise Exception(f"No incremental state in {STATE_FILE}, run a full backup first")
+
+    tables = state['tables']
+    current_tables = [
+        table['table_name']
+        for table in list_available_tables(supabase)
+        if table['schema_name'] == 'public' and table['table_type'] == 'BASE TABLE'
+    ]
+    if sorted(current_tables) != sorted(tables):
+        raise Exception("Table list changed since the base backup, run a full backup first")
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        columns_future = executor.submit(get_all_table_columns, supabase, tables, executor)
+        row_futures = {}
+        key_futures = {}
+        for table in tables:
+            if table in INCREMENTAL_COLUMNS:
+                since = state['high_water'].get(table)
+                row_futures[table] = executor.submit(get_changed_rows, supabase, table, since)
+                key_futures[table] = executor.submit(get_table_keys, supabase, table)
+            else:
+                row_futures[table] = executor.submit(get_table_data, supabase, table)
+        table_rows = {table: future.result() for table, future in row_futures.items()}
+        table_keys = {table: future.result() for table, future in key_futures.items()}
+        column_types = get_column_types(columns_future.result())
+
+        for table, keys in table_keys.items():
+            if keys is None:
+                # No deletes without a trustworthy key set, keep every key known so far
+                known = {tuple(key) for key in state['keys'].get(table, [])}
+                known |= {tuple(row_key(table, row)) for row in table_rows[table]}
+                table_keys[table] = [list(key) for key in known]
+
+        # Repriced rows keep their timestamp, so they are only caught by a full copy
+        full_copies = set()
+        for table, source in REPRICED_TABLES.items():
+            if table in tables and source in tables and has_changes(
+                source, table_rows[source],
+                {tuple(key) for key in state['keys'].get(source, [])},
+                {tuple(key) for key in table_keys[source]},
+                state['high_water'].get(source)
+            ):
+                table_rows[table] = get_table_data(supabase, table)
+                full_copies.add(table)
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    increment_file = f'./dumps/incr.{timestamp}.sql{suffix}'
+    changed_rows = 0
+    deleted_rows = 0
+
+    with open_backup_file(increment_file, 'w') as f:
+        f.write(f"-- Incremental backup created at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write(f"-- Base: {state['base']}\n\n")
+        f.write("BEGIN;\n\n")
+        # Replaying rows must not fire history/timestamp/price triggers again
+        f.write("SET session_replication_role = replica;\n\n")
+
+        for table in tables:
+            rows = table_rows[table]
+            if table not in INCREMENTAL_COLUMNS or table in full_copies:
+                reason = f" (repriced after a {REPRICED_TABLES[table]} change)" if table in full_copies else ''
+                f.write(f"\n-- Full copy of {table}{reason}\n")
+                f.write(f"DELETE FROM {table};\n")
+                write_table_rows(f, table, rows, data_format, column_types[table])
+                if table in full_copies:
+                    changed_rows += len(rows)
+                    state['high_water'][table] = get_high_water_mark(table, rows, state['high_water'].get(table))
+                    state['keys'][table] = [row_key(table, row) for row in rows]
+                continue
+
+            previous_keys = {tuple(key) for key in state['keys'].get(table, [])}
+            current_keys = {tuple(key) for key in table_keys[table]}
+            deleted = previous_keys - current_keys
+            changed = {tuple(row_key(table, row)) for row in rows}
+            if not rows and not deleted:
+                continue
+
+            f.write(f"\n-- Changes for {table} ({len(rows)} changed, {len(deleted)} deleted)\n")
+            stale = sorted(deleted | changed, key=str)
+            if stale:
+                f.write(f"DELETE FROM {table} WHERE {format_key_condition(table, stale)};\n")
+            write_table_rows(f, table, rows, data_format, column_types[table])
+
+            changed_rows += len(rows)
+            deleted_rows += len(deleted)
+            state['high_water'][table] = get_high_water_mark(table, rows, state['high_water'].get(table))
+            state['keys'][table] = [list(key) for key in current_keys]
+
+        f.write("\nSET session_replication_role = DEFAULT;\n")
+        f.write("\nCOMMIT;\n")
+
+    state['increments'].append(os.path.abspath(increment_file))
+    save_state(state)
+    print(f"Incremental backup created: {increment_file} ({changed_rows} changed rows, {deleted_rows} deleted rows)")
+
 def main():
+    parser = argparse.ArgumentParser(description='Backup the Supabase database to ../db.sql')
+    parser.add_argument('--data-format', choices=DATA_FORMATS, default='insert',
+                        help='Encoding of the table data section (copy requires restoring with psql)')
+    parser.add_argument('--compress', choices=list(COMPRESSION_SUFFIXES), default='none',
+                        help='Compress the backup while writing it')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only export rows changed since the last backup into ./dumps/incr.<timestamp>.sql')
+    parser.add_argument('--refresh-catalog', action='store_true',
+                        help='Ignore the catalog cache and re-fetch all functions, indexes, triggers and views')
+    args = parser.parse_args()
+
     # Create dumps directory if it doesn't exist
     os.makedirs('./dumps', exist_ok=True)
     
+    suffix = COMPRESSION_SUFFIXES[args.compress]
+    creds = read_credentials()
+    supabase = create_client(creds['supabase_url'], creds['supabase_key'])
+
+    if args.incremental:
+        incremental_backup(supabase, args.data_format, suffix)
+        return
+
     # Define the main backup file path
-    main_backup_file = '../db.sql'
+    main_backup_file = '../db.sql' + suffix
     
-    # If the main backup file exists, copy it to dumps with timestamp
+    # If the main backup file exists, archive it in the dumps store with timestamp
     if os.path.exists(main_backup_file):
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_copy = f'./dumps/db.{timestamp}.sql'
-        os.system(f'cp "{main_backup_file}" "{backup_copy}"')
-        print(f"Previous backup copied to: {backup_copy}")
+        add_snapshot(main_backup_file)
 
-    creds = read_credentials()
-    supabase = create_client(creds['supabase_url'], creds['supabase_key'])
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        # Catalog RPCs don't depend on the table list, start them right away
+        catalog_future = executor.submit(get_catalog_sql, supabase, executor, not args.refresh_catalog)
+        type_future = executor.submit(get_type_sql, supabase)
 
-    # First, let's see what tables are actually available
-    available_tables = list_available_tables(supabase)
-    
-    # Filter for only public schema tables that are BASE TABLE type
-    tables = [
-        table['table_name'] 
-        for table in available_tables 
-        if table['schema_name'] == 'public' and table['table_type'] == 'BASE TABLE'
-    ]
-    
-    print("\nTables to backup:")
-    print(tables)
+        # First, let's see what tables are actually available
+        available_tables = list_available_tables(supabase)
+        
+        # Filter for only public schema tables that are BASE TABLE type
+        tables = [
+            table['table_name'] 
+            for table in available_tables 
+            if table['schema_name'] == 'public' and table['table_type'] == 'BASE TABLE'
+        ]
+        
+        print("\nTables to backup:")
+        print(tables)
+
+        # Table reads run concurrently with the schema fetch
+        data_futures = {table: executor.submit(get_table_data, supabase, table) for table in tables}
+        table_columns = get_all_table_columns(supabase, tables, executor)
+        schemas = {table: build_create_table_sql(table, table_columns[table]) for table in tables}
+        column_types = get_column_types(table_columns)
 
-    with open(main_backup_file, 'w') as f:
+        # Wait for everything before touching the backup file, so a failed
+        # request never leaves a half written db.sql behind
+        catalog_sql = catalog_future.result()
+        function_sql = catalog_sql['function']
+        index_sql = catalog_sql['index']
+        trigger_sql = catalog_sql['trigger']
+        view_sql = catalog_sql['view']
+        type_sql = type_future.result()
+        table_data = {table: future.result() for table, future in data_futures.items()}
+
+    # Assemble the sections in restore order
+    with open_backup_file(main_backup_file, 'w') as f:
         # Write header
         f.write("-- Backup created at " + datetime.now().strftime('%Y-%m-%d %H:%M:%S') + "\n\n")
         f.write("BEGIN;\n\n")
 
-        # First, handle functions
+        # Enum types first, function signatures and table columns use them
+        f.write("-- ============================\n")
+        f.write("-- TYPES\n")
+        f.write("-- ============================\n")
+        if type_sql:
+            f.write(type_sql + "\n\n")
+
+        # Then functions
         f.write("-- ============================\n")
         f.write("-- FUNCTIONS\n")
         f.write("-- ============================\n")
-        function_sql = get_function_sql(supabase)
         if function_sql:
             f.write(function_sql + "\n\n")
 
@@ -242,14 +663,12 @@ def main():
         f.write("-- CREATE TABLES\n")
         f.write("-- ============================\n")
         for table in tables:
-            schema_sql = get_schema_sql(supabase, table)
-            f.write(f"{schema_sql}\n\n")
+            f.write(f"{schemas[table]}\n\n")
 
         # Create indexes (after tables are created and before data is inserted)
         f.write("-- ============================\n")
         f.write("-- INDEXES\n")
         f.write("-- ============================\n")
-        index_sql = get_index_sql(supabase)
         if index_sql:
             f.write(index_sql + "\n\n")
 
@@ -257,7 +676,6 @@ def main():
         f.write("-- ============================\n")
         f.write("-- TRIGGERS\n")
         f.write("-- ============================\n")
-        trigger_sql = get_trigger_sql(supabase)
         if trigger_sql:
             f.write(trigger_sql + "\n\n")
 
@@ -266,26 +684,23 @@ def main():
         f.write("-- TABLE DATA\n")
         f.write("-- ============================\n")
         for table in tables:
-            data = supabase.table(table).select('*').execute()
-            if data.data:
+            rows = table_data[table]
+            if rows:
                 f.write(f"\n-- Data for {table}\n")
-                for row in data.data:
-                    columns = ', '.join(row.keys())
-                    values = ', '.join(
-                        format_sql_value(v) for v in row.values()
-                    )
-                    f.write(f"INSERT INTO {table} ({columns}) VALUES ({values});\n")
+                write_table_rows(f, table, rows, args.data_format, column_types[table])
 
         # Create views (after all tables and data are created)
         f.write("\n-- ============================\n")
         f.write("-- VIEWS\n")
         f.write("-- ============================\n")
-        view_sql = get_view_sql(supabase)
         if view_sql:
             f.write(view_sql + "\n\n")
 
         f.write("\nCOMMIT;\n")
 
+    # The new full backup is the base for following incremental backups
+    save_state(build_state(tables, table_data, main_backup_file))
+
     print(f"Backup created: {main_backup_file}")
 
 if __name__ == "__main__":
@@ -0,0 +1,189 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import zlib
+from datetime import datetime, timedelta
+from backupformat import open_backup_file
+
+# Deduplicating archive of old backups:
+#   dumps/store/chunks/<2 hex>/<sha256>   zlib compressed chunk
+#   dumps/store/snapshots/<name>.json     manifest listing the chunks of a snapshot
+STORE_DIR = './dumps/store'
+
+# Backups are line oriented SQL, so chunk boundaries are picked on line ends:
+# a line whose hash matches BOUNDARY_MASK ends a chunk. An edit therefore only
+# changes the chunks around it, and the rest of the snapshot stays shared.
+MIN_CHUNK_SIZE = 16 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024
+BOUNDARY_MASK = 0xFF
+
+def iter_chunks(lines):
+    chunk = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= MAX_CHUNK_SIZE or (
+            size >= MIN_CHUNK_SIZE and zlib.crc32(line) & BOUNDARY_MASK == 0
+        ):
+            yield b''.join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield b''.join(chunk)
+
+def _chunk_path(store_dir, digest):
+    return os.path.join(store_dir, 'chunks', digest[:2], digest)
+
+def _snapshot_path(store_dir, name):
+    return os.path.join(store_dir, 'snapshots', f"{name}.json")
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def add_snapshot(backup_file, name=None, store_dir=STORE_DIR):
+    if name is None:
+        name = datetime.now().strftime('%Y%m%d_%H%M%S')
+    if os.path.exists(_snapshot_path(store_dir, name)):
+        raise Exception(f"Snapshot {name} already exists")
+
+    digests = []
+    total_size = 0
+    new_chunks = 0
+    file_hash = hashlib.sha256()
+    # Compressed backups are stored decompressed, compressed data doesn't dedupe.
+    # newline='' keeps the CRLFs inside function bodies byte for byte.
+    with open_backup_file(backup_file, 'r', newline='') as f:
+        lines = (line.encode('utf-8') for line in f)
+        for chunk in iter_chunks(lines):
+            digest = hashlib.sha256(chunk).hexdigest()
+            path = _chunk_path(store_dir, digest)
+            if not os.path.exists(path):
+                _write_atomic(path, zlib.compress(chunk, 6))
+                new_chunks += 1
+            digests.append(digest)
+            total_size += len(chunk)
+            file_hash.update(chunk)
+
+    manifest = {
+        'name': name,
+        'created_at': datetime.now().isoformat(),
+        'source': os.path.abspath(backup_file),
+        'size': total_size,
+        'sha256': file_hash.hexdigest(),
+        'chunks': digests
+    }
+    _write_atomic(_snapshot_path(store_dir, name), json.dumps(manifest).encode('utf-8'))
+    print(f"Stored snapshot {name}: {len(digests)} chunks, {new_chunks} new")
+    return manifest
+
+def load_snapshots(store_dir=STORE_DIR):
+    snapshot_dir = os.path.join(store_dir, 'snapshots')
+    if not os.path.isdir(snapshot_dir):
+        return []
+    snapshots = []
+    for file_name in os.listdir(snapshot_dir):
+        if file_name.endswith('.json'):
+            with open(os.path.join(snapshot_dir, file_name), 'r') as f:
+                snapshots.append(json.load(f))
+    return sorted(snapshots, key=lambda s: s['created_at'])
+
+def list_snapshots(store_dir=STORE_DIR):
+    snapshots = load_snapshots(store_dir)
+    for snapshot in snapshots:
+        print(f"{snapshot['name']}  {snapshot['created_at']}  {snapshot['size']} bytes  {len(snapshot['chunks'])} chunks")
+    return snapshots
+
+def materialise_snapshot(name, output_file, store_dir=STORE_DIR):
+    snapshot_file = _snapshot_path(store_dir, name)
+    if not os.path.exists(snapshot_file):
+        raise Exception(f"Snapshot {name} not found")
+    with open(snapshot_file, 'r') as f:
+        manifest = json.load(f)
+
+    file_hash = hashlib.sha256()
+    with open(output_file, 'wb') as out:
+        for digest in manifest['chunks']:
+            with open(_chunk_path(store_dir, digest), 'rb') as f:
+                chunk = zlib.decompress(f.read())
+            file_hash.update(chunk)
+            out.write(chunk)
+    if file_hash.hexdigest() != manifest['sha256']:
+        raise Exception(f"Checksum mismatch while materialising snapshot {name}")
+    print(f"Snapshot {name} written to {output_file}")
+
+def prune_snapshots(keep_last=None, older_than_days=None, store_dir=STORE_DIR):
+    # Drop matching snapshot manifests, then every chunk no manifest references
+    snapshots = load_snapshots(store_dir)
+    doomed = set()
+    if keep_last is not None:
+        doomed.update(s['name'] for s in snapshots[:max(len(snapshots) - keep_last, 0)])
+    if older_than_days is not None:
+        cutoff = (datetime.now() - timedelta(days=older_than_days)).isoformat()
+        doomed.update(s['name'] for s in snapshots if s['created_at'] < cutoff)
+
+    for name in doomed:
+        os.remove(_snapshot_path(store_dir, name))
+
+    referenced = {
+        digest
+        for snapshot in snapshots if snapshot['name'] not in doomed
+        for digest in snapshot['chunks']
+    }
+    removed_chunks = 0
+    freed = 0
+    chunk_dir = os.path.join(store_dir, 'chunks')
+    if os.path.isdir(chunk_dir):
+        for prefix in os.listdir(chunk_dir):
+            for digest in os.listdir(os.path.join(chunk_dir, prefix)):
+                if digest not in referenced:
+                    path = os.path.join(chunk_dir, prefix, digest)
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+                    removed_chunks += 1
+    print(f"Pruned {len(doomed)} snapshots and {removed_chunks} chunks ({freed} bytes)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Deduplicating archive of database backups')
+    parser.add_argument('--store', default=STORE_DIR, help='Store directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add_parser = commands.add_parser('add', help='Add a backup file as a new snapshot')
+    add_parser.add_argument('file')
+    add_parser.add_argument('--name', help='Snapshot name (default: current timestamp)')
+
+    commands.add_parser('list', help='List snapshots')
+
+    materialise_parser = commands.add_parser('materialise', help='Write a snapshot back out as a .sql file')
+    materialise_parser.add_argument('name')
+    materialise_parser.add_argument('output')
+
+    prune_parser = commands.add_parser('prune', help='Delete old snapshots and unreferenced chunks')
+    prune_parser.add_argument('--keep-last', type=int, help='Keep only the newest N snapshots')
+    prune_parser.add_argument('--older-than', type=int, metavar='DAYS', help='Delete snapshots older than DAYS')
+
+    args = parser.parse_args()
+    try:
+        if args.command == 'add':
+            add_snapshot(args.file, args.name, args.store)
+        elif args.command == 'list':
+            list_snapshots(args.store)
+        elif args.command == 'materialise':
+            materialise_snapshot(args.name, args.output, args.store)
+        elif args.command == 'prune':
+            if args.keep_last is None and args.older_than is None:
+                parser.error("prune needs --keep-last and/or --older-than")
+            prune_snapshots(args.keep_last, args.older_than, args.store)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from backupformat import open_backup_file
+
+# Written by databasebackup.py, lists the base backup and its increments
+STATE_FILE = './dumps/incremental.json'
+
+# Parallel psql sessions used by the fast restore
+DEFAULT_JOBS = 4
+
+SECTION_RE = re.compile(r'^-- =+\r?\n-- ([A-Z ]+)\r?\n-- =+\r?\n', re.M)
+TABLE_DATA_RE = re.compile(r'^-- Data for (\w+)\r?\n', re.M)
+CREATE_TABLE_RE = re.compile(r'^CREATE TABLE (\w+) \((.*?)\n\);', re.M | re.S)
+SEQUENCE_COLUMN_RE = re.compile(r"^\s*(\w+) .*nextval\('([^']+)'::regclass\)", re.M)
+INDEX_TABLE_RE = re.compile(r'\bON (?:\w+\.)?(\w+) USING\b')
+# information_schema placeholders written instead of the column type by older backups
+PLACEHOLDER_COLUMN_RE = re.compile(r'^\s*(\w+) (ARRAY|USER-DEFINED)\b', re.M)
+ENUM_CAST_RE = re.compile(r"'::(\w+)\b")
+CREATE_TYPE_RE = re.compile(r'^CREATE TYPE (\w+) AS ENUM\b', re.M)
+BUILTIN_CASTS = {'text', 'regclass', 'character', 'jsonb', 'json', 'date', 'numeric', 'integer', 'bigint',
+                 'boolean', 'uuid', 'timestamp', 'time', 'interval', 'bytea'}
+
+def run_psql_file(database_url, backup_file):
+    # Stream the (possibly compressed) backup into psql, stop on the first error
+    print(f"Restoring {backup_file}")
+    process = subprocess.Popen(
+        ['psql', '--quiet', '-v', 'ON_ERROR_STOP=1', '-d', database_url],
+        stdin=subprocess.PIPE, text=True, encoding='utf-8'
+    )
+    try:
+        with open_backup_file(backup_file, 'r', newline='') as f:
+            shutil.copyfileobj(f, process.stdin)
+        process.stdin.close()
+    except BrokenPipeError:
+        pass
+    if process.wait() != 0:
+        raise Exception(f"psql failed while restoring {backup_file}")
+
+def run_psql(database_url, sql):
+    result = subprocess.run(
+        ['psql', '--quiet', '-v', 'ON_ERROR_STOP=1', '-d', database_url],
+        input=sql, text=True, encoding='utf-8', capture_output=True
+    )
+    if result.returncode != 0:
+        raise Exception(f"psql failed: {result.stderr.strip()}")
+
+def split_sections(backup_sql):
+    # {section name: body} for the sections written by databasebackup.main()
+    sections = {}
+    matches = list(SECTION_RE.finditer(backup_sql))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(backup_sql)
+        sections[match.group(1).strip()] = backup_sql[match.end():end]
+    # The closing COMMIT of the backup ends up in the last section
+    for name, body in sections.items():
+        sections[name] = re.sub(r'\n\s*COMMIT;\s*$', '\n', body)
+    return sections
+
+def split_table_data(data_sql):
+    tables = {}
+    matches = list(TABLE_DATA_RE.finditer(data_sql))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(data_sql)
+        tables[match.group(1)] = data_sql[match.end():end]
+    return tables
+
+def get_sequences(create_sql):
+    # [(sequence, table, column)] for every nextval() column default
+    sequences = []
+    for table_match in CREATE_TABLE_RE.finditer(create_sql):
+        for column_match in SEQUENCE_COLUMN_RE.finditer(table_match.group(2)):
+            sequences.append((column_match.group(2), table_match.group(1), column_match.group(1)))
+    return sequences
+
+def split_indexes(index_sql):
+    indexes = {}
+    for statement in index_sql.splitlines():
+        match = INDEX_TABLE_RE.search(statement)
+        if match:
+            indexes.setdefault(match.group(1), []).append(statement)
+    return indexes
+
+def check_backup(sections):
+    # Problems that make the CREATE TABLES section fail: placeholder column
+    # types and enum types used in defaults without a CREATE TYPE
+    create_sql = sections.get('CREATE TABLES', '')
+    problems = []
+    for table_match in CREATE_TABLE_RE.finditer(create_sql):
+        for column_match in PLACEHOLDER_COLUMN_RE.finditer(table_match.group(2)):
+            problems.append(f"{table_match.group(1)}.{column_match.group(1)} has no real type ({column_match.group(2)})")
+    created = set(CREATE_TYPE_RE.findall(sections.get('TYPES', '')))
+    for type_name in sorted(set(ENUM_CAST_RE.findall(create_sql)) - created - BUILTIN_CASTS):
+        problems.append(f"type {type_name} is used but never created")
+    return problems
+
+def check_backup_file(backup_file):
+    with open_backup_file(backup_file, 'r', newline='') as f:
+        problems = check_backup(split_sections(f.read()))
+    if problems:
+        raise Exception(f"{backup_file} cannot be restored, take a new full backup with sql/get_all_table_schemas.sql "
+                        f"and sql/get_enum_types.sql installed:\n  " + '\n  '.join(problems))
+    print(f"{backup_file}: table definitions OK")
+
+def fast_restore(database_url, backup_file, jobs=DEFAULT_JOBS):
+    # Restore a full backup with the expensive work deferred: tables are created
+    # bare, every table is loaded in its own session with triggers suppressed,
+    # and only then are indexes (per table, in parallel), functions, triggers and
+    # views created. Functions come before triggers because CREATE TRIGGER needs
+    # the trigger function to exist. Needs a superuser for session_replication_role.
+    with open_backup_file(backup_file, 'r', newline='') as f:
+        sections = split_sections(f.read())
+    missing = [name for name in ('FUNCTIONS', 'DROP TABLES', 'CREATE TABLES', 'TABLE DATA')
+               if name not in sections]
+    if missing:
+        raise Exception(f"{backup_file} is not a full backup (missing sections: {', '.join(missing)})")
+    problems = check_backup(sections)
+    if problems:
+        raise Exception(f"{backup_file} cannot be restored:\n  " + '\n  '.join(problems))
+
+    sequences = get_sequences(sections['CREATE TABLES'])
+    table_data = split_table_data(sections['TABLE DATA'])
+    indexes = split_indexes(sections.get('INDEXES', ''))
+    timings = []
+
+    def phase(name, action):
+        print(f"{name}...")
+        start = time.perf_counter()
+        action()
+        timings.append((name, time.perf_counter() - start))
+
+    def run_parallel(statements_by_table):
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(run_psql, database_url, sql) for sql in statements_by_table.values()]
+            for future in futures:
+                future.result()
+
+    create_sequences = ''.join(f"CREATE SEQUENCE IF NOT EXISTS {seq};\n" for seq, _, _ in sequences)
+    phase('Tables', lambda: run_psql(
+        database_url,
+        "BEGIN;\n" + sections.get('TYPES', '') + sections['DROP TABLES'] + create_sequences
+        + sections['CREATE TABLES'] + "COMMIT;\n"
+    ))
+
+    # replica role skips user triggers for the whole load session
+    phase('Data', lambda: run_parallel({
+        table: "SET session_replication_role = replica;\nBEGIN;\n" + sql + "COMMIT;\n"
+        for table, sql in table_data.items()
+    }))
+
+    phase('Indexes', lambda: run_parallel({
+        table: '\n'.join(statements) + '\n' for table, statements in indexes.items()
+    }))
+
+    reset_sequences = ''.join(
+        f"SELECT setval('{seq}', COALESCE((SELECT MAX({column}) FROM {table}), 0) + 1, false);\n"
+        for seq, table, column in sequences
+    )
+    phase('Functions', lambda: run_psql(database_url, sections['FUNCTIONS']))
+    phase('Triggers', lambda: run_psql(database_url, sections.get('TRIGGERS', '')))
+    phase('Views', lambda: run_psql(database_url, sections.get('VIEWS', '')))
+    phase('Sequences and statistics', lambda: run_psql(database_url, reset_sequences + "ANALYZE;\n"))
+
+    print("\nRestore timings:")
+    for name, seconds in timings:
+        print(f"  {name:<26} {seconds:8.2f}s")
+    print(f"  {'Total':<26} {sum(seconds for _, seconds in timings):8.2f}s")
+    return timings
+
+def get_backup_chain(state_file):
+    with open(state_file, 'r') as f:
+        state = json.load(f)
+    return [state['base']] + state['increments']
+
+# Increments are replayed with triggers off (session_replication_role =
+# replica), so a replayed currency_rates change does not reprice
+# product_prices here. databasebackup.py copies product_prices in full into
+# any increment with a currency_rates change, so the chain still restores
+# the repriced price_nok/price_nok_fixed values.
+def replay(database_url, backup_files):
+    for backup_file in backup_files:
+        if not os.path.exists(backup_file):
+            raise Exception(f"Backup file not found: {backup_file}")
+    for backup_file in backup_files:
+        run_psql_file(database_url, backup_file)
+    print(f"Restored {len(backup_files)} backup file(s)")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Restore a base backup followed by its incremental backups',
+        epilog='Increments replay rows with triggers off. Repricing after a currency_rates change is restored '
+               'from the full product_prices copy in that increment. For older increments without it, reprice '
+               'by hand after the restore: UPDATE currency_rates SET rate = rate (fires update_all_product_prices).'
+    )
+    parser.add_argument('database_url', nargs='?', help='Target database, e.g. postgresql://postgres@localhost/collection')
+    parser.add_argument('files', nargs='*',
+                        help='Backup files to replay in order (default: base and increments from the state file)')
+    parser.add_argument('--state', default=STATE_FILE, help='Incremental state file written by databasebackup.py')
+    parser.add_argument('--fast', action='store_true',
+                        help='Load the base backup with deferred indexes/triggers and parallel table loads')
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS, help='Parallel sessions for --fast')
+    parser.add_argument('--check', metavar='BACKUP',
+                        help='Only check that the table definitions of a full backup (e.g. ../db.sql) can be restored')
+    args = parser.parse_args()
+    if not args.check and not args.database_url:
+        parser.error('database_url is required unless --check is given')
+
+    try:
+        if args.check:
+            check_backup_file(args.check)
+            return 0
+        backup_files = args.files or get_backup_chain(args.state)
+        if args.fast:
+            # The base goes through the optimised plan, increments are replayed as is
+            fast_restore(args.database_url, backup_files[0], args.jobs)
+            backup_files = backup_files[1:]
+        else:
+            # Fail before psql runs half of a base backup with broken table definitions
+            check_backup_file(backup_files[0])
+        replay(args.database_url, backup_files)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+-- Batched variant of get_table_schema(): returns the columns of every public
+-- base table in a single call, used by databasebackup.get_all_schema_sql().
+-- Install once in the Supabase SQL editor.
+--
+-- column_type is the full type from format_type() (text[], numeric(10,2),
+-- tag_display_type, ...); information_schema's data_type only says ARRAY or
+-- USER-DEFINED for array and enum columns, which is not valid DDL.
+
+DROP FUNCTION IF EXISTS get_all_table_schemas() CASCADE;
+
+CREATE OR REPLACE FUNCTION get_all_table_schemas()
+RETURNS TABLE(table_name text, column_name text, data_type text, column_type text, is_nullable text, column_default text, character_maximum_length numeric)
+LANGUAGE plpgsql
+SECURITY DEFINER
+VOLATILE AS
+$function$
+
+BEGIN
+    RETURN QUERY
+    SELECT
+        c.table_name::text,
+        c.column_name::text,
+        c.data_type::text,
+        format_type(a.atttypid, a.atttypmod)::text,
+        c.is_nullable::text,
+        c.column_default::text,
+        c.character_maximum_length::numeric
+    FROM information_schema.columns c
+    JOIN information_schema.tables t
+        ON t.table_schema = c.table_schema
+        AND t.table_name = c.table_name
+    JOIN pg_catalog.pg_attribute a
+        ON a.attrelid = format('%I.%I', c.table_schema, c.table_name)::regclass
+        AND a.attname = c.column_name
+    WHERE c.table_schema = 'public'
+    AND t.table_type = 'BASE TABLE'
+    ORDER BY c.table_name, c.ordinal_position;
+END;
+
+$function$;
+
+GRANT EXECUTE ON FUNCTION get_all_table_schemas() TO authenticated;
+
+GRANT EXECUTE ON FUNCTION get_all_table_schemas() TO anon;
+
+GRANT EXECUTE ON FUNCTION get_all_table_schemas() TO service_role;
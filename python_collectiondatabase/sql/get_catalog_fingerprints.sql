@@ -0,0 +1,55 @@
+-- Returns an md5 fingerprint of every function, index, trigger and view
+-- definition in the public schema, used by databasebackup.get_catalog_sql()
+-- to skip re-fetching catalog sections that have not changed.
+-- Install once in the Supabase SQL editor.
+
+DROP FUNCTION IF EXISTS get_catalog_fingerprints() CASCADE;
+
+CREATE OR REPLACE FUNCTION get_catalog_fingerprints()
+RETURNS TABLE(object_type text, object_name text, fingerprint text)
+LANGUAGE plpgsql
+SECURITY DEFINER
+VOLATILE AS
+$function$
+
+BEGIN
+    RETURN QUERY
+    SELECT 'function'::text,
+        (p.proname || '(' || pg_get_function_identity_arguments(p.oid) || ')')::text,
+        md5(pg_get_functiondef(p.oid))::text
+    FROM pg_proc p
+    JOIN pg_namespace n ON n.oid = p.pronamespace
+    WHERE n.nspname = 'public'
+    AND p.prokind = 'f'
+    UNION ALL
+    SELECT 'index'::text,
+        i.indexname::text,
+        md5(i.indexdef)::text
+    FROM pg_indexes i
+    WHERE i.schemaname = 'public'
+    UNION ALL
+    SELECT 'trigger'::text,
+        (tg.tgname || ' ON ' || cl.relname)::text,
+        md5(pg_get_triggerdef(tg.oid))::text
+    FROM pg_trigger tg
+    JOIN pg_class cl ON cl.oid = tg.tgrelid
+    JOIN pg_namespace n ON n.oid = cl.relnamespace
+    WHERE n.nspname = 'public'
+    AND NOT tg.tgisinternal
+    UNION ALL
+    SELECT 'view'::text,
+        v.viewname::text,
+        md5(pg_get_viewdef(c.oid, true))::text
+    FROM pg_catalog.pg_views v
+    JOIN pg_catalog.pg_class c ON c.relname = v.viewname
+    WHERE v.schemaname = 'public'
+    ORDER BY 1, 2;
+END;
+
+$function$;
+
+GRANT EXECUTE ON FUNCTION get_catalog_fingerprints() TO authenticated;
+
+GRANT EXECUTE ON FUNCTION get_catalog_fingerprints() TO anon;
+
+GRANT EXECUTE ON FUNCTION get_catalog_fingerprints() TO service_role;
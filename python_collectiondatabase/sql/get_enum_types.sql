@@ -0,0 +1,33 @@
+-- Enum types of the public schema with their labels in sort order, used by
+-- databasebackup.get_type_sql() to write the TYPES section of a backup.
+-- Install once in the Supabase SQL editor.
+
+DROP FUNCTION IF EXISTS get_enum_types() CASCADE;
+
+CREATE OR REPLACE FUNCTION get_enum_types()
+RETURNS TABLE(type_name text, labels text[])
+LANGUAGE plpgsql
+SECURITY DEFINER
+VOLATILE AS
+$function$
+
+BEGIN
+    RETURN QUERY
+    SELECT
+        t.typname::text,
+        array_agg(e.enumlabel::text ORDER BY e.enumsortorder)
+    FROM pg_type t
+    JOIN pg_enum e ON e.enumtypid = t.oid
+    JOIN pg_namespace n ON n.oid = t.typnamespace
+    WHERE n.nspname = 'public'
+    GROUP BY t.typname
+    ORDER BY t.typname;
+END;
+
+$function$;
+
+GRANT EXECUTE ON FUNCTION get_enum_types() TO authenticated;
+
+GRANT EXECUTE ON FUNCTION get_enum_types() TO anon;
+
+GRANT EXECUTE ON FUNCTION get_enum_types() TO service_role;
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Offline parse benchmarks over the fixture corpus in benchmarks/fixtures/
+
+Measures operations per second and peak traced memory of the page
+parsing hot paths, without any network access:
+
+    python benchmarks/bench_parse.py --output results.json
+    python benchmarks/bench_parse.py --compare results.json
+
+Results are JSON so runs before and after a change can be compared.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import bs4
+from bs4 import BeautifulSoup
+from src.config import Config
+from src.date_normalizer import DateNormalizer
+from src.scraper import PriceChartingScraper
+from src.utils.validators import clean_price, validate_page
+
+FIXTURE_DIR = Path(__file__).parent / 'fixtures'
+
+# Inputs of the string-level benchmarks, as they appear on product pages
+PRICE_INPUTS = ['$12.34', '$1,234.56', '-', 'N/A', '  $0.99 ', '$45.00', '', '$7']
+TITLE_INPUTS = ['halo 3', 'call of duty black ops', 'the legend of zelda: twilight princess',
+                'tom clancy\'s rainbow six vegas 2', 'FIFA 12', 'kinect sports season two']
+DATE_INPUTS = ['November 16, 2010', '2010', 'September 25, 2007', 'November 2010', 'TBA', 'Nov 7, 2006']
+
+def load_corpus() -> List[Dict]:
+    with open(FIXTURE_DIR / 'corpus.json', 'r', encoding='utf-8') as f:
+        corpus = json.load(f)
+    for page in corpus:
+        page['html'] = (FIXTURE_DIR / page['file']).read_text(encoding='utf-8')
+    return corpus
+
+def measure(run_once: Callable[[], float], min_time: float, repeat: int) -> Dict:
+    """
+    Time run_once (which returns the seconds it spent on the measured
+    operations) until min_time has passed, repeat times, and keep the best
+    round. Memory is measured in a separate round under tracemalloc: the
+    peak of traced memory during the round and what is still allocated after.
+    """
+    rounds = []
+    for _ in range(repeat):
+        spent = 0.0
+        iterations = 0
+        while spent < min_time:
+            spent += run_once()
+            iterations += 1
+        rounds.append(spent / iterations)
+    best = min(rounds)
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    run_once()
+    _, peak = tracemalloc.get_traced_memory()
+    # Soup trees are reference cycles, only count what survives a collection
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'seconds_per_round': best,
+        'rounds_per_second': 1 / best if best else None,
+        'round_seconds_all': rounds,
+        'peak_bytes': peak - before,
+        'retained_bytes': max(after - before, 0)
+    }
+
+def timed(func: Callable, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def bench_html_parse(corpus):
+    def run_once():
+        return sum(timed(BeautifulSoup, page['html'], 'html.parser') for page in corpus)
+    return run_once
+
+def bench_validate_page(corpus):
+    soups = [(BeautifulSoup(page['html'], 'html.parser'), page['id']) for page in corpus]
+    def run_once():
+        return sum(timed(validate_page, soup, game_id) for soup, game_id in soups)
+    return run_once
+
+def bench_parse_game_data(corpus, scraper):
+    # _parse_game_data modifies the soup (it extracts the platform link), so
+    # every call gets a fresh tree built outside of the measured time
+    pages = [page for page in corpus if page['valid']]
+    def run_once():
+        spent = 0.0
+        for page in pages:
+            soup = BeautifulSoup(page['html'], 'html.parser')
+            spent += timed(scraper._parse_game_data, soup, page['id'], False)
+        return spent
+    return run_once
+
+def bench_strings(func: Callable, inputs: List[str]):
+    def run_once():
+        start = time.perf_counter()
+        for value in inputs:
+            func(value)
+        return time.perf_counter() - start
+    return run_once
+
+def bench_normalize_date_uncached():
+    # Empty the memo before every round so the parsing itself is measured, not only the LRU
+    measure_strings = bench_strings(DateNormalizer.normalize_date, DATE_INPUTS)
+    def run_once():
+        DateNormalizer._cache.clear()
+        return measure_strings()
+    return run_once
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent).stdout.strip()
+    except OSError:
+        return ''
+
+def run_benchmarks(min_time: float, repeat: int, only: List[str]) -> Dict:
+    corpus = load_corpus()
+    scraper = PriceChartingScraper(Config())
+    valid_pages = sum(1 for page in corpus if page['valid'])
+
+    # name: (benchmark, operations per round, unit)
+    benchmarks = {
+        'html_parse': (bench_html_parse(corpus), len(corpus), 'pages'),
+        'validate_page': (bench_validate_page(corpus), len(corpus), 'pages'),
+        '_parse_game_data': (bench_parse_game_data(corpus, scraper), valid_pages, 'pages'),
+        '_propercase': (bench_strings(scraper._propercase, TITLE_INPUTS), len(TITLE_INPUTS), 'calls'),
+        'clean_price': (bench_strings(clean_price, PRICE_INPUTS), len(PRICE_INPUTS), 'calls'),
+        'normalize_date': (bench_strings(DateNormalizer.normalize_date, DATE_INPUTS), len(DATE_INPUTS), 'calls'),
+        'normalize_date_uncached': (bench_normalize_date_uncached(), len(DATE_INPUTS), 'calls'),
+    }
+
+    results = {}
+    for name, (run_once, operations, unit) in benchmarks.items():
+        if only and name not in only:
+            continue
+        result = measure(run_once, min_time, repeat)
+        result['operations_per_round'] = operations
+        result['unit'] = unit
+        result[f'{unit}_per_second'] = operations / result['seconds_per_round']
+        results[name] = result
+        print(f"{name:24} {result[f'{unit}_per_second']:>12,.0f} {unit}/s  "
+              f"{result['peak_bytes']:>12,} B peak  {result['retained_bytes']:>8,} B retained", file=sys.stderr)
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'bs4': bs4.__version__,
+        'corpus': [{'name': page['name'], 'bytes': len(page['html'].encode('utf-8'))} for page in corpus],
+        'min_time': min_time,
+        'repeat': repeat,
+        'results': results
+    }
+
+def compare(baseline: Dict, current: Dict):
+    """Print the throughput and allocation change of every benchmark against a baseline run"""
+    print(f"Baseline {baseline.get('git_revision')} ({baseline.get('timestamp')}) -> "
+          f"current {current.get('git_revision')} ({current.get('timestamp')})", file=sys.stderr)
+    for name, result in current['results'].items():
+        old = baseline['results'].get(name)
+        if not old:
+            continue
+        speed = old['seconds_per_round'] / result['seconds_per_round']
+        memory = (result['peak_bytes'] / old['peak_bytes'] - 1) * 100 if old['peak_bytes'] else 0.0
+        print(f"{name:24} {speed:6.2f}x throughput  {memory:+7.1f}% peak memory", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline parse benchmarks over the fixture corpus')
+    parser.add_argument('--output', type=str, help='Write the results as JSON to this file (default: stdout)')
+    parser.add_argument('--compare', type=str, help='Results JSON of an earlier run to compare against')
+    parser.add_argument('--min-time', type=float, default=0.5, help='Minimum seconds per measured round')
+    parser.add_argument('--repeat', type=int, default=5, help='Rounds per benchmark, the best one counts')
+    parser.add_argument('--only', nargs='*', default=[], help='Run only these benchmarks')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.min_time, args.repeat, args.only)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), results)
+
+if __name__ == '__main__':
+    main()
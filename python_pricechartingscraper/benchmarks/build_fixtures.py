@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Builds the product page corpus in benchmarks/fixtures/
+
+The pages reproduce the markup the scraper reads from PriceCharting product
+pages (chart_title, full-prices, attribute table, Variants row, the
+VGPC.product script) plus the navigation, sales history and script noise
+that makes up most of a real page. The output is deterministic and
+committed, rerun this only to change the corpus.
+"""
+
+import json
+import random
+from pathlib import Path
+
+FIXTURE_DIR = Path(__file__).parent / 'fixtures'
+
+PRICE_LABELS = ['Loose', 'Item & Box', 'Item & Manual', 'Complete', 'New',
+                'Graded CIB', 'Graded New', 'Box Only', 'Manual Only']
+
+CONSOLES = {
+    'NTSC': ('xbox-360', 'Xbox 360'),
+    'PAL': ('pal-xbox-360', 'PAL Xbox 360'),
+    'NTSC-J': ('jp-xbox-360', 'JP Xbox 360'),
+}
+
+def header(title: str) -> str:
+    menu = '\n'.join(
+        f'<li><a href="/category/{slug}">{slug.replace("-", " ").title()}</a></li>'
+        for slug in ['video-games', 'trading-cards', 'comics', 'coins', 'funko-pops', 'lego-sets',
+                     'pokemon-cards', 'magic-cards', 'sports-cards', 'collectibles']
+    )
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title} Prices | Compare Loose, CIB &amp; New Prices</title>
+<link rel="stylesheet" href="/css/main.css?v=1735">
+<script src="/js/jquery.min.js"></script>
+<script>window.dataLayer = window.dataLayer || []; function gtag(){{dataLayer.push(arguments);}} gtag('js', new Date());</script>
+"""  + '\n'.join(f'<meta name="x-filler-{i}" content="{"m" * 40}">' for i in range(20)) + f"""
+</head>
+<body>
+<div id="header"><ul class="menu">
+{menu}
+</ul></div>
+"""
+
+def sales_history(rng: random.Random, rows: int) -> str:
+    lines = ['<div id="completed-auctions-used"><table class="hoverable-rows sortable"><tbody>']
+    for i in range(rows):
+        lines.append(
+            f'<tr id="ebay-{rng.randrange(10**11, 10**12)}"><td class="date">2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}</td>'
+            f'<td class="title"><a href="https://www.ebay.com/itm/{rng.randrange(10**11, 10**12)}">Listing {i} '
+            f'{"game disc case manual tested" * rng.randint(1, 3)}</a></td>'
+            f'<td class="numeric"><span class="js-price">${rng.uniform(1, 200):.2f}</span></td></tr>'
+        )
+    lines.append('</tbody></table></div>')
+    return '\n'.join(lines)
+
+def prices_table(prices: dict) -> str:
+    rows = '\n'.join(
+        f'<tr><td>{label}</td><td class="price js-price">{prices.get(label, "-")}</td></tr>'
+        for label in PRICE_LABELS
+    )
+    return f'<div id="full-prices"><table>\n{rows}\n</table></div>'
+
+def attribute_table(details: dict, variants: list) -> str:
+    rows = []
+    for title, value in details.items():
+        if title == 'PriceCharting ID':
+            rows.append(f'<tr><td class="title">{title}:</td><td class="details" itemprop="sku">{value}</td></tr>')
+        else:
+            rows.append(f'<tr><td class="title">{title}:</td><td class="details">{value}</td></tr>')
+    if variants:
+        links = ', '.join(f'<a href="/game/{slug}/{variant_id}">{name}</a>' for variant_id, slug, name in variants)
+        rows.append(f'<tr><td>Variants:</td><td>{links}</td></tr>')
+    return '<table id="attribute">\n' + '\n'.join(rows) + '\n</table>'
+
+def product_page(rng: random.Random, game_id: int, region: str, title: str, prices: dict,
+                 details: dict, variants: list = (), script_id: int = None, sales_rows: int = 150) -> str:
+    slug, console = CONSOLES[region]
+    url_title = title.lower().replace(' ', '-').replace('[', '').replace(']', '')
+    details = {'PriceCharting ID': game_id, **details}
+    return header(f"{title} {console}") + f"""
+<div id="game-page">
+<link rel="canonical" href="https://www.pricecharting.com/game/{slug}/{url_title}">
+<h1 id="product_name" class="chart_title">{title} <a href="/console/{slug}">{console}</a></h1>
+{prices_table(prices)}
+<div class="extra"><a href="https://storage.googleapis.com/images.pricecharting.com/{rng.getrandbits(64):016x}/1600.jpg"><img src="/images/cover.jpg"></a></div>
+{attribute_table(details, list(variants))}
+{sales_history(rng, sales_rows)}
+</div>
+<script>
+VGPC.product = {{
+    id: {game_id if script_id is None else script_id},
+    name: "{title}",
+    console: "{console}"
+}};
+VGPC.chart_data = {{"used": [{', '.join(f'[{1262304000000 + i * 2592000000},{rng.randint(100, 9000)}]' for i in range(120))}]}};
+</script>
+</body>
+</html>
+"""
+
+def error_page() -> str:
+    return header("Page Not Found") + """
+<div id="content"><h1>Page Not Found</h1>
+<p>We could not find the page you were looking for.</p></div>
+</body>
+</html>
+"""
+
+def main():
+    rng = random.Random(20240101)
+    FIXTURE_DIR.mkdir(exist_ok=True)
+    full_prices = {label: f"${rng.uniform(2, 150):,.2f}" for label in PRICE_LABELS}
+    pages = [
+        ('ntsc_plain', 10642, product_page(rng, 10642, 'NTSC', 'Halo 3', full_prices, {
+            'Genre': 'First Person Shooter', 'Release Date': 'September 25, 2007',
+            'Publisher': 'Microsoft', 'Developer': 'Bungie', 'ESRB Rating': 'M (Mature)',
+            'UPC': '882224451112, 882224451129', 'ASIN (Amazon)': 'B000FRU0NU', 'ePID (eBay)': '61449823'
+        })),
+        ('pal_plain', 157635, product_page(rng, 157635, 'PAL', 'Kinect Sports', full_prices, {
+            'Genre': 'Sports', 'Release Date': 'November 10, 2010', 'Publisher': 'Microsoft',
+            'Developer': 'Rare', 'PEGI Rating': 'PEGI 12', 'EAN / GTIN': '0885370185486'
+        })),
+        ('jp_plain', 30874, product_page(rng, 30874, 'NTSC-J', 'Blue Dragon', full_prices, {
+            'Genre': 'RPG', 'Release Date': '2006', 'Publisher': 'Microsoft',
+            'Developer': 'Mistwalker', 'EAN / GTIN': '4988648421232'
+        })),
+        ('variant_heavy', 2012444, product_page(rng, 2012444, 'NTSC', 'call of duty black ops [limited edition]',
+            full_prices, {
+                'Genre': 'First Person Shooter', 'Release Date': 'November 2010', 'Publisher': 'Activision',
+                'Developer': 'Treyarch', 'ESRB Rating': 'M (Mature)', 'UPC': '047875840683'
+            },
+            variants=[(2012444 + i, f'xbox-360/call-of-duty-black-ops-{i}', f'variant edition number {i} of the set')
+                      for i in range(1, 41)])),
+        ('missing_prices', 3102810, product_page(rng, 3102810, 'PAL', 'Obscure Racing Demo Disc', {}, {
+            'Genre': 'none', 'Release Date': 'TBA', 'Publisher': 'n/a', 'Developer': '-'
+        }, sales_rows=5)),
+        ('id_mismatch', 176406, product_page(rng, 176406, 'NTSC', 'Gears of War', full_prices, {
+            'Genre': 'Action', 'Release Date': 'November 7, 2006'
+        }, script_id=176407)),
+        ('error_page', 99999999, error_page()),
+    ]
+    corpus = []
+    for name, game_id, html in pages:
+        file_name = f"{name}.html"
+        (FIXTURE_DIR / file_name).write_text(html, encoding='utf-8')
+        corpus.append({'name': name, 'file': file_name, 'id': game_id, 'valid': name not in ('id_mismatch', 'error_page')})
+        print(f"{file_name}: {len(html.encode('utf-8')) // 1024} KiB")
+    with open(FIXTURE_DIR / 'corpus.json', 'w', encoding='utf-8') as f:
+        json.dump(corpus, f, indent=2)
+        f.write('\n')
+
+if __name__ == '__main__':
+    main()
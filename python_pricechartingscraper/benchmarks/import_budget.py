@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Import-time budget check for the scraper CLI
+
+Fails (exit code 1) when importing main.py takes longer than the budget, or
+when heavy modules are loaded on paths that don't need them: by importing
+main.py, or by a --noimages run for a single ID answered from the cache.
+Every measurement runs in a fresh interpreter.
+
+    python benchmarks/import_budget.py --budget-ms 100
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+PACKAGE_DIR = Path(__file__).resolve().parent.parent
+
+# Only needed for fetching/parsing pages, images, history and exports
+HEAVY_MODULES = ['requests', 'urllib3', 'bs4', 'PIL', 'numpy', 'dateutil', 'pyarrow']
+
+IMPORT_TIME = """
+import sys, time
+sys.path.insert(0, {package!r})
+start = time.perf_counter()
+import main
+print(time.perf_counter() - start)
+"""
+
+LOADED_AFTER_IMPORT = """
+import json, sys
+sys.path.insert(0, {package!r})
+import main
+print(json.dumps(sorted(m for m in {heavy!r} if m in sys.modules)))
+"""
+
+LOADED_AFTER_CACHED_RUN = """
+import json, runpy, sys
+sys.path.insert(0, {package!r})
+sys.argv = ['main.py', '--url', '1', '--noimages', '--nohistory', '--nometrics']
+try:
+    runpy.run_path({main!r}, run_name='__main__')
+except SystemExit:
+    pass
+print(json.dumps(sorted(m for m in {heavy!r} if m in sys.modules)))
+"""
+
+CACHED_RECORD = {
+    'success': True, 'id': 1, 'product_name': 'Budget Check', 'image_url': None,
+    'prices': {'loose': 1.0}, 'details': {}
+}
+
+def run_python(code: str, cwd: Path) -> str:
+    result = subprocess.run([sys.executable, '-c', code], cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    # The measured value is the last line, anything before is CLI output
+    return result.stdout.strip().splitlines()[-1]
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the import-time budget of main.py')
+    parser.add_argument('--budget-ms', type=float, default=100.0, help='Maximum median time to import main.py')
+    parser.add_argument('--runs', type=int, default=7, help='Fresh interpreters to measure')
+    args = parser.parse_args()
+    failures = []
+
+    times = [float(run_python(IMPORT_TIME.format(package=str(PACKAGE_DIR)), PACKAGE_DIR)) * 1000
+             for _ in range(args.runs)]
+    median = statistics.median(times)
+    print(f"import main: median {median:.1f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    if median > args.budget_ms:
+        failures.append(f"importing main.py takes {median:.1f} ms")
+
+    loaded = json.loads(run_python(LOADED_AFTER_IMPORT.format(package=str(PACKAGE_DIR), heavy=HEAVY_MODULES), PACKAGE_DIR))
+    print(f"heavy modules after import main: {loaded or 'none'}")
+    if loaded:
+        failures.append(f"importing main.py loads {', '.join(loaded)}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        json_dir = Path(workdir) / 'json'
+        json_dir.mkdir()
+        (json_dir / '1.json').write_text(json.dumps(CACHED_RECORD), encoding='utf-8')
+        code = LOADED_AFTER_CACHED_RUN.format(package=str(PACKAGE_DIR), main=str(PACKAGE_DIR / 'main.py'),
+                                              heavy=HEAVY_MODULES)
+        loaded = json.loads(run_python(code, Path(workdir)))
+    print(f"heavy modules after a cached --noimages run: {loaded or 'none'}")
+    if loaded:
+        failures.append(f"a cached --noimages run loads {', '.join(loaded)}")
+
+    if failures:
+        print("FAILED: " + '; '.join(failures), file=sys.stderr)
+        sys.exit(1)
+    print("OK")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Sharded crawl across worker processes and machines
+
+    python crawl.py init --queue crawl.db --file ids.txt --budget 20000
+    python crawl.py run --queue crawl.db --workers 4 [--listen 0.0.0.0:8767]
+    python crawl.py worker --coordinator http://coordinator:8767 --name box2-1   # on another machine
+    python crawl.py merge crawl/workers/box2-1                                   # after copying its directory back
+    python crawl.py status --queue crawl.db
+
+The queue (src/work_queue.py) hands out shards of IDs under leases that
+workers keep alive with heartbeats; shards of dead workers are queued again.
+Every request of every worker takes a slot from one shared politeness row,
+so rate_limit.delay/jitter and --budget hold for the whole crawl. init
+leaves out IDs that are fresh in ./json or negative-cached, since workers
+scrape into their own, empty directory; run merges those directories into
+./json and the price history of the current directory when all local
+workers are done.
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from src.config import Config
+
+def read_ids(args) -> list:
+    """IDs from --file (one ID or /game/ URL per line) or --range FIRST-LAST"""
+    from main import game_id_from_input
+    if args.range:
+        first, _, last = args.range.partition('-')
+        return list(range(int(first), int(last) + 1))
+    ids = []
+    with open(args.file, 'r') as f:
+        for line in f:
+            if line.strip() and (game_id := game_id_from_input(line.strip())) is not None:
+                ids.append(game_id)
+    return ids
+
+def filter_ids(ids: list, config: Config) -> list:
+    """
+    Drop IDs with a fresh record in ./json or a negative cache entry in
+    json/failures.npy that is not due yet
+
+    Workers scrape into empty directories and never see the common cache,
+    so this is the only place those requests can be saved.
+    """
+    from src.scraper import PriceChartingScraper
+    scraper = PriceChartingScraper(config)
+    now = time.time()
+    kept = []
+    fresh = blocked = 0
+    for game_id in ids:
+        if scraper.fresh_record(game_id) is not None:
+            fresh += 1
+        elif scraper.failures.blocked(game_id, now):
+            blocked += 1
+        else:
+            kept.append(game_id)
+    print(f"Skipping {fresh} IDs with a fresh record and {blocked} negative-cached IDs")
+    return kept
+
+def init_queue(args) -> int:
+    from src.work_queue import SQLiteLeaseQueue
+    config = Config(args.config)
+    queue = SQLiteLeaseQueue(Path(args.queue), config.get('crawl', 'lease_seconds', default=120))
+    ids = read_ids(args)
+    if not args.refetch:
+        ids = filter_ids(ids, config)
+    added = queue.init(
+        ids, args.shard_size or config.get('crawl', 'shard_size', default=100),
+        config.get('rate_limit', 'delay', default=1.0), config.get('rate_limit', 'variant_delay', default=2.0),
+        tuple(config.get('rate_limit', 'jitter', default=(2.0, 4.0))), args.budget
+    )
+    print(f"Queued {added} IDs in {args.queue}")
+    return 0
+
+def run_worker(args) -> int:
+    """Lease shards and scrape their IDs until the queue is empty or the budget is spent"""
+    from main import scrape_url, write_metrics
+    from src.scraper import PriceChartingScraper
+    from src.work_queue import BudgetExhausted, LeaseLost, SharedRateLimiter, open_queue
+
+    config = Config(args.config and str(Path(args.config).resolve()))
+    queue_spec = args.coordinator or str(Path(args.queue).resolve())
+    workdir = Path(args.workdir or Path('crawl') / 'workers' / args.name)
+    workdir.mkdir(parents=True, exist_ok=True)
+    # The scraper keeps its cache relative to the working directory
+    os.chdir(workdir)
+
+    queue = open_queue(queue_spec, config.get('crawl', 'lease_seconds', default=120))
+    scraper = PriceChartingScraper(config)
+    limiter = scraper.rate_limiter = SharedRateLimiter(queue, args.name)
+
+    stopped = threading.Event()
+
+    def heartbeat():
+        while not stopped.wait(config.get('crawl', 'heartbeat_seconds', default=20)):
+            try:
+                queue.heartbeat(worker=args.name)
+            except Exception as e:
+                print(f"Heartbeat failed: {e}", file=sys.stderr)
+
+    threading.Thread(target=heartbeat, name='heartbeat', daemon=True).start()
+    done = 0
+    try:
+        while (leased := queue.lease(worker=args.name)) is not None:
+            limiter.shard, ids = leased
+            try:
+                for game_id in ids:
+                    try:
+                        success = scrape_url(str(game_id), scraper, False, args.images).success
+                    except (LeaseLost, BudgetExhausted):
+                        raise
+                    except Exception as e:
+                        print(f"Error processing {game_id}: {e}", file=sys.stderr)
+                        success = False
+                    queue.item_done(worker=args.name, game_id=game_id, success=success)
+                    done += 1
+                queue.complete(worker=args.name, shard=limiter.shard)
+            except LeaseLost as e:
+                print(f"{e}, leasing another shard", file=sys.stderr)
+            except BudgetExhausted as e:
+                queue.release(worker=args.name, shard=limiter.shard)
+                print(f"{e}, stopping", file=sys.stderr)
+                break
+            finally:
+                scraper.flush()
+    finally:
+        stopped.set()
+    print(f"Worker {args.name} finished after {done} IDs")
+    if not args.nometrics:
+        write_metrics(config)
+    return 0
+
+def merge_worker_dir(worker_dir: Path, config: Config) -> int:
+    """Move a worker's records, images and failures into ./json and its prices into the price history"""
+    from main import append_history
+    from src.failure_cache import FailureCache
+    from src.record import GameRecord
+    from src.record_store import iter_record_files, read_record_file
+    from src.scraper import PriceChartingScraper
+
+    source = Path(worker_dir) / 'json'
+    scraper = PriceChartingScraper(config)
+    failures_file = source / Path(config.get('negative_cache', 'file', default='./json/failures.npy')).name
+    if failures_file.exists():
+        scraper.failures.merge(FailureCache(failures_file))
+
+    merged = []
+    for game_id, path in iter_record_files(source):
+        try:
+            data = read_record_file(path)
+            existing = scraper.store.load(game_id)
+        except (ValueError, OSError) as e:
+            print(f"Warning: Skipping {path}: {e}")
+            continue
+        # A newer record in the common cache wins
+        if existing is None or existing[0] <= path.stat().st_mtime:
+            scraper.store.save(game_id, data)
+            if data.get('success'):
+                scraper.run_prices[game_id] = GameRecord.from_dict(data).prices
+                scraper.failures.clear(game_id)
+        merged.append(path)
+    scraper.flush()
+    for path in merged:
+        path.unlink()
+    failures_file.unlink(missing_ok=True)
+
+    scraper.output_dir.mkdir(exist_ok=True)
+    for image in source.glob('*.webp'):
+        shutil.move(str(image), scraper.output_dir / image.name)
+    if scraper.run_prices:
+        append_history(scraper, config)
+    return len(merged)
+
+def merge(args) -> int:
+    config = Config(args.config)
+    for worker_dir in args.dirs:
+        print(f"Merged {merge_worker_dir(Path(worker_dir), config)} records from {worker_dir}")
+    return 0
+
+def print_status(stats: dict):
+    shards, items, requests = stats['shards'], stats['items'], stats['requests']
+    alive = sum(1 for worker in stats['workers'] if worker['alive'])
+    budget = f"/{requests['budget']}" if requests['budget'] is not None else ''
+    print(f"[crawl] shards {shards['done']} done, {shards['leased']} leased, {shards['queued']} queued | "
+          f"items {items['done']} ok, {items['failed']} failed, {items['pending']} pending | "
+          f"requests {requests['spent']}{budget} | {alive} workers alive", flush=True)
+
+def status(args) -> int:
+    from src.work_queue import open_queue
+    stats = open_queue(args.coordinator or args.queue).stats()
+    print_status(stats)
+    for worker in stats['workers']:
+        print(f"  {worker['name']}: {'alive' if worker['alive'] else 'gone'}, {worker['done']} ok, {worker['failed']} failed")
+    return 0
+
+def run_coordinator(args) -> int:
+    """Start --workers local workers, restart the ones that crash, then merge their results"""
+    from src.work_queue import SQLiteLeaseQueue, make_queue_server
+
+    config = Config(args.config)
+    queue = SQLiteLeaseQueue(Path(args.queue), config.get('crawl', 'lease_seconds', default=120))
+    server = None
+    if args.listen:
+        server = make_queue_server(queue, args.listen)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Serving the crawl queue to remote workers on {args.listen}")
+
+    root = Path(args.dir)
+    host = socket.gethostname().split('.')[0]
+    names = [f"{host}-{i + 1}" for i in range(args.workers)]
+
+    def start(name):
+        command = [sys.executable, str(Path(__file__).resolve()), 'worker', '--queue', str(Path(args.queue).resolve()),
+                   '--name', name, '--workdir', str((root / 'workers' / name).resolve())]
+        if args.config:
+            command += ['--config', str(Path(args.config).resolve())]
+        if args.images:
+            command.append('--images')
+        log = open(root / f"{name}.log", 'a', encoding='utf-8')
+        return subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+
+    root.mkdir(parents=True, exist_ok=True)
+    workers = {name: start(name) for name in names}
+    restarts = dict.fromkeys(names, 0)
+    interval = config.get('crawl', 'status_interval', default=30)
+    last_status = time.time()
+    try:
+        while workers or (server and not queue.finished()):
+            time.sleep(1)
+            for name, process in list(workers.items()):
+                code = process.poll()
+                if code is None:
+                    continue
+                del workers[name]
+                if code != 0 and not queue.finished() and restarts[name] < args.max_restarts:
+                    restarts[name] += 1
+                    print(f"Worker {name} exited with code {code}, restarting", file=sys.stderr)
+                    workers[name] = start(name)
+            if time.time() - last_status >= interval:
+                print_status(queue.stats())
+                last_status = time.time()
+        print_status(queue.stats())
+    except KeyboardInterrupt:
+        # Workers stop with the coordinator, their leases expire and are queued again
+        for process in workers.values():
+            process.terminate()
+        return 1
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+
+    if not args.nomerge:
+        for name in names:
+            print(f"Merged {merge_worker_dir(root / 'workers' / name, config)} records from worker {name}")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Sharded multi-worker crawl with a lease-based work queue')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    init_parser = commands.add_parser('init', help='Queue product IDs for a crawl')
+    ids = init_parser.add_mutually_exclusive_group(required=True)
+    ids.add_argument('--file', type=str, help='File with one ID or game URL per line')
+    ids.add_argument('--range', type=str, metavar='FIRST-LAST', help='Inclusive range of product IDs')
+    init_parser.add_argument('--shard-size', type=int, help='IDs per leased shard (default crawl.shard_size)')
+    init_parser.add_argument('--budget', type=int, help='Maximum product requests of the whole crawl')
+    init_parser.add_argument('--refetch', action='store_true',
+                             help='Also queue IDs with a fresh record or a pending negative cache entry')
+
+    run_parser = commands.add_parser('run', help='Coordinate local workers (and remote ones with --listen)')
+    run_parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='Local worker processes')
+    run_parser.add_argument('--listen', type=str, help='Serve the queue to remote workers on host:port')
+    run_parser.add_argument('--dir', type=str, default='crawl', help='Directory for worker directories and logs')
+    run_parser.add_argument('--max-restarts', type=int, default=3, help='Restarts of a crashing worker')
+    run_parser.add_argument('--nomerge', action='store_true', help='Leave the results in the worker directories')
+
+    worker_parser = commands.add_parser('worker', help='Scrape leased shards')
+    worker_parser.add_argument('--coordinator', type=str, help='URL of a coordinator started with --listen')
+    worker_parser.add_argument('--name', type=str, default=f"{socket.gethostname().split('.')[0]}-{os.getpid()}",
+                               help='Unique worker name')
+    worker_parser.add_argument('--workdir', type=str, help='Directory for this worker\'s cache (default crawl/workers/NAME)')
+    worker_parser.add_argument('--nometrics', action='store_true', help='Do not write the metrics summary')
+
+    merge_parser = commands.add_parser('merge', help='Merge worker directories into ./json and the price history')
+    merge_parser.add_argument('dirs', nargs='+', help='Worker directories')
+
+    status_parser = commands.add_parser('status', help='Show crawl progress')
+    status_parser.add_argument('--coordinator', type=str, help='URL of a coordinator started with --listen')
+
+    for command_parser in (init_parser, run_parser, worker_parser, status_parser):
+        command_parser.add_argument('--queue', type=str, default='crawl.db', help='SQLite queue file')
+    for command_parser in (init_parser, run_parser, worker_parser, merge_parser):
+        command_parser.add_argument('--config', type=str, help='Path to config file')
+    for command_parser in (run_parser, worker_parser):
+        command_parser.add_argument('--images', action='store_true', help='Also download cover images')
+
+    args = parser.parse_args()
+    handlers = {'init': init_queue, 'run': run_coordinator, 'worker': run_worker, 'merge': merge, 'status': status}
+    try:
+        return handlers[args.command](args)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
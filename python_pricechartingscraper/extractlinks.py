@@ -1,71 +1,119 @@
-import sys
-from bs4 import BeautifulSoup
+#!/usr/bin/env python3
+"""
+Harvest PriceCharting game links from saved listing pages.
+
+Accepts any number of HTML files and/or directories (searched recursively),
+scans them in parallel and appends every game URL not seen in a previous run
+to the output file, one URL per line, ready for `main.py --file`.
+"""
+
+import argparse
+import html
+import mmap
+import os
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Set
+from urllib.parse import urlsplit
 
-def extract_links(html_file):
-    # Read the HTML file
-    with open(html_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    print(f"Read {len(content)} bytes from file")
-    
-    # Parse HTML
-    soup = BeautifulSoup(content, 'html.parser')
-    
-    # Find all 'a' tags
-    all_links = soup.find_all('a', href=True)
-    print(f"Found {len(all_links)} total links")
-    
-    # Find all 'a' tags with href starting with the specific URL
-    target_links = []
-    for link in all_links:
-        href = link['href']
-        if href.startswith('https://www.pricecharting.com/game/') or href.startswith('/game/'):
-            # Convert relative URLs to absolute
-            if href.startswith('/'):
-                href = f"https://www.pricecharting.com{href}"
-            
-            # Find canonical URL for this game page
-            canonical_url = None
-            if href.startswith('https://www.pricecharting.com/game/'):
-                # Make a temporary soup for this link to find its canonical URL
-                link_soup = BeautifulSoup(f'<link rel="canonical" href="{href}" />', 'html.parser')
-                canonical_tag = link_soup.find('link', rel='canonical')
-                if canonical_tag:
-                    canonical_url = canonical_tag['href']
-            
-            target_links.append({
-                'url': href,
-                'canonical_url': canonical_url or href  # Use original URL if no canonical found
-            })
-    
-    print(f"Found {len(target_links)} pricecharting game links")
-    
-    # Remove duplicates while preserving order
-    seen = set()
-    unique_links = []
-    for link in target_links:
-        if link['canonical_url'] not in seen:
-            seen.add(link['canonical_url'])
-            unique_links.append(link)
-    
-    print(f"Found {len(unique_links)} unique pricecharting game links")
-    
-    # Write links to file.txt
-    with open('file.txt', 'w', encoding='utf-8') as f:
-        for link in unique_links:
-            f.write(f"{link['url']}\t{link['canonical_url']}\n")
+BASE_URL = 'https://www.pricecharting.com'
+HTML_SUFFIXES = {'.html', '.htm'}
+
+# href values are found with a byte regex over a memory map of the file, no DOM
+HREF_PATTERN = re.compile(rb'<a\s[^>]*?href\s*=\s*["\']([^"\']+)["\']', re.IGNORECASE)
+
+def canonicalize_url(href: str) -> str:
+    """Return the canonical absolute URL of a game link, or '' if it isn't one"""
+    href = html.unescape(href.strip())
+    if href.startswith('/'):
+        href = BASE_URL + href
+    parts = urlsplit(href)
+    if parts.netloc.lower() not in ('www.pricecharting.com', 'pricecharting.com'):
+        return ''
+    path = parts.path.rstrip('/')
+    if not path.startswith('/game/'):
+        return ''
+    # Query strings and fragments only select tabs/anchors on the same page
+    return BASE_URL + path
+
+def extract_links(html_file: str) -> List[str]:
+    """Return the canonical game URLs of a single file in document order"""
+    links = []
+    with open(html_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return links
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            for match in HREF_PATTERN.finditer(content):
+                url = canonicalize_url(match.group(1).decode('utf-8', 'replace'))
+                if url:
+                    links.append(url)
+    return links
+
+def find_html_files(paths: Iterable[str]) -> List[str]:
+    """Expand directories into the HTML files they contain"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                str(p) for p in sorted(Path(path).rglob('*'))
+                if p.suffix.lower() in HTML_SUFFIXES and p.is_file()
+            )
+        else:
+            files.append(path)
+    return files
+
+def load_seen(seen_file: str) -> Set[str]:
+    """Load the URLs harvested by previous runs"""
+    if not os.path.exists(seen_file):
+        return set()
+    with open(seen_file, 'r', encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip()}
+
+def harvest(paths: Iterable[str], output_file: str, seen_file: str, workers: int = None) -> int:
+    """Harvest new game links from all paths into output_file, returns the number of new links"""
+    files = find_html_files(paths)
+    if not files:
+        raise ValueError("No HTML files found")
+
+    seen = load_seen(seen_file)
+    new_links = []
+    total = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() keeps file order, so the output follows the listing order
+        for links in executor.map(extract_links, files, chunksize=8):
+            total += len(links)
+            for url in links:
+                if url not in seen:
+                    seen.add(url)
+                    new_links.append(url)
+
+    with open(output_file, 'a', encoding='utf-8') as f:
+        f.writelines(f"{url}\n" for url in new_links)
+    with open(seen_file, 'a', encoding='utf-8') as f:
+        f.writelines(f"{url}\n" for url in new_links)
+
+    print(f"Scanned {len(files)} files: {total} game links, {len(new_links)} new")
+    return len(new_links)
+
+def main():
+    parser = argparse.ArgumentParser(description='Extract PriceCharting game links from saved HTML pages')
+    parser.add_argument('paths', nargs='+', help='HTML files or directories of saved listing pages')
+    parser.add_argument('-o', '--output', default='file.txt',
+                        help='File new links are appended to, one URL per line (default: file.txt)')
+    parser.add_argument('--seen', default='seen_links.txt',
+                        help='Links harvested by earlier runs, used to skip duplicates (default: seen_links.txt)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    args = parser.parse_args()
 
-if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python script.py <htmlfile>")
-        sys.exit(1)
-    
-    html_file = sys.argv[1]
     try:
-        extract_links(html_file)
-        print(f"Links have been extracted to file.txt")
+        harvest(args.paths, args.output, args.seen, args.workers)
+        print(f"Links have been appended to {args.output}")
+        return 0
     except Exception as e:
-        print(f"Error: {e}")
-        import traceback
-        traceback.print_exc()
\ No newline at end of file
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Image existence/version manifest for public/images
+
+Walks images/product/<first3>/<id>.webp and images/inventory/<first3>/<id>.webp
+and writes images/manifest.bin, so image.php (and the frontend) can answer
+"does this image exist, which version" from one read instead of a stat per
+candidate path:
+
+    python image_manifest.py                            # full (re)index, only changed files are hashed
+    python image_manifest.py --update product:12345     # after an ingest tool wrote or deleted a file
+
+manifest.bin, all integers little-endian uint32:
+
+    b'IMGM', format version, generated (unix time), flags (bit 0: placeholder.webp exists),
+    product count P, inventory count I,
+    P sorted product IDs, P versions, I sorted inventory IDs, I versions
+
+A version is the first 4 bytes of the BLAKE2b hash of the file, so it only
+changes with the content. upload.php, crop.php and delete.php append
+"put|del <type> <id>" lines to images/manifest.pending; image.php applies them
+(and manifest.pending.taken, the journal a running indexer is folding in)
+on top of the manifest until the next run has written it. Run it from cron
+(see README): image.php checks misses on the filesystem once the manifest is
+older than IMAGE_MANIFEST_TTL and ignores it when the journal grows too long.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import struct
+import sys
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+IMAGES_DIR = Path(__file__).resolve().parent.parent / 'public' / 'images'
+IMAGE_TYPES = ('product', 'inventory')
+MAGIC = b'IMGM'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4s5I')
+FLAG_PLACEHOLDER = 1
+
+MANIFEST_FILE = 'manifest.bin'
+PENDING_FILE = 'manifest.pending'
+# The journal being folded in, overlaid by image.php until the new manifest is written
+TAKEN_FILE = 'manifest.pending.taken'
+# (size, mtime_ns, version) of every indexed file, so unchanged files are not hashed again
+STATE_FILE = '.manifest_state.json'
+
+PENDING_LINE = re.compile(r'^(put|del) (product|inventory) (\d+)$')
+
+def image_path(images_dir: Path, image_type: str, image_id: int) -> Path:
+    """Same layout as getImagePath in image.php and imageUtils.ts"""
+    return images_dir / image_type / str(image_id)[:3] / f"{image_id}.webp"
+
+def file_version(path: Path) -> int:
+    digest = hashlib.blake2b(digest_size=4)
+    with open(path, 'rb') as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return int.from_bytes(digest.digest(), 'little')
+
+class ImageIndex:
+    """Indexed images per type: id -> (size, mtime_ns, version)"""
+
+    def __init__(self, images_dir: Path):
+        self.images_dir = Path(images_dir)
+        self.entries: Dict[str, Dict[int, Tuple[int, int, int]]] = {image_type: {} for image_type in IMAGE_TYPES}
+        self.hashed = 0
+
+    def load_state(self):
+        try:
+            with open(self.images_dir / STATE_FILE, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return
+        for image_type in IMAGE_TYPES:
+            self.entries[image_type] = {int(image_id): tuple(entry) for image_id, entry in state.get(image_type, {}).items()}
+
+    def refresh(self, image_type: str, image_id: int, stat: Optional[os.stat_result] = None):
+        """Re-read one image, dropping it if the file is gone"""
+        path = image_path(self.images_dir, image_type, image_id)
+        try:
+            stat = stat or path.stat()
+        except FileNotFoundError:
+            self.entries[image_type].pop(image_id, None)
+            return
+        known = self.entries[image_type].get(image_id)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return
+        self.entries[image_type][image_id] = (stat.st_size, stat.st_mtime_ns, file_version(path))
+        self.hashed += 1
+
+    def scan(self):
+        """Walk both image trees, hashing only new and changed files"""
+        for image_type in IMAGE_TYPES:
+            seen = set()
+            root = self.images_dir / image_type
+            if root.is_dir():
+                for folder in os.scandir(root):
+                    if not folder.is_dir():
+                        continue
+                    for entry in os.scandir(folder.path):
+                        stem, extension = os.path.splitext(entry.name)
+                        # Files outside their <first3> folder are never served, so never listed
+                        if extension == '.webp' and stem.isdigit() and stem[:3] == folder.name and entry.is_file():
+                            image_id = int(stem)
+                            seen.add(image_id)
+                            self.refresh(image_type, image_id, entry.stat())
+            for image_id in set(self.entries[image_type]) - seen:
+                del self.entries[image_type][image_id]
+
+    def write(self):
+        """Write manifest.bin and the state file, each atomically"""
+        flags = FLAG_PLACEHOLDER if (self.images_dir / 'placeholder.webp').exists() else 0
+        sections = []
+        counts = []
+        for image_type in IMAGE_TYPES:
+            ids = sorted(self.entries[image_type])
+            counts.append(len(ids))
+            sections.append(array('I', ids))
+            sections.append(array('I', (self.entries[image_type][image_id][2] for image_id in ids)))
+        if sys.byteorder != 'little':
+            for section in sections:
+                section.byteswap()
+        data = HEADER.pack(MAGIC, FORMAT_VERSION, int(time.time()), flags, *counts) + b''.join(s.tobytes() for s in sections)
+        _write_atomic(self.images_dir / MANIFEST_FILE, data)
+        state = {image_type: {str(image_id): list(entry) for image_id, entry in self.entries[image_type].items()}
+                 for image_type in IMAGE_TYPES}
+        _write_atomic(self.images_dir / STATE_FILE, json.dumps(state, separators=(',', ':')).encode('utf-8'))
+        return counts
+
+def _write_atomic(path: Path, data: bytes):
+    temp_path = path.with_name(f".{path.name}.tmp")
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+def take_pending(images_dir: Path) -> List[Tuple[str, int]]:
+    """
+    (type, id) of every journal line written by the PHP ingest endpoints
+
+    The journal moves to TAKEN_FILE, where image.php still applies it, and
+    new lines go to a fresh journal. drop_taken() removes it once the new
+    manifest is written. A TAKEN_FILE left by a failed run is taken again
+    instead, the fresh journal then waits for the next run.
+    """
+    pending = images_dir / PENDING_FILE
+    taken = images_dir / TAKEN_FILE
+    if not taken.exists():
+        try:
+            os.replace(pending, taken)
+        except FileNotFoundError:
+            return []
+    with open(taken, 'r', encoding='utf-8') as f:
+        lines = [PENDING_LINE.match(line.strip()) for line in f]
+    return [(match.group(2), int(match.group(3))) for match in lines if match]
+
+def drop_taken(images_dir: Path):
+    (images_dir / TAKEN_FILE).unlink(missing_ok=True)
+
+def parse_update(value: str) -> Tuple[str, int]:
+    image_type, _, image_id = value.partition(':')
+    if image_type not in IMAGE_TYPES or not image_id.isdigit():
+        raise argparse.ArgumentTypeError(f"Expected product:<id> or inventory:<id>, got {value}")
+    return image_type, int(image_id)
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the image existence/version manifest for image.php')
+    parser.add_argument('--images', type=str, default=str(IMAGES_DIR), help='The public/images directory')
+    parser.add_argument('--update', type=parse_update, nargs='+', metavar='TYPE:ID',
+                        help='Only re-read these images (and the pending journal) instead of walking the trees')
+    args = parser.parse_args()
+
+    images_dir = Path(args.images)
+    if not images_dir.is_dir():
+        print(f"Error: {images_dir} is not a directory", file=sys.stderr)
+        return 1
+    start = time.time()
+    index = ImageIndex(images_dir)
+    index.load_state()
+    # Taken before the walk, so lines appended meanwhile are kept for the next run
+    pending = take_pending(images_dir)
+    if args.update:
+        for image_type, image_id in list(args.update) + list(pending):
+            index.refresh(image_type, image_id)
+    else:
+        index.scan()
+    products, inventory = index.write()
+    # Only now the new manifest covers the taken lines
+    drop_taken(images_dir)
+    print(f"Manifest: {products} product and {inventory} inventory images, {index.hashed} hashed, "
+          f"{len(pending)} pending updates applied, {time.time() - start:.2f}s")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
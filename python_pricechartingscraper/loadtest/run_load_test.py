@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Load-test driver: runs main.py --file against the local stand-in server
+
+    python loadtest/run_load_test.py --ids 50 --delay 0.2 --rate-jitter 0 0.1 --latency 100 --throttle-rps 4
+
+Starts the stand-in in-process, runs the scraper in a scratch directory with
+scraper.base_url pointed at it, and reports throughput, tail latency and
+politeness (request spacing against the configured rate limit, Retry-After
+compliance after 429s) from the server's request log. The report is printed
+and written as JSON with --output.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from standin_server import add_standin_arguments, make_server, standin_config_from_args
+
+MAIN = Path(__file__).resolve().parent.parent / 'main.py'
+
+# Spacing below the configured minimum by more than this counts as a violation (timer noise)
+SPACING_TOLERANCE = 0.05
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(q / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+def latency_summary(values: List[float]) -> Dict:
+    return {
+        'count': len(values),
+        'mean': statistics.fmean(values) if values else None,
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'max': max(values) if values else None
+    }
+
+def politeness(entries: List[Dict], min_spacing: float) -> Dict:
+    """Check page request spacing against the rate limit and Retry-After compliance after 429s"""
+    pages = sorted((e for e in entries if e['kind'] == 'page'), key=lambda e: e['time'])
+    gaps = [b['time'] - a['time'] for a, b in zip(pages, pages[1:])]
+    spacing_violations = sum(1 for gap in gaps if gap < min_spacing * (1 - SPACING_TOLERANCE))
+
+    retry_after_violations = 0
+    blocked_until = 0.0
+    for entry in pages:
+        if entry['time'] < blocked_until:
+            retry_after_violations += 1
+        if entry['status'] == 429 and entry.get('retry_after'):
+            blocked_until = max(blocked_until, entry['time'] + entry['retry_after'])
+
+    # Busiest 60 second window
+    max_per_minute = 0
+    start = 0
+    for end, entry in enumerate(pages):
+        while entry['time'] - pages[start]['time'] >= 60:
+            start += 1
+        max_per_minute = max(max_per_minute, end - start + 1)
+
+    return {
+        'configured_min_spacing': min_spacing,
+        'min_spacing': min(gaps) if gaps else None,
+        'median_spacing': statistics.median(gaps) if gaps else None,
+        'spacing_violations': spacing_violations,
+        'throttled_responses': sum(1 for e in pages if e['status'] == 429),
+        'retry_after_violations': retry_after_violations,
+        'max_requests_per_minute': max_per_minute,
+        'compliant': spacing_violations == 0 and retry_after_violations == 0
+    }
+
+def build_report(entries: List[Dict], wall_time: float, min_spacing: float,
+                 client_metrics: Optional[Dict], exit_code: int) -> Dict:
+    pages = [e for e in entries if e['kind'] == 'page']
+    images = [e for e in entries if e['kind'] == 'image']
+    statuses: Dict[str, int] = {}
+    for entry in entries:
+        statuses[str(entry['status'])] = statuses.get(str(entry['status']), 0) + 1
+    report = {
+        'exit_code': exit_code,
+        'wall_seconds': wall_time,
+        'throughput': {
+            'page_requests': len(pages),
+            'image_requests': len(images),
+            'pages_per_minute': len(pages) * 60 / wall_time if wall_time else None,
+            'successful_pages_per_minute': sum(1 for e in pages if e['status'] == 200) * 60 / wall_time if wall_time else None,
+            'bytes_per_second': sum(e['bytes'] for e in entries) / wall_time if wall_time else None
+        },
+        'statuses': statuses,
+        'server_latency_seconds': {
+            'page': latency_summary([e['duration'] for e in pages]),
+            'image': latency_summary([e['duration'] for e in images])
+        },
+        'politeness': politeness(entries, min_spacing)
+    }
+    if client_metrics:
+        report['client_stages'] = client_metrics.get('stages')
+    return report
+
+def print_report(report: Dict):
+    throughput = report['throughput']
+    page_latency = report['server_latency_seconds']['page']
+    polite = report['politeness']
+    print(f"\nmain.py exit code {report['exit_code']}, {report['wall_seconds']:.1f}s wall time")
+    print(f"Throughput: {throughput['page_requests']} pages, {throughput['image_requests']} images, "
+          f"{throughput['pages_per_minute'] or 0:.1f} pages/min "
+          f"({throughput['successful_pages_per_minute'] or 0:.1f} successful)")
+    print(f"Statuses: {report['statuses']}")
+    if page_latency['count']:
+        print(f"Page latency: p50 {page_latency['p50'] * 1000:.0f} ms, p95 {page_latency['p95'] * 1000:.0f} ms, "
+              f"p99 {page_latency['p99'] * 1000:.0f} ms, max {page_latency['max'] * 1000:.0f} ms")
+    min_spacing = polite['min_spacing']
+    print(f"Politeness: {'OK' if polite['compliant'] else 'VIOLATED'} - min spacing "
+          f"{min_spacing if min_spacing is not None else float('nan'):.2f}s (configured {polite['configured_min_spacing']:.2f}s), "
+          f"{polite['spacing_violations']} spacing violations, {polite['throttled_responses']} throttled, "
+          f"{polite['retry_after_violations']} Retry-After violations, "
+          f"peak {polite['max_requests_per_minute']} requests/min")
+
+def main():
+    parser = argparse.ArgumentParser(description='Run main.py --file against the local stand-in server')
+    parser.add_argument('--ids', type=int, default=20, help='Number of product IDs to scrape')
+    parser.add_argument('--first-id', type=int, default=100000, help='First product ID of the run')
+    parser.add_argument('--delay', type=float, default=1.0, help='rate_limit.delay of the scraper')
+    parser.add_argument('--rate-jitter', type=float, nargs=2, default=[2.0, 4.0], metavar=('MIN', 'MAX'),
+                        help='rate_limit.jitter range of the scraper')
+    parser.add_argument('--images', action='store_true', help='Also download the cover images')
+    parser.add_argument('--workdir', type=str, help='Scratch directory for the run (default: a temporary one)')
+    parser.add_argument('--output', type=str, help='Write the report as JSON to this file')
+    add_standin_arguments(parser)
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix='pricecharting-loadtest-'))
+    workdir.mkdir(parents=True, exist_ok=True)
+    log_file = workdir / 'standin.jsonl'
+    log_file.unlink(missing_ok=True)
+
+    server = make_server(0, standin_config_from_args(args), log_file)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    ids_file = workdir / 'ids.txt'
+    ids_file.write_text(''.join(f"{args.first_id + i}\n" for i in range(args.ids)), encoding='utf-8')
+    config_file = workdir / 'loadtest.yaml'
+    with open(config_file, 'w', encoding='utf-8') as f:
+        yaml.safe_dump({
+            'scraper': {'base_url': f"http://127.0.0.1:{port}"},
+            'rate_limit': {'delay': args.delay, 'jitter': list(args.rate_jitter)},
+            'output': {'file_age': 0}
+        }, f)
+
+    command = [sys.executable, str(MAIN), '--file', str(ids_file), '--config', str(config_file), '--nohistory']
+    if not args.images:
+        command.append('--noimages')
+    print(f"Stand-in on port {port}, running {args.ids} IDs in {workdir}", file=sys.stderr)
+    start = time.time()
+    with open(workdir / 'main.log', 'w', encoding='utf-8') as main_log:
+        exit_code = subprocess.run(command, cwd=workdir, stdout=main_log, stderr=subprocess.STDOUT).returncode
+    wall_time = time.time() - start
+    server.shutdown()
+    server.server_close()
+
+    with open(log_file, 'r', encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    client_metrics = None
+    metrics_file = workdir / 'metrics' / 'last_run.json'
+    if metrics_file.exists():
+        with open(metrics_file, 'r', encoding='utf-8') as f:
+            client_metrics = json.load(f)
+
+    report = build_report(entries, wall_time, args.delay + args.rate_jitter[0], client_metrics, exit_code)
+    report['settings'] = {key: value for key, value in vars(args).items() if key not in ('output', 'workdir')}
+    report['workdir'] = str(workdir)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
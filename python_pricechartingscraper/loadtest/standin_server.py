@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Local PriceCharting stand-in for end-to-end and load tests
+
+Serves the benchmark fixture pages under /game/<id> and cover images under
+/storage.googleapis.com/images.pricecharting.com/<hash>/1600.jpg, so the
+scraper runs unchanged against it with scraper.base_url pointed here:
+
+    python loadtest/standin_server.py --port 8765 --latency 150 --throttle-rps 0.5
+
+Every ID is served: IDs of the corpus get their own page, any other ID gets
+the plain NTSC page rewritten to that ID. Latency, error rates, 429 throttling
+with Retry-After and a bandwidth cap are configurable, and every request is
+logged as a JSON line for the load-test driver.
+"""
+
+import argparse
+import io
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+
+FIXTURE_DIR = Path(__file__).resolve().parent.parent / 'benchmarks' / 'fixtures'
+TEMPLATE_PAGE = 'ntsc_plain'
+IMAGE_PATH = re.compile(r'^/storage\.googleapis\.com/images\.pricecharting\.com/[0-9a-f]+/\d+\.jpg$')
+GAME_PATH = re.compile(r'^/game/(?:[^/]+/)*(\d+)/?$')
+
+class StandinConfig:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 not_found_rate: float = 0.0, throttle_rate: float = 0.0, throttle_rps: float = 0.0,
+                 retry_after: int = 5, bandwidth: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency  # Seconds added to every response
+        self.jitter = jitter  # Uniform random extra latency in seconds
+        self.error_rate = error_rate  # Share of page requests answered with HTTP 500
+        self.not_found_rate = not_found_rate  # Share of page requests answered with the error page
+        self.throttle_rate = throttle_rate  # Share of page requests answered with 429 at random
+        self.throttle_rps = throttle_rps  # Answer 429 when a client exceeds this many page requests per second
+        self.retry_after = retry_after  # Retry-After seconds sent with every 429
+        self.bandwidth = bandwidth  # Bytes per second per response, 0 for unlimited
+        self.random = random.Random(seed)
+
+class Standin:
+    """Pages, images and request state shared by all handler threads"""
+
+    def __init__(self, config: StandinConfig, log_file: Optional[Path] = None):
+        self.config = config
+        with open(FIXTURE_DIR / 'corpus.json', 'r', encoding='utf-8') as f:
+            corpus = json.load(f)
+        self.pages: Dict[int, str] = {}
+        self.template = None
+        self.template_id = None
+        for page in corpus:
+            html = (FIXTURE_DIR / page['file']).read_text(encoding='utf-8')
+            if page['name'] == 'error_page':
+                self.error_page = html
+            else:
+                self.pages[page['id']] = html
+            if page['name'] == TEMPLATE_PAGE:
+                self.template, self.template_id = html, page['id']
+        self.image = self._make_image()
+        self.lock = threading.Lock()
+        self.last_page_request: Dict[str, float] = {}
+        self.throttled_until: Dict[str, float] = {}
+        self.log = open(log_file, 'a', encoding='utf-8') if log_file else None
+
+    @staticmethod
+    def _make_image() -> bytes:
+        try:
+            from PIL import Image
+        except ImportError:
+            # Smallest valid JPEG-like payload is enough when Pillow is missing
+            return b'\xff\xd8\xff\xd9'
+        output = io.BytesIO()
+        Image.new('RGB', (600, 800), (40, 90, 160)).save(output, 'JPEG', quality=85)
+        return output.getvalue()
+
+    def page(self, game_id: int, host: str) -> str:
+        html = self.pages.get(game_id)
+        if html is None:
+            html = re.sub(rf'\b{self.template_id}\b', str(game_id), self.template)
+        # Point cover images at this server
+        return html.replace('https://storage.googleapis.com/', f'http://{host}/storage.googleapis.com/')
+
+    def check_throttle(self, client: str) -> bool:
+        """True if the page request must be answered with 429"""
+        config = self.config
+        now = time.monotonic()
+        with self.lock:
+            if now < self.throttled_until.get(client, 0):
+                return True
+            last = self.last_page_request.get(client)
+            self.last_page_request[client] = now
+            too_fast = config.throttle_rps and last is not None and now - last < 1 / config.throttle_rps
+            if too_fast or config.random.random() < config.throttle_rate:
+                self.throttled_until[client] = now + config.retry_after
+                return True
+        return False
+
+    def write_log(self, entry: Dict):
+        if self.log:
+            with self.lock:
+                self.log.write(json.dumps(entry) + '\n')
+                self.log.flush()
+
+class StandinHandler(BaseHTTPRequestHandler):
+    server_version = 'PriceChartingStandin/1.0'
+    standin: Standin = None
+
+    def do_GET(self):
+        start = time.time()
+        config = self.standin.config
+        path = self.path.split('?', 1)[0]
+        client = self.client_address[0]
+        kind = 'other'
+        headers = {}
+
+        delay = config.latency + (config.random.uniform(0, config.jitter) if config.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+        if match := GAME_PATH.match(path):
+            kind = 'page'
+            if self.standin.check_throttle(client):
+                status, body = 429, b'Too Many Requests'
+                headers['Retry-After'] = str(config.retry_after)
+            elif config.random.random() < config.error_rate:
+                status, body = 500, b'Internal Server Error'
+            elif config.random.random() < config.not_found_rate:
+                status, body = 200, self.standin.error_page.encode('utf-8')
+            else:
+                status = 200
+                body = self.standin.page(int(match.group(1)), self.headers.get('Host', '')).encode('utf-8')
+            headers['Content-Type'] = 'text/html; charset=utf-8'
+        elif IMAGE_PATH.match(path):
+            kind = 'image'
+            status, body = 200, self.standin.image
+            headers['Content-Type'] = 'image/jpeg'
+        else:
+            status, body = 404, b'Not Found'
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self._send_body(body)
+
+        self.standin.write_log({
+            'time': start, 'client': client, 'path': path, 'kind': kind, 'status': status,
+            'bytes': len(body), 'duration': time.time() - start,
+            'retry_after': int(headers['Retry-After']) if 'Retry-After' in headers else None
+        })
+
+    def _send_body(self, body: bytes):
+        bandwidth = self.standin.config.bandwidth
+        if not bandwidth:
+            self.wfile.write(body)
+            return
+        # Send in 50 ms slices to stay at the configured bytes per second
+        chunk = max(int(bandwidth / 20), 1)
+        for offset in range(0, len(body), chunk):
+            self.wfile.write(body[offset:offset + chunk])
+            time.sleep(0.05)
+
+    def log_message(self, format, *args):
+        # Requests go to the JSON log instead of stderr
+        pass
+
+def make_server(port: int, config: StandinConfig, log_file: Optional[Path] = None,
+                host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    handler = type('Handler', (StandinHandler,), {'standin': Standin(config, log_file)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def add_standin_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--latency', type=float, default=0.0, help='Milliseconds added to every response')
+    parser.add_argument('--latency-jitter', type=float, default=0.0, help='Random extra latency up to this many milliseconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of page requests answered with HTTP 500')
+    parser.add_argument('--not-found-rate', type=float, default=0.0, help='Share of page requests answered with an error page')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of page requests answered with 429 at random')
+    parser.add_argument('--throttle-rps', type=float, default=0.0,
+                        help='Answer 429 when a client requests pages faster than this per second')
+    parser.add_argument('--retry-after', type=int, default=5, help='Retry-After seconds of 429 responses')
+    parser.add_argument('--bandwidth', type=float, default=0.0, help='Response bandwidth cap in KiB/s (0 = unlimited)')
+    parser.add_argument('--seed', type=int, help='Random seed for reproducible error/throttle patterns')
+
+def standin_config_from_args(args) -> StandinConfig:
+    return StandinConfig(
+        latency=args.latency / 1000, jitter=args.latency_jitter / 1000, error_rate=args.error_rate,
+        not_found_rate=args.not_found_rate, throttle_rate=args.throttle_rate, throttle_rps=args.throttle_rps,
+        retry_after=args.retry_after, bandwidth=args.bandwidth * 1024, seed=args.seed
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description='Local PriceCharting stand-in server')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--log', type=str, help='Append one JSON line per request to this file')
+    add_standin_arguments(parser)
+    args = parser.parse_args()
+
+    server = make_server(args.port, standin_config_from_args(args), Path(args.log) if args.log else None, args.host)
+    print(f"Serving PriceCharting stand-in on http://{args.host}:{args.port} "
+          f"(set scraper.base_url to this address)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -7,82 +7,248 @@ Entry point for the price charting scraper
 import argparse
 import sys
 import re
-import requests
-from bs4 import BeautifulSoup
 from pathlib import Path
-from urllib.parse import urlparse
+from typing import Optional
 from src.config import Config
 from src.scraper import PriceChartingScraper
-from src.formatters import get_formatter
+from src.record import GameRecord
+from src.url_cache import UrlIdCache
+from src.metrics import metrics
 from src.utils.image_utils import download_image
 
-def extract_game_id_from_html(url: str, headers: dict) -> tuple[int, str]:
-    """Fetch the page and extract the PriceCharting ID and canonical URL from the HTML"""
-    response = requests.get(url, headers=headers, timeout=10)
-    if response.status_code != 200:
-        raise ValueError(f"Failed to fetch URL: {url}")
-        
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
-    # Get canonical URL if available
-    canonical_url = url  # Default to original URL
-    canonical_tag = soup.find('link', rel='canonical')
-    if canonical_tag and canonical_tag.get('href'):
-        canonical_url = canonical_tag['href']
-    
-    # Get PriceCharting ID
-    id_row = soup.find('td', string='PriceCharting ID:')
-    if id_row and (details := id_row.find_next_sibling('td')):
-        try:
-            return int(details.text.strip()), canonical_url
-        except ValueError:
-            pass
-            
-    raise ValueError("Could not find PriceCharting ID in the page")
-
-def extract_game_id(url: str, headers: dict) -> tuple[int, str]:
-    """Extract game ID from either numeric ID or full URL, returns (id, canonical_url)"""
-    # Try direct numeric ID first
-    if url.isdigit():
-        return int(url), ""  # No canonical URL for direct IDs
-        
-    # Try to extract from URL
-    # Handle both full URLs and relative paths
-    match = re.search(r'/game/(?:[^/]+/)*(\d+)(?:/[^/]*)?$', url)
-    if match:
-        return int(match.group(1)), url  # Use original URL if ID found directly
+# Heavy modules (requests, bs4, Pillow, numpy, pyarrow) are imported on the
+# code paths that need them, so single-ID and cached runs start quickly.
+# benchmarks/import_budget.py checks this stays true.
+
+def extract_game_id(url: str, scraper: PriceChartingScraper, url_cache: Optional[UrlIdCache] = None) -> tuple[int, str, Optional[str]]:
+    """
+    Extract game ID from either numeric ID or full URL, returns (id, canonical_url, page_html)
+
+    page_html is only set when the product page had to be downloaded to find the ID.
+    """
+    # Numeric IDs and URLs ending in the ID need no lookup
+    if (game_id := game_id_from_input(url)) is not None:
+        return game_id, "" if url.isdigit() else url, None  # No canonical URL for direct IDs
         
     # If URL parsing fails, try to fetch the page and get ID from HTML
     if url.startswith(('http://', 'https://', 'www.')):
         # Ensure URL has proper scheme
         if not url.startswith(('http://', 'https://')):
             url = 'https://' + url
-        return extract_game_id_from_html(url, headers)
+
+        # Slugs resolved in an earlier run don't need the page at all
+        if url_cache and (cached_id := url_cache.get(url)):
+            return cached_id, url, None
+
+        # A rate-limited product request, its page is reused by fetch_game_data
+        game_id, canonical_url, page_html = scraper.resolve_url(url)
+        if url_cache:
+            url_cache.put(url, game_id)
+            url_cache.put(canonical_url, game_id)
+        return game_id, canonical_url, page_html
         
     raise ValueError("Could not extract game ID. Please provide either a numeric ID or a valid pricecharting.com game URL")
 
-def process_url(url: str, scraper: PriceChartingScraper, scrape_variants: bool, download_images: bool = True) -> bool:
-    """Process a single URL and return success status"""
-    try:
-        # Extract game ID from URL or numeric input
-        game_id, canonical_url = extract_game_id(url.strip(), scraper.headers)
-        
-        # Fetch data and track saved files
-        result = scraper.fetch_game_data(game_id, scrape_variants)
-        
-        # Add canonical URL to result if available
-        if canonical_url:
-            result['pricecharting_url'] = canonical_url
+def game_id_from_input(url: str, url_cache: Optional[UrlIdCache] = None) -> Optional[int]:
+    """The ID of a numeric ID, a URL ending in the ID or an already resolved URL, without any request"""
+    if url.isdigit():
+        return int(url)
+    # Handle both full URLs and relative paths
+    match = re.search(r'/game/(?:[^/]+/)*(\d+)(?:/[^/]*)?$', url)
+    if match:
+        return int(match.group(1))
+    if url_cache and url.startswith(('http://', 'https://', 'www.')):
+        return url_cache.get(url)
+    return None
+
+def scrape_url(url: str, scraper: PriceChartingScraper, scrape_variants: bool, download_images: bool = True,
+               url_cache: Optional[UrlIdCache] = None) -> GameRecord:
+    """Scrape (or load from cache) a single URL or ID, raises if the ID can't be resolved"""
+    # Extract game ID from URL or numeric input
+    game_id, canonical_url, page_html = extract_game_id(url.strip(), scraper, url_cache)
+    
+    # Fetch data and track saved files, reusing the page if resolving the ID downloaded it
+    result = scraper.fetch_game_data(game_id, scrape_variants, page_html)
+    
+    # Add canonical URL to result if available
+    if canonical_url:
+        result.pricecharting_url = canonical_url
+    
+    # Download image if available and enabled
+    if download_images and result.success and result.image_url:
+        download_image(result.image_url, game_id, scraper.output_dir, scraper.headers)
         
-        # Download image if available and enabled
-        if download_images and result['success'] and result.get('image_url'):
-            download_image(result['image_url'], game_id, scraper.output_dir, scraper.headers)
-            
-        return result['success']
+    return result
+
+def process_url(url: str, scraper: PriceChartingScraper, scrape_variants: bool, download_images: bool = True,
+                url_cache: Optional[UrlIdCache] = None, output: Optional['RecordOutput'] = None) -> bool:
+    """Process a single URL and return success status, writing the record to output if given"""
+    try:
+        result = scrape_url(url, scraper, scrape_variants, download_images, url_cache)
+        if output and result.success:
+            output.write(result)
+        return result.success
     except Exception as e:
         print(f"Error processing {url}: {e}", file=sys.stderr)
         return False
 
+class RecordOutput:
+    """
+    Records of a --url/--file run in --format, to --output or stdout
+
+    Writing to stdout moves every progress print of the run to stderr until
+    close(), so the records on stdout stay parseable.
+    """
+
+    def __init__(self, format_name: str, output_file: Optional[str] = None):
+        from src.formatters import get_formatter
+        if format_name == 'parquet':
+            raise ValueError("--format parquet is only available with --export")
+        self.formatter = get_formatter(format_name)
+        self.stdout = None
+        if output_file:
+            self.file = open(output_file, 'w', encoding='utf-8', newline='')
+        else:
+            self.file = self.stdout = sys.stdout
+            sys.stdout = sys.stderr
+
+    def write(self, record: GameRecord):
+        text = self.formatter.format(record.to_dict())
+        self.file.write(text if text.endswith('\n') else text + '\n')
+        self.file.flush()
+
+    def close(self):
+        if self.stdout is None:
+            self.file.close()
+        else:
+            sys.stdout = self.stdout
+            self.stdout = None
+
+def listing_url_from_arg(listing: str, site_url: str = 'https://www.pricecharting.com') -> str:
+    """Accept a console slug (pal-xbox-360), a /console/ path or a full listing URL"""
+    if listing.startswith(('http://', 'https://')):
+        return listing
+    if listing.startswith('/'):
+        return f"{site_url}{listing}"
+    return f"{site_url}/console/{listing}"
+
+def append_history(scraper: PriceChartingScraper, config: Config) -> None:
+    """Append the prices scraped so far to the price history and start a new run"""
+    if not scraper.run_prices:
+        return
+    from src.price_history import PriceHistory
+    history = PriceHistory(Path(config.get('output', 'history_file', default='./history/prices.bin')))
+    rows = history.append_run(scraper.run_prices.items())
+    scraper.run_prices = {}
+    print(f"\nAppended {rows} products to price history {history.path}")
+
+def write_metrics(config: Config) -> None:
+    summary_file = config.get('metrics', 'summary_file')
+    prometheus_file = config.get('metrics', 'prometheus_file')
+    metrics.write(summary_file and Path(summary_file), prometheus_file and Path(prometheus_file))
+    print(f"Metrics written to {summary_file} and {prometheus_file}")
+
+def run_refresh(scraper: PriceChartingScraper, config: Config, url_cache: UrlIdCache, args) -> bool:
+    """Refresh the products that are due under the daily request budget, most valuable first"""
+    import time
+    from src.refresh_scheduler import RefreshScheduler, parse_deadline, seconds_per_request
+
+    scheduler = RefreshScheduler(config, scraper.output_dir)
+    if args.weights:
+        print(f"Loaded weights for {scheduler.load_weights(args.weights)} products")
+    due = [entry for entry in scheduler.plan() if not scraper.failures.blocked(entry.id)]
+    budget = scheduler.remaining_budget()
+    per_request = seconds_per_request(config)
+    deadline = parse_deadline(args.deadline) if args.deadline else None
+    if deadline:
+        budget = min(budget, max(int((deadline - time.time()) / per_request), 0))
+    plan = due[:budget]
+    print(f"Refresh plan: {len(plan)} of {len(due)} due products, {scheduler.remaining_budget()} of "
+          f"{scheduler.daily_budget} requests left today, about {len(plan) * per_request / 60:.0f} minutes")
+
+    if args.plan:
+        with open(args.plan, 'w', encoding='utf-8') as f:
+            f.writelines(f"{entry.id}\n" for entry in plan)
+        print(f"Plan written to {args.plan}")
+        return True
+
+    # Planned products are due even when younger than output.file_age
+    scraper.file_age = 0
+    results = []
+    rate_interval = config.get('metrics', 'rate_interval', default=30)
+    # The budget counts requests, variant pages included, not products
+    requests_before = scraper.rate_limiter.requests
+    try:
+        for entry in plan:
+            if deadline and time.time() + per_request > deadline:
+                print(f"Deadline reached, {len(plan) - len(results)} planned products left for the next run")
+                break
+            if scraper.rate_limiter.requests - requests_before >= budget:
+                print(f"Request budget spent, {len(plan) - len(results)} planned products left for the next run")
+                break
+            results.append(process_url(str(entry.id), scraper, args.scrapevariants, not args.noimages, url_cache))
+            metrics.print_rate_line(rate_interval)
+    finally:
+        scheduler.record_spent(scraper.rate_limiter.requests - requests_before)
+    return all(results)
+
+def run_daemon(scraper: PriceChartingScraper, config: Config, url_cache: UrlIdCache, args) -> int:
+    """Serve scrape jobs until interrupted, see src/daemon.py for the API"""
+    from src.daemon import ScraperDaemon, make_server
+
+    def on_idle():
+        # Queue drained: flush this burst's records, prices and metrics like the end of a CLI run
+        scraper.flush()
+        if not args.nohistory:
+            append_history(scraper, config)
+        else:
+            scraper.run_prices = {}
+        if not args.nometrics:
+            write_metrics(config)
+
+    daemon = ScraperDaemon(
+        scraper,
+        lambda url, scrape_variants, download_images: scrape_url(url, scraper, scrape_variants, download_images, url_cache),
+        lambda url: game_id_from_input(url.strip(), url_cache),
+        on_idle
+    )
+    daemon.start()
+    server = make_server(daemon, args.listen)
+    print(f"Scraper daemon listening on {args.listen}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+def submit_to_daemon(daemon_url: str, inputs: list, scrape_variants: bool, download_images: bool, lookup: bool) -> int:
+    """Send the work of this invocation to a running daemon instead of scraping locally"""
+    import json
+    from urllib.error import HTTPError
+    from urllib.parse import urlencode
+    from urllib.request import Request, urlopen
+
+    daemon_url = daemon_url.rstrip('/')
+    try:
+        if lookup:
+            query = urlencode({'q': inputs[0], 'variants': int(scrape_variants), 'images': int(download_images)})
+            with urlopen(f"{daemon_url}/lookup?{query}") as response:
+                result = json.load(response)
+            print(json.dumps(result['record'], indent=2, ensure_ascii=False))
+            return 0 if result['record'].get('success') else 1
+        body = json.dumps({'inputs': inputs, 'priority': 'batch', 'variants': scrape_variants,
+                           'images': download_images}).encode('utf-8')
+        request = Request(f"{daemon_url}/jobs", data=body, headers={'Content-Type': 'application/json'})
+        with urlopen(request) as response:
+            job = json.load(response)
+        print(f"Queued job {job['id']} with {job['total']} items, progress at {daemon_url}/jobs/{job['id']}")
+        return 0
+    except HTTPError as e:
+        print(f"Daemon error: HTTP {e.code} {e.read().decode('utf-8', 'replace')}", file=sys.stderr)
+        return 1
+
 def main():
     parser = argparse.ArgumentParser(description='Fetch game prices from pricecharting.com')
     group = parser.add_mutually_exclusive_group(required=True)
@@ -90,24 +256,106 @@ def main():
                       help='Game URL (e.g., https://www.pricecharting.com/game/pal-xbox-360/kinect-sports) or numeric ID')
     group.add_argument('--file', type=str,
                       help='File containing list of URLs/IDs to process (one per line)')
+    group.add_argument('--export', type=str, metavar='OUTPUT',
+                      help='Export every cached record into OUTPUT using --format (json writes JSON Lines)')
+    group.add_argument('--listing', type=str,
+                      help='Console listing (e.g. pal-xbox-360) to refresh cached prices from in bulk')
+    group.add_argument('--daemon', action='store_true',
+                      help='Keep running and accept scrape jobs on --listen (see src/daemon.py)')
+    group.add_argument('--refresh', action='store_true',
+                      help='Re-scrape cached products that are due, by value, within refresh.daily_budget')
+    parser.add_argument('--listen', type=str, default='127.0.0.1:8766',
+                      help='Address of the --daemon job API, host:port or unix:/path/to.sock')
+    parser.add_argument('--via', type=str, metavar='DAEMON_URL',
+                      help='Send --url/--file to a running daemon (e.g. http://127.0.0.1:8766) instead of scraping here')
+    parser.add_argument('--weights', type=str,
+                      help='With --refresh, CSV of product IDs (pricecharting_id, else id) with optional weight and in_stock columns')
+    parser.add_argument('--deadline', type=str,
+                      help='With --refresh, finish by this time (HH:MM) or within this duration (e.g. 90m, 4h)')
+    parser.add_argument('--plan', type=str,
+                      help='With --refresh, only write the IDs to refresh to this file (usable with --file)')
     parser.add_argument('--config', type=str, help='Path to config file')
-    parser.add_argument('--format', choices=['json', 'csv'], default='json', help='Output format')
+    parser.add_argument('--format', choices=['json', 'jsonl', 'csv', 'parquet'],
+                      help='Output format of --export (default jsonl), with --url/--file also print each scraped record in it')
+    parser.add_argument('--output', type=str,
+                      help='With --url/--file and --format, write the records to this file instead of stdout')
     parser.add_argument('--scrapevariants', action='store_true', help='Fetch variant data')
     parser.add_argument('--noimages', action='store_true', help='Skip downloading of images')
+    parser.add_argument('--listing-only', action='store_true',
+                      help='With --listing, do not scrape products missing from the cache individually')
+    parser.add_argument('--nohistory', action='store_true', help='Do not append this run\'s prices to the price history')
+    parser.add_argument('--manifest', type=str,
+                      help='Write one "saved|cached<TAB>path" line per file touched in this run to this file')
+    parser.add_argument('--nometrics', action='store_true', help='Do not write the metrics summary and Prometheus textfile')
+    parser.add_argument('--profile', action='store_true',
+                      help='Write a CPU profile and periodic memory snapshots to a run directory under --profile-dir')
+    parser.add_argument('--profile-phases', action='store_true',
+                      help='With --profile, also time each page parsing phase')
+    parser.add_argument('--profile-dir', type=str, default='./profiles', help='Directory for --profile runs')
+    parser.add_argument('--seed-products', type=str,
+                      help='CSV export of the products table to pre-seed the URL to ID cache from')
     
+    profiler = None
+    record_output = None
     try:
         args = parser.parse_args()
+        # Before the first progress print, which goes to stderr while records are on stdout
+        if args.format and (args.url or args.file) and not args.via:
+            record_output = RecordOutput(args.format, args.output)
+
+        if args.via:
+            if not (args.url or args.file):
+                raise ValueError("--via works with --url or --file")
+            if args.url:
+                inputs = [args.url]
+            else:
+                with open(args.file, 'r') as f:
+                    inputs = [line.strip() for line in f if line.strip()]
+            return submit_to_daemon(args.via, inputs, args.scrapevariants, not args.noimages, bool(args.url))
+
+        if args.profile:
+            from src.profiling import RunProfiler
+            profiler = RunProfiler('scraper', Path(args.profile_dir))
+            phases = []
+            if args.profile_phases:
+                phases = [(PriceChartingScraper, name) for name in ('_parse_prices', '_parse_details', '_parse_variants')]
+                # The scraper calls validate_page through its own module namespace
+                phases.append((sys.modules[PriceChartingScraper.__module__], 'validate_page'))
+            profiler.start(phases)
         
         # Initialize configuration
         config = Config(args.config)
         
-        # Initialize scraper
-        scraper = PriceChartingScraper(config)
+        # Initialize scraper, streaming touched files to the manifest instead of keeping them in memory
+        manifest = open(args.manifest, 'w', encoding='utf-8') if args.manifest else None
+        scraper = PriceChartingScraper(config, manifest, keep_index=args.daemon)
+
+        # URL to ID map, seeded from the cached records on first use
+        url_cache_file = scraper.output_dir / 'url_ids.tsv'
+        seed_url_cache = not url_cache_file.exists()
+        url_cache = UrlIdCache(url_cache_file)
+        if seed_url_cache:
+            print(f"Seeded URL cache with {url_cache.seed_from_json_cache(scraper.output_dir)} cached records")
+        if args.seed_products:
+            print(f"Seeded URL cache with {url_cache.seed_from_products_csv(args.seed_products)} products")
         
         success = True
-        if args.url:
+        if args.daemon:
+            return run_daemon(scraper, config, url_cache, args)
+        if args.export:
+            export_format = 'jsonl' if args.format in (None, 'json') else args.format
+            from src.export import export_catalog
+            count = export_catalog(scraper.output_dir, Path(args.export), export_format)
+            print(f"Exported {count} records to {args.export}")
+        elif args.listing:
+            counts = scraper.update_prices_from_listing(listing_url_from_arg(args.listing, scraper.site_url), not args.listing_only)
+            print(f"\nListing: {counts['listed']} products, {counts['updated']} updated from listing, "
+                  f"{counts['scraped']} scraped individually, {counts['missing']} not cached")
+        elif args.refresh:
+            success = run_refresh(scraper, config, url_cache, args)
+        elif args.url:
             # Process single URL
-            success = process_url(args.url, scraper, args.scrapevariants, not args.noimages)
+            success = process_url(args.url, scraper, args.scrapevariants, not args.noimages, url_cache, record_output)
         else:
             # Process URLs from file
             try:
@@ -119,29 +367,46 @@ def main():
                     
                 # Process each URL
                 results = []
+                rate_interval = config.get('metrics', 'rate_interval', default=30)
                 for url in urls:
-                    results.append(process_url(url, scraper, args.scrapevariants, not args.noimages))
+                    results.append(process_url(url, scraper, args.scrapevariants, not args.noimages, url_cache,
+                                               record_output))
+                    metrics.print_rate_line(rate_interval)
                 success = all(results)
                     
             except IOError as e:
                 raise ValueError(f"Could not read URL list file: {e}")
         
+        # Commit the records still held back for group commit
+        scraper.flush()
+
+        # Append the prices scraped in this run to the price history
+        if not args.nohistory:
+            append_history(scraper, config)
+
         # Print summary of files
-        if scraper.cached_files:
-            print("\nCached:")
-            for file_path in scraper.cached_files:
-                print(f"- {file_path}")
-                
-        if scraper.saved_files:
-            print("\nSaved:")
-            for file_path in scraper.saved_files:
-                print(f"- {file_path}")
+        if manifest:
+            manifest.close()
+        print(f"\nCached: {scraper.cached_count} files, Saved: {scraper.saved_count} files")
+        if manifest:
+            print(f"File list written to {args.manifest}")
+
+        # Stage timings and counters of this run
+        print(metrics.rate_line())
+        if not args.nometrics:
+            write_metrics(config)
         
         return 0 if success else 1
         
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         return 1
+    finally:
+        # After the run summary, which also goes to stderr while records are on stdout
+        if record_output:
+            record_output.close()
+        if profiler:
+            profiler.stop()
 
 if __name__ == "__main__":
     sys.exit(main()) 
\ No newline at end of file
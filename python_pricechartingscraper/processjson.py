@@ -3,6 +3,9 @@ import sys
 import os
 import glob
 import argparse
+from pathlib import Path
+from src.profiling import RunProfiler
+from src.record_store import read_record_file
 
 def determine_region_and_validate_rating(url: str, rating: str) -> tuple[str, str]:
     """
@@ -225,10 +228,9 @@ END $$;
 def process_json_file(json_file, ignore_existing=False):
     """Process a single JSON file and return SQL block or None if error"""
     try:
-        with open(json_file, "r") as f:
-            json_data = json.load(f)
+        json_data = read_record_file(json_file)
         return generate_sql_block(json_data, ignore_existing)
-    except (json.JSONDecodeError, IOError) as e:
+    except (ValueError, OSError) as e:
         print(f"Error processing {json_file}: {e}", file=sys.stderr)
         return None
 
@@ -238,9 +240,27 @@ def main():
     parser.add_argument('files', nargs='+', help='JSON file(s) or pattern(s) to process')
     parser.add_argument('--ignore-existing', action='store_true', 
                       help='Skip records that already exist instead of updating them')
+    parser.add_argument('--profile', action='store_true',
+                      help='Write a CPU profile and periodic memory snapshots to a run directory under --profile-dir')
+    parser.add_argument('--profile-phases', action='store_true',
+                      help='With --profile, also time loading and SQL generation per file')
+    parser.add_argument('--profile-dir', type=str, default='./profiles', help='Directory for --profile runs')
     
     args = parser.parse_args()
 
+    profiler = None
+    if args.profile:
+        profiler = RunProfiler('processjson', Path(args.profile_dir))
+        module = sys.modules[__name__]
+        profiler.start([(module, 'process_json_file'), (module, 'generate_sql_block')] if args.profile_phases else [])
+    try:
+        process_files(args)
+    finally:
+        if profiler:
+            profiler.stop()
+
+def process_files(args):
+    """Write the SQL blocks of all files matching args.files to insert.txt"""
     # Clear/create insert.txt
     with open("insert.txt", "w") as f:
         f.write("-- Generated SQL inserts\n\n")
@@ -0,0 +1,224 @@
+"""Long-running scraper daemon with a local HTTP job API"""
+
+import itertools
+import json
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+from .metrics import metrics
+from .record import GameRecord
+
+# Lower runs first: single lookups jump ahead of queued batch refreshes
+PRIORITIES = {'interactive': 0, 'batch': 10}
+
+LOOKUP_TIMEOUT = 300  # Seconds a lookup request waits for its scrape
+FINISHED_JOBS_KEPT = 1000
+
+class Job:
+    def __init__(self, job_id: int, inputs: List[str], priority: str, scrape_variants: bool, download_images: bool):
+        self.id = job_id
+        self.inputs = inputs
+        self.priority = priority
+        self.scrape_variants = scrape_variants
+        self.download_images = download_images
+        self.created = time.time()
+        self.finished = None
+        self.done = 0
+        self.failed = 0
+        self.results: Dict[str, GameRecord] = {}  # Only kept for interactive jobs
+        self.event = threading.Event()
+
+    def task_done(self, raw: str, record: Optional[GameRecord]):
+        self.done += 1
+        if record is None or not record.success:
+            self.failed += 1
+        if self.priority == 'interactive' and record is not None:
+            self.results[raw] = record
+        if self.done == len(self.inputs):
+            self.finished = time.time()
+            self.event.set()
+
+    def status(self) -> Dict:
+        return {
+            'id': self.id,
+            'priority': self.priority,
+            'total': len(self.inputs),
+            'done': self.done,
+            'failed': self.failed,
+            'created': self.created,
+            'finished': self.finished
+        }
+
+class ScraperDaemon:
+    """
+    Runs every scrape of the process on one worker thread
+
+    All jobs therefore share the scraper's HTTP session, rate limiter and
+    in-memory record index. Fresh records are answered directly from the
+    index by the request threads without queueing.
+    """
+
+    def __init__(self, scraper, process: Callable[[str, bool, bool], GameRecord],
+                 resolve_offline: Callable[[str], Optional[int]], on_idle: Callable[[], None]):
+        self.scraper = scraper
+        self.process = process
+        self.resolve_offline = resolve_offline
+        self.on_idle = on_idle
+        self.queue: 'queue.PriorityQueue' = queue.PriorityQueue()
+        self.sequence = itertools.count()
+        self.job_ids = itertools.count(1)
+        self.jobs: Dict[int, Job] = {}
+        self.lock = threading.Lock()
+        self.worker = threading.Thread(target=self._work, name='scraper-worker', daemon=True)
+
+    def start(self):
+        self.worker.start()
+
+    def lookup_fresh(self, raw: str) -> Optional[GameRecord]:
+        game_id = self.resolve_offline(raw)
+        if game_id is None:
+            return None
+        return self.scraper.fresh_record(game_id)
+
+    def submit(self, inputs: List[str], priority: str = 'batch', scrape_variants: bool = False,
+               download_images: bool = True) -> Job:
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        with self.lock:
+            job = Job(next(self.job_ids), inputs, priority, scrape_variants, download_images)
+            self.jobs[job.id] = job
+            self._forget_finished_jobs()
+        for raw in inputs:
+            self.queue.put((PRIORITIES[priority], next(self.sequence), job, raw))
+        if not inputs:
+            job.finished = time.time()
+            job.event.set()
+        return job
+
+    def _forget_finished_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - FINISHED_JOBS_KEPT, 0)]:
+            del self.jobs[job_id]
+
+    def _work(self):
+        while True:
+            _, _, job, raw = self.queue.get()
+            record = None
+            try:
+                record = self.process(raw, job.scrape_variants, job.download_images)
+            except Exception as e:
+                print(f"Error processing {raw}: {e}", file=sys.stderr)
+                metrics.count('errors', stage='daemon')
+            job.task_done(raw, record)
+            if self.queue.empty():
+                try:
+                    self.on_idle()
+                except Exception as e:
+                    print(f"Error flushing run data: {e}", file=sys.stderr)
+
+    def status(self) -> Dict:
+        with self.lock:
+            active = [job.status() for job in self.jobs.values() if not job.finished]
+        return {
+            'queued': self.queue.qsize(),
+            'active_jobs': active,
+            'index_size': len(self.scraper.index or {}),
+            'metrics': metrics.summary()
+        }
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    """
+    GET  /lookup?q=<id or url>[&variants=1][&images=0]  record, from the index if fresh
+    POST /jobs {"inputs": [...], "priority": "batch", "variants": false, "images": true}
+    GET  /jobs/<id>                                      job progress
+    GET  /status                                         queue, active jobs and metrics
+    """
+
+    daemon: ScraperDaemon = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if url.path == '/lookup':
+            self._lookup(query)
+        elif url.path == '/status':
+            self._send(200, self.daemon.status())
+        elif url.path.startswith('/jobs/') and url.path[6:].isdigit():
+            job = self.daemon.jobs.get(int(url.path[6:]))
+            if job:
+                self._send(200, job.status())
+            else:
+                self._send(404, {'error': 'Unknown job'})
+        else:
+            self._send(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/jobs':
+            self._send(404, {'error': 'Not found'})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            inputs = [str(value).strip() for value in body.get('inputs', []) if str(value).strip()]
+            job = self.daemon.submit(inputs, body.get('priority', 'batch'),
+                                     bool(body.get('variants', False)), bool(body.get('images', True)))
+        except (ValueError, AttributeError) as e:
+            self._send(400, {'error': str(e)})
+            return
+        self._send(202, job.status())
+
+    def _lookup(self, query: Dict[str, str]):
+        raw = query.get('q', '').strip()
+        if not raw:
+            self._send(400, {'error': 'Missing q parameter'})
+            return
+        scrape_variants = query.get('variants') == '1'
+        if not scrape_variants:
+            record = self.daemon.lookup_fresh(raw)
+            if record is not None:
+                metrics.count('daemon_lookups', result='index')
+                self._send(200, {'cached': True, 'record': record.to_dict()})
+                return
+        metrics.count('daemon_lookups', result='scrape')
+        job = self.daemon.submit([raw], 'interactive', scrape_variants, query.get('images', '1') != '0')
+        if not job.event.wait(LOOKUP_TIMEOUT):
+            self._send(504, {'error': 'Lookup timed out', 'job': job.id})
+            return
+        record = job.results.get(raw)
+        if record is None:
+            self._send(502, {'error': f"Could not process {raw}"})
+        else:
+            self._send(200, {'cached': False, 'record': record.to_dict()})
+
+    def _send(self, status: int, payload: Dict):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Unix socket clients have no address, and per-request lines would drown the scrape output
+        pass
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def make_server(daemon: ScraperDaemon, listen: str):
+    """Serve the job API on host:port, or on a Unix socket given as unix:/path/to.sock"""
+    handler = type('Handler', (DaemonHandler,), {'daemon': daemon})
+    if listen.startswith('unix:'):
+        path = listen[5:]
+        if os.path.exists(path):
+            os.unlink(path)
+        return ThreadingUnixHTTPServer(path, handler)
+    host, _, port = listen.rpartition(':')
+    server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), handler)
+    server.daemon_threads = True
+    return server
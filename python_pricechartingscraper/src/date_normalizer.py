@@ -1,17 +1,132 @@
 """Date normalization utilities"""
 
-from datetime import datetime
-from typing import Optional
-from dateutil import parser as date_parser
+import calendar
+import functools
+import re
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Callable, List, Optional, Tuple
+
+@functools.lru_cache(maxsize=None)
+def _parser_info():
+    # dateutil is only imported once a release date is actually parsed
+    from dateutil import parser as date_parser
+    return date_parser.parserinfo()
+
+def _month(name: str) -> int:
+    # Month names exactly as dateutil accepts them (case-insensitive, "Sept" etc.)
+    month = _parser_info().month(name)
+    if month is None:
+        raise ValueError(f"Unknown month: {name}")
+    return month
+
+def _clamped(year: int, month: int, day: int) -> date:
+    """Date with the day clamped to the month length, as dateutil fills in defaults"""
+    return date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+class DateFormat:
+    """
+    A date shape PriceCharting uses, parsed without dateutil
+
+    build() gets the regex match and the default date dateutil would fill
+    missing fields from (today). complete formats don't depend on that default,
+    so their results can be memoized.
+    """
+
+    def __init__(self, name: str, pattern: str, build: Callable[[re.Match, date], date], complete: bool):
+        self.name = name
+        self.regex = re.compile(pattern, re.ASCII)
+        self.build = build
+        self.complete = complete
+        self.hits = 0
+
+# The shapes seen on PriceCharting product pages, e.g. "November 16, 2010" and "2010"
+DATE_FORMATS = [
+    DateFormat('month day, year', r'\s*([A-Za-z]+)\s+(\d{1,2}),?\s+(\d{4})\s*',
+               lambda m, today: date(int(m.group(3)), _month(m.group(1)), int(m.group(2))), True),
+    DateFormat('year', r'\s*(\d{4})\s*',
+               lambda m, today: _clamped(int(m.group(1)), today.month, today.day), False),
+    DateFormat('month year', r'\s*([A-Za-z]+)\s+(\d{4})\s*',
+               lambda m, today: _clamped(int(m.group(2)), _month(m.group(1)), today.day), False),
+    DateFormat('iso', r'\s*(\d{4})-(\d{2})-(\d{2})\s*',
+               lambda m, today: date(int(m.group(1)), int(m.group(2)), int(m.group(3))), True),
+]
+
+# Results of two parses with these defaults only agree if the string fully specifies the date
+_PROBE_DEFAULTS = (datetime(2003, 2, 3), datetime(2004, 11, 28))
 
 class DateNormalizer:
-    @staticmethod
-    def normalize_date(date_str: str) -> Optional[str]:
+    """
+    Normalizes release dates to YYYY-MM-DD
+
+    Known shapes are matched by precompiled regexes, tried in order of how
+    often they hit so far. Everything else goes to dateutil, so the output is
+    always what dateutil.parser.parse would give. Results that don't depend on
+    today's date are memoized in a bounded LRU.
+    """
+
+    CACHE_SIZE = 4096
+
+    _formats: List[DateFormat] = DATE_FORMATS
+    _cache: 'OrderedDict[str, Optional[str]]' = OrderedDict()
+    _lock = threading.Lock()
+    fallbacks = 0
+
+    @classmethod
+    def normalize_date(cls, date_str: str) -> Optional[str]:
         """Convert various date formats to YYYY-MM-DD"""
         if not date_str or date_str.lower() in ['none', 'tba', 'n/a']:
             return None
+        with cls._lock:
+            if date_str in cls._cache:
+                cls._cache.move_to_end(date_str)
+                return cls._cache[date_str]
+
+        result, cacheable = cls._parse(date_str)
+        if cacheable:
+            with cls._lock:
+                cls._cache[date_str] = result
+                if len(cls._cache) > cls.CACHE_SIZE:
+                    cls._cache.popitem(last=False)
+        return result
+
+    @classmethod
+    def _parse(cls, date_str: str) -> Tuple[Optional[str], bool]:
+        """Returns (normalized date, whether the result may be memoized)"""
+        for date_format in cls._formats:
+            match = date_format.regex.fullmatch(date_str)
+            if not match:
+                continue
+            try:
+                parsed_date = date_format.build(match, date.today())
+            except ValueError:
+                # Unknown month or out of range day, let dateutil decide
+                break
+            cls._learn(date_format)
+            return parsed_date.strftime('%Y-%m-%d'), date_format.complete
+        return cls._parse_fallback(date_str)
+
+    @classmethod
+    def _learn(cls, date_format: DateFormat):
+        date_format.hits += 1
+        # Keep the most frequent shapes first, the list only has a handful of entries
+        with cls._lock:
+            cls._formats = sorted(cls._formats, key=lambda f: f.hits, reverse=True)
+
+    @classmethod
+    def _parse_fallback(cls, date_str: str) -> Tuple[Optional[str], bool]:
+        from dateutil import parser as date_parser
+        cls.fallbacks += 1
+        try:
+            probes = [date_parser.parse(date_str, default=default).date() for default in _PROBE_DEFAULTS]
+            if probes[0] == probes[1]:
+                return probes[0].strftime('%Y-%m-%d'), True
+        except (ValueError, TypeError):
+            # May depend on the default too (e.g. a day that only exists in some months)
+            pass
         try:
             parsed_date = date_parser.parse(date_str)
-            return parsed_date.strftime('%Y-%m-%d')
+            return parsed_date.strftime('%Y-%m-%d'), False
         except (ValueError, TypeError):
-            return None 
\ No newline at end of file
+            return None, False
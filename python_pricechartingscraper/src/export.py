@@ -0,0 +1,146 @@
+"""Bulk export of the scrape cache into a single CSV, JSON Lines or Parquet file"""
+
+import csv
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+from .record_store import iter_record_files, read_record_file
+from .scraper import PriceChartingScraper
+
+# Fixed column layout shared by every export format and the CSV formatter
+RECORD_FIELDS = ['id', 'success', 'product_name', 'variant_name', 'combined_name',
+                 'pricecharting_url', 'image_url']
+PRICE_FIELDS = list(PriceChartingScraper.PRICE_TYPE_MAP.values())
+DETAIL_FIELDS = list(dict.fromkeys(
+    [field['field_name'] for field in PriceChartingScraper.BASE_DETAIL_FIELDS.values()] + ['rating']
+))
+LIST_DETAIL_FIELDS = ['ean_gtin', 'upc', 'asin', 'epid']
+EXPORT_COLUMNS = (RECORD_FIELDS
+                  + [f"price_{field}" for field in PRICE_FIELDS]
+                  + [f"detail_{field}" for field in DETAIL_FIELDS])
+
+EXPORT_FORMATS = ['csv', 'jsonl', 'parquet']
+
+def flatten_record(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a cached record into the fixed export columns, missing values become None"""
+    row = {field: data.get(field) for field in RECORD_FIELDS}
+    prices = data.get('prices') or {}
+    details = data.get('details') or {}
+    for field in PRICE_FIELDS:
+        row[f"price_{field}"] = prices.get(field)
+    for field in DETAIL_FIELDS:
+        value = details.get(field)
+        if field in LIST_DETAIL_FIELDS and value is None:
+            value = []
+        row[f"detail_{field}"] = value
+    return row
+
+def iter_cached_records(json_dir: Path, include_errors: bool = False) -> Iterator[Dict[str, Any]]:
+    """Yield every cached record in ID order, one file in memory at a time"""
+    for game_id, path in sorted(iter_record_files(json_dir)):
+        try:
+            data = read_record_file(path)
+        except (ValueError, OSError) as e:
+            print(f"Warning: Skipping unreadable cache file {path}: {e}")
+            continue
+        if not data.get('success') and not include_errors:
+            continue
+        # Error records don't carry their ID, the file name does
+        data.setdefault('id', game_id)
+        yield data
+
+def csv_row(row: Dict[str, Any]) -> List[Any]:
+    """Cells of a flattened record in EXPORT_COLUMNS order, lists comma-joined and None empty"""
+    return [
+        ','.join(value) if isinstance(value, list) else ('' if value is None else value)
+        for value in (row[column] for column in EXPORT_COLUMNS)
+    ]
+
+class CSVExportWriter:
+    def __init__(self, output_path: Path):
+        self.file = open(output_path, 'w', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(EXPORT_COLUMNS)
+
+    def write(self, row: Dict[str, Any]):
+        self.writer.writerow(csv_row(row))
+
+    def close(self):
+        self.file.close()
+
+class JSONLinesExportWriter:
+    def __init__(self, output_path: Path):
+        self.file = open(output_path, 'w', encoding='utf-8')
+
+    def write(self, row: Dict[str, Any]):
+        self.file.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    def close(self):
+        self.file.close()
+
+class ParquetExportWriter:
+    """Buffers chunk_size rows and writes each chunk as a Parquet row group"""
+
+    def __init__(self, output_path: Path, chunk_size: int):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet export requires the 'pyarrow' package (pip install pyarrow)")
+        self.pa = pa
+        fields = []
+        for column in EXPORT_COLUMNS:
+            if column == 'id':
+                fields.append(pa.field(column, pa.int64()))
+            elif column == 'success':
+                fields.append(pa.field(column, pa.bool_()))
+            elif column.startswith('price_'):
+                fields.append(pa.field(column, pa.float64()))
+            elif column.removeprefix('detail_') in LIST_DETAIL_FIELDS:
+                fields.append(pa.field(column, pa.list_(pa.string())))
+            else:
+                fields.append(pa.field(column, pa.string()))
+        self.schema = pa.schema(fields)
+        self.writer = pq.ParquetWriter(str(output_path), self.schema, compression='zstd')
+        self.chunk_size = chunk_size
+        self.buffer: Dict[str, List[Any]] = {column: [] for column in EXPORT_COLUMNS}
+        self.buffered = 0
+
+    def write(self, row: Dict[str, Any]):
+        for column in EXPORT_COLUMNS:
+            self.buffer[column].append(row[column])
+        self.buffered += 1
+        if self.buffered >= self.chunk_size:
+            self._flush()
+
+    def _flush(self):
+        if not self.buffered:
+            return
+        self.writer.write_table(self.pa.Table.from_pydict(self.buffer, schema=self.schema))
+        self.buffer = {column: [] for column in EXPORT_COLUMNS}
+        self.buffered = 0
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+
+def export_catalog(json_dir: Path, output_path: Path, export_format: str,
+                   chunk_size: int = 10000, include_errors: bool = False) -> int:
+    """Stream every cached record into output_path, returns the number of exported records"""
+    if export_format == 'csv':
+        writer = CSVExportWriter(output_path)
+    elif export_format == 'jsonl':
+        writer = JSONLinesExportWriter(output_path)
+    elif export_format == 'parquet':
+        writer = ParquetExportWriter(output_path, chunk_size)
+    else:
+        raise ValueError(f"Unknown export format: {export_format}")
+
+    count = 0
+    try:
+        for data in iter_cached_records(json_dir, include_errors):
+            writer.write(flatten_record(data))
+            count += 1
+    finally:
+        writer.close()
+    return count
@@ -0,0 +1,138 @@
+"""Negative cache of failed product requests, classified with their own TTLs"""
+
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+# Why a product could not be scraped:
+# - permanent: the product doesn't exist (404/410, error page or ID mismatch)
+# - retryable: server errors, timeouts and connection failures
+# - throttled: the site asked us to slow down (429, 403), for Retry-After if sent
+FAILURE_KINDS = ('permanent', 'retryable', 'throttled')
+
+# Sorted by ID, so the whole ID space costs 26 bytes per failed product
+FAILURE_DTYPE = np.dtype([
+    ('id', '<i8'), ('kind', 'u1'), ('attempts', '<u2'), ('first', '<f8'), ('retry_at', '<f8')
+])
+
+# Default (first TTL, maximum TTL) in seconds, doubled with every further attempt
+DEFAULT_TTLS = {
+    'permanent': (30 * 86400, 180 * 86400),
+    'retryable': (900, 86400),
+    'throttled': (600, 3600)
+}
+
+class FailureCache:
+    """
+    Failed IDs with their failure kind, consecutive attempts and retry time
+
+    Loaded failures live in sorted numpy columns looked up by binary search,
+    failures and recoveries of this run in a small dict that save() merges in.
+    """
+
+    def __init__(self, path: Path, ttls: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.path = Path(path)
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.rows = self._load()
+        self.changes: Dict[int, Optional[tuple]] = {}  # game_id -> (kind, attempts, first, retry_at), None when cleared
+
+    def _load(self) -> np.ndarray:
+        if not self.path.exists():
+            return np.zeros(0, dtype=FAILURE_DTYPE)
+        try:
+            rows = np.load(self.path, allow_pickle=False)
+        except (ValueError, OSError) as e:
+            print(f"Warning: Ignoring unreadable failure cache {self.path}: {e}")
+            return np.zeros(0, dtype=FAILURE_DTYPE)
+        if rows.dtype != FAILURE_DTYPE:
+            print(f"Warning: Ignoring failure cache {self.path} with another layout")
+            return np.zeros(0, dtype=FAILURE_DTYPE)
+        return rows
+
+    def get(self, game_id: int) -> Optional[Tuple[str, int, float, float]]:
+        """(kind, attempts, first failure time, retry time) of a failed ID, else None"""
+        if game_id in self.changes:
+            return self.changes[game_id]
+        index = np.searchsorted(self.rows['id'], game_id)
+        if index < len(self.rows) and self.rows['id'][index] == game_id:
+            row = self.rows[index]
+            return FAILURE_KINDS[row['kind']], int(row['attempts']), float(row['first']), float(row['retry_at'])
+        return None
+
+    def blocked(self, game_id: int, now: Optional[float] = None) -> Optional[Tuple[str, float]]:
+        """(kind, retry time) if game_id failed and must not be requested yet"""
+        entry = self.get(game_id)
+        if entry and (time.time() if now is None else now) < entry[3]:
+            return entry[0], entry[3]
+        return None
+
+    def record(self, game_id: int, kind: str, retry_after: Optional[float] = None) -> float:
+        """Count a failed request, returns the time it may be retried"""
+        if kind not in FAILURE_KINDS:
+            raise ValueError(f"Unknown failure kind: {kind}")
+        now = time.time()
+        entry = self.get(game_id)
+        attempts = entry[1] + 1 if entry else 1
+        first = entry[2] if entry else now
+        if retry_after is not None:
+            ttl = retry_after
+        else:
+            base, maximum = self.ttls[kind]
+            ttl = min(base * 2 ** min(attempts - 1, 32), maximum)
+        self.changes[game_id] = (kind, attempts, first, now + ttl)
+        return now + ttl
+
+    def clear(self, game_id: int):
+        """Forget the failures of an ID that was scraped successfully"""
+        if self.get(game_id) is not None:
+            self.changes[game_id] = None
+
+    def merge(self, other: 'FailureCache') -> int:
+        """Take over the failures of another cache (e.g. a crawl worker's) that retry later than ours"""
+        merged = 0
+        entries = {int(row['id']): (FAILURE_KINDS[row['kind']], int(row['attempts']), float(row['first']), float(row['retry_at']))
+                   for row in other.rows}
+        entries.update(other.changes)
+        for game_id, entry in entries.items():
+            ours = self.get(game_id)
+            if entry and (ours is None or entry[3] > ours[3]):
+                self.changes[game_id] = entry
+                merged += 1
+        return merged
+
+    def counts(self) -> Dict[str, int]:
+        counts = dict.fromkeys(FAILURE_KINDS, 0)
+        changed = np.fromiter(self.changes, dtype='<i8', count=len(self.changes))
+        unchanged = self.rows[~np.isin(self.rows['id'], changed)]
+        for code, kind in enumerate(FAILURE_KINDS):
+            counts[kind] = int(np.count_nonzero(unchanged['kind'] == code))
+        for entry in self.changes.values():
+            if entry:
+                counts[entry[0]] += 1
+        return counts
+
+    def save(self) -> int:
+        """Merge this run's changes and write the cache atomically, returns the number of failed IDs"""
+        if not self.changes:
+            return len(self.rows)
+        changed = np.fromiter(self.changes, dtype='<i8', count=len(self.changes))
+        added = [(game_id, FAILURE_KINDS.index(entry[0]), entry[1], entry[2], entry[3])
+                 for game_id, entry in self.changes.items() if entry]
+        rows = np.concatenate([
+            self.rows[~np.isin(self.rows['id'], changed)],
+            np.array(added, dtype=FAILURE_DTYPE)
+        ])
+        rows.sort(order='id')
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_name(f".{self.path.name}.tmp")
+        with open(temp_path, 'wb') as f:
+            np.save(f, rows, allow_pickle=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self.rows = rows
+        self.changes = {}
+        return len(rows)
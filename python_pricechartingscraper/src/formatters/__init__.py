@@ -0,0 +1,18 @@
+"""Output formatters"""
+
+from .base import BaseFormatter
+from .csv_formatter import CSVFormatter
+from .json_formatter import JSONFormatter, JSONLinesFormatter
+
+FORMATTERS = {
+    'json': JSONFormatter,
+    'jsonl': JSONLinesFormatter,
+    'csv': CSVFormatter
+}
+
+def get_formatter(format_name: str) -> BaseFormatter:
+    """Return a formatter instance for the given format name"""
+    try:
+        return FORMATTERS[format_name]()
+    except KeyError:
+        raise ValueError(f"Unknown output format: {format_name}")
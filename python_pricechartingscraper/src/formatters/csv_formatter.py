@@ -4,22 +4,19 @@ import csv
 from io import StringIO
 from typing import Dict, Any
 from .base import BaseFormatter
+from ..export import EXPORT_COLUMNS, csv_row, flatten_record
 
 class CSVFormatter(BaseFormatter):
+    """Rows in the --export column layout, the header only before the first record"""
+
+    def __init__(self):
+        self.header_written = False
+
     def format(self, data: Dict[str, Any]) -> str:
         output = StringIO()
         writer = csv.writer(output)
-        
-        # Write headers
-        headers = ['success', 'image_url']
-        headers.extend(f"price_{k}" for k in data.get('prices', {}).keys())
-        headers.extend(f"detail_{k}" for k in data.get('details', {}).keys())
-        writer.writerow(headers)
-        
-        # Write data
-        row = [data['success'], data['image_url']]
-        row.extend(str(data['prices'].get(k, '')) for k in data.get('prices', {}).keys())
-        row.extend(str(data['details'].get(k, '')) for k in data.get('details', {}).keys())
-        writer.writerow(row)
-        
-        return output.getvalue() 
\ No newline at end of file
+        if not self.header_written:
+            writer.writerow(EXPORT_COLUMNS)
+            self.header_written = True
+        writer.writerow(csv_row(flatten_record(data)))
+        return output.getvalue()
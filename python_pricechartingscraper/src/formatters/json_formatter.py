@@ -9,4 +9,10 @@ class JSONFormatter(BaseFormatter):
         self.pretty = pretty
 
     def format(self, data: Dict[str, Any]) -> str:
-        return json.dumps(data, indent=2 if self.pretty else None) 
\ No newline at end of file
+        return json.dumps(data, indent=2 if self.pretty else None)
+
+class JSONLinesFormatter(JSONFormatter):
+    """One compact JSON document per record"""
+
+    def __init__(self):
+        super().__init__(pretty=False)
@@ -0,0 +1,186 @@
+"""Run metrics: per-stage timers, counters and their JSON/Prometheus export"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Histogram bucket upper bounds in seconds, from a quick parse to a slow image download
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PROMETHEUS_PREFIX = 'pricecharting_scraper'
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # Last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate quantile: upper bound of the bucket the q-th observation falls in"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS + (self.max,), self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'total_seconds': round(self.sum, 6),
+            'mean_seconds': round(self.sum / self.count, 6) if self.count else None,
+            'p50_seconds': self.quantile(0.5),
+            'p95_seconds': self.quantile(0.95),
+            'max_seconds': round(self.max, 6)
+        }
+
+class Metrics:
+    """
+    Collects timings per stage (rate_limit_wait, http_request, html_parse,
+    extract, save, image_download, image_transcode) and labelled counters
+    (cache, http_responses, image_responses, errors) for one run
+
+    Thread-safe: the daemon updates them from its worker thread while HTTP
+    handler threads read the summary.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.stages: Dict[str, Histogram] = {}
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], int] = {}
+        self._last_rate_line = time.monotonic()
+        # Reentrant, summary() and prometheus() read the counters through counter()
+        self._lock = threading.RLock()
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages.setdefault(stage, Histogram()).observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def count(self, name: str, amount: int = 1, **labels):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def counter(self, name: str, **labels) -> int:
+        """Value of one counter, summed over all label sets if no labels are given"""
+        with self._lock:
+            if labels:
+                return self.counters.get((name, tuple(sorted((k, str(v)) for k, v in labels.items()))), 0)
+            return sum(value for (counter_name, _), value in self.counters.items() if counter_name == name)
+
+    def elapsed(self) -> float:
+        return time.time() - self.started
+
+    def requests_per_minute(self) -> float:
+        elapsed = self.elapsed()
+        return self.counter('http_responses') * 60 / elapsed if elapsed > 0 else 0.0
+
+    def rate_line(self) -> str:
+        hits = self.counter('cache', result='hit')
+        misses = self.counter('cache', result='miss')
+        return (f"[rate] {self.counter('http_responses')} requests in {self.elapsed():.0f}s, "
+                f"{self.requests_per_minute():.1f} req/min, cache {hits} hit/{misses} miss, "
+                f"{self.counter('errors')} errors")
+
+    def print_rate_line(self, interval: float = 30.0, force: bool = False):
+        """Print the rate line at most every interval seconds"""
+        now = time.monotonic()
+        if force or now - self._last_rate_line >= interval:
+            self._last_rate_line = now
+            print(self.rate_line())
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return self._summary()
+
+    def _summary(self) -> Dict:
+        counters: Dict[str, List[Dict]] = {}
+        for (name, labels), value in sorted(self.counters.items()):
+            counters.setdefault(name, []).append({'labels': dict(labels), 'value': value})
+        return {
+            'started': self.started,
+            'duration_seconds': round(self.elapsed(), 3),
+            'requests_per_minute': round(self.requests_per_minute(), 3),
+            'stages': {stage: histogram.to_dict() for stage, histogram in sorted(self.stages.items())},
+            'counters': counters
+        }
+
+    def prometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format, for the node_exporter textfile collector"""
+        with self._lock:
+            return self._prometheus()
+
+    def _prometheus(self) -> str:
+        p = PROMETHEUS_PREFIX
+        lines = [
+            f"# HELP {p}_stage_seconds Time spent per scraper stage",
+            f"# TYPE {p}_stage_seconds histogram"
+        ]
+        for stage, histogram in sorted(self.stages.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS + (float('inf'),), histogram.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{p}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+        names = sorted({name for name, _ in self.counters})
+        for name in names:
+            lines.append(f"# TYPE {p}_{name}_total counter")
+            for (counter_name, labels), value in sorted(self.counters.items()):
+                if counter_name != name:
+                    continue
+                label_str = ','.join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{p}_{name}_total{{{label_str}}} {value}" if label_str else f"{p}_{name}_total {value}")
+
+        lines += [
+            f"# TYPE {p}_requests_per_minute gauge",
+            f"{p}_requests_per_minute {self.requests_per_minute():.3f}",
+            f"# TYPE {p}_run_duration_seconds gauge",
+            f"{p}_run_duration_seconds {self.elapsed():.3f}",
+            f"# TYPE {p}_last_run_timestamp_seconds gauge",
+            f"{p}_last_run_timestamp_seconds {time.time():.0f}"
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def write(self, summary_file: Optional[Path] = None, prometheus_file: Optional[Path] = None):
+        """Write the JSON summary and/or Prometheus textfile, each replaced atomically"""
+        if summary_file:
+            _write_atomic(Path(summary_file), json.dumps(self.summary(), indent=2))
+        if prometheus_file:
+            _write_atomic(Path(prometheus_file), self.prometheus())
+
+def _write_atomic(path: Path, content: str):
+    # The textfile collector may read at any time, so never expose a partial file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+# Shared by the scraper, rate limiter and image download of a run
+metrics = Metrics()
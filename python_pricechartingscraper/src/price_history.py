@@ -0,0 +1,180 @@
+"""Append-only, memory-mapped price history across scrape runs"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence, Tuple, Union
+import numpy as np
+from .record import PRICE_FIELDS
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are not locked against other processes
+    fcntl = None
+
+# One fixed-size row per product per run: run timestamp, product ID and a
+# float32 price per price type (NaN when missing). Rows of a run are appended
+# together and sorted by ID, runs are appended in time order.
+ROW_DTYPE = np.dtype(
+    [('timestamp', '<f8'), ('id', '<i8')] + [(name, '<f4') for name in PRICE_FIELDS]
+)
+
+# The file starts with a JSON header padded to HEADER_SIZE bytes describing
+# the row layout, so a file written with other price types is never misread
+HEADER_SIZE = 512
+MAGIC = 'pricehistory'
+
+@contextmanager
+def _locked(f, exclusive: bool):
+    """flock the open history file, writers exclusively and readers shared"""
+    if fcntl is None:
+        yield
+        return
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+    try:
+        yield
+    finally:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+class PriceHistory:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        if self.path.exists():
+            self._check_header()
+
+    def _header(self) -> bytes:
+        header = json.dumps({'magic': MAGIC, 'version': 1, 'fields': list(ROW_DTYPE.names)}).encode('utf-8')
+        if len(header) >= HEADER_SIZE:
+            raise ValueError("Price history header does not fit into HEADER_SIZE")
+        return header.ljust(HEADER_SIZE, b' ')
+
+    def _check_header(self):
+        with open(self.path, 'rb') as f:
+            raw = f.read(HEADER_SIZE)
+        if len(raw) < HEADER_SIZE:
+            # Empty or torn while being created, append_run writes the header again
+            return
+        try:
+            header = json.loads(raw.decode('utf-8'))
+        except ValueError:
+            raise ValueError(f"{self.path} is not a price history file")
+        if header.get('magic') != MAGIC or header.get('fields') != list(ROW_DTYPE.names):
+            raise ValueError(f"{self.path} was written with a different price layout")
+
+    def append_run(self, records: Iterable[Tuple[int, Union[Dict, Sequence]]],
+                   timestamp: Optional[float] = None) -> int:
+        """
+        Append one run's snapshot of (game_id, prices) pairs, returns the rows written
+
+        prices is either a dict or a GameRecord.prices tuple in PRICE_FIELDS order.
+
+        Only the last pair per ID is kept. The whole run is written with a
+        single fsynced append under an exclusive lock, and rows() only maps
+        whole rows under a shared one, so readers never see half a run. A torn
+        tail left by a crashed writer is truncated before appending.
+
+        The timestamp is fixed under the lock and moved past the last run on
+        disk if needed, so concurrent writers still append runs in time order.
+        """
+        latest = dict(records)
+        if not latest:
+            return 0
+        rows = np.zeros(len(latest), dtype=ROW_DTYPE)
+        rows['id'] = sorted(latest)
+        for i, game_id in enumerate(rows['id']):
+            prices = latest[int(game_id)] or {}
+            if not isinstance(prices, dict):
+                prices = dict(zip(PRICE_FIELDS, prices))
+            for name in PRICE_FIELDS:
+                value = prices.get(name)
+                rows[name][i] = np.nan if value is None else value
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'ab') as f, _locked(f, exclusive=True):
+            # Decided under the lock, so concurrent writers never both write a header
+            size = os.fstat(f.fileno()).st_size
+            last_timestamp = None
+            if size < HEADER_SIZE:
+                f.truncate(0)
+                f.write(self._header())
+            else:
+                self._check_header()
+                whole = HEADER_SIZE + (size - HEADER_SIZE) // ROW_DTYPE.itemsize * ROW_DTYPE.itemsize
+                if whole != size:
+                    f.truncate(whole)
+                last_timestamp = self._last_timestamp(whole)
+            timestamp = time.time() if timestamp is None else timestamp
+            if last_timestamp is not None and timestamp <= last_timestamp:
+                timestamp = float(np.nextafter(last_timestamp, np.inf))
+            rows['timestamp'] = timestamp
+            f.write(rows.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        return len(rows)
+
+    def _last_timestamp(self, size: int) -> Optional[float]:
+        """Timestamp of the last whole row of a size bytes long file, None without rows"""
+        if size <= HEADER_SIZE:
+            return None
+        with open(self.path, 'rb') as f:
+            f.seek(size - ROW_DTYPE.itemsize)
+            return float(np.frombuffer(f.read(ROW_DTYPE.itemsize), dtype=ROW_DTYPE)['timestamp'][0])
+
+    def rows(self) -> np.ndarray:
+        """All rows as a read-only memory map (empty array if nothing was recorded)"""
+        try:
+            with open(self.path, 'rb') as f, _locked(f, exclusive=False):
+                size = os.fstat(f.fileno()).st_size
+        except FileNotFoundError:
+            return np.zeros(0, dtype=ROW_DTYPE)
+        # Only whole rows, a torn tail of a crashed append is ignored
+        count = max(size - HEADER_SIZE, 0) // ROW_DTYPE.itemsize
+        if not count:
+            return np.zeros(0, dtype=ROW_DTYPE)
+        return np.memmap(self.path, dtype=ROW_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+
+    def runs(self) -> np.ndarray:
+        """Timestamps of all recorded runs, oldest first"""
+        return np.unique(self.rows()['timestamp'])
+
+    def run(self, timestamp: float) -> np.ndarray:
+        """Rows of a single run, sorted by ID"""
+        rows = self.rows()
+        # Runs are appended in time order, so each run is one contiguous block
+        timestamps = rows['timestamp']
+        start = np.searchsorted(timestamps, timestamp, side='left')
+        end = np.searchsorted(timestamps, timestamp, side='right')
+        return rows[start:end]
+
+    def series(self, game_id: int, price_type: Optional[str] = None):
+        """
+        Price series of one product over all runs it was scraped in
+
+        Returns (timestamps, prices) where prices is a structured array of all
+        price types, or a float32 array if price_type is given.
+        """
+        rows = self.rows()
+        matches = rows[rows['id'] == game_id]
+        prices = matches[price_type] if price_type else matches[list(PRICE_FIELDS)]
+        return np.array(matches['timestamp']), np.array(prices)
+
+    def deltas(self, old_timestamp: float, new_timestamp: float, price_type: str):
+        """
+        Catalogue-wide change of one price type between two runs
+
+        Returns (ids, old_prices, new_prices, change) for the products present
+        with that price in both runs.
+        """
+        old_run = self.run(old_timestamp)
+        new_run = self.run(new_timestamp)
+        ids, old_index, new_index = np.intersect1d(
+            old_run['id'], new_run['id'], assume_unique=True, return_indices=True
+        )
+        old_prices = old_run[price_type][old_index]
+        new_prices = new_run[price_type][new_index]
+        present = ~np.isnan(old_prices) & ~np.isnan(new_prices)
+        old_prices = old_prices[present]
+        new_prices = new_prices[present]
+        return ids[present], old_prices, new_prices, new_prices - old_prices
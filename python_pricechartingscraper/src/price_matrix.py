@@ -0,0 +1,129 @@
+"""Array-backed price matrix for catalogue-wide price analytics"""
+
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from .export import PRICE_FIELDS, iter_cached_records
+
+# Console slugs are prefixed by region on PriceCharting, e.g. /game/pal-xbox-360/...
+REGION_PREFIXES = {'pal': 'PAL', 'jp': 'NTSC-J'}
+
+def region_from_url(url: Optional[str]) -> str:
+    """Region of a product from its PriceCharting URL, unprefixed consoles are NTSC"""
+    if not url:
+        return 'Unknown'
+    match = re.search(r'/game/([a-z]+)-', url)
+    if match and match.group(1) in REGION_PREFIXES:
+        return REGION_PREFIXES[match.group(1)]
+    return 'NTSC'
+
+class PriceMatrix:
+    """
+    Products x price types in a single float64 array
+
+    Row i holds the USD prices of product ids[i], one column per PRICE_TYPE_MAP
+    value in COLUMNS order. Missing prices are NaN, so the nan-aware NumPy
+    reductions skip them.
+    """
+
+    COLUMNS = PRICE_FIELDS
+
+    def __init__(self, ids: np.ndarray, prices: np.ndarray, regions: np.ndarray):
+        self.ids = ids
+        self.prices = prices
+        self.regions = regions
+        self.index = {int(game_id): row for row, game_id in enumerate(ids)}
+        self._column_index = {name: i for i, name in enumerate(self.COLUMNS)}
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> 'PriceMatrix':
+        """Build the matrix from cached-record dicts"""
+        ids: List[int] = []
+        rows: List[List[float]] = []
+        regions: List[str] = []
+        for data in records:
+            prices = data.get('prices') or {}
+            ids.append(int(data['id']))
+            rows.append([np.nan if prices.get(name) is None else prices[name] for name in cls.COLUMNS])
+            regions.append(region_from_url(data.get('pricecharting_url')))
+        return cls(
+            np.array(ids, dtype=np.int64),
+            np.array(rows, dtype=np.float64).reshape(len(ids), len(cls.COLUMNS)),
+            np.array(regions, dtype=object)
+        )
+
+    @classmethod
+    def from_cache(cls, json_dir: Path) -> 'PriceMatrix':
+        """Build the matrix from every successful record in the scrape cache"""
+        return cls.from_records(iter_cached_records(json_dir))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def column(self, price_type: str) -> np.ndarray:
+        """All prices of one type, aligned with self.ids"""
+        try:
+            return self.prices[:, self._column_index[price_type]]
+        except KeyError:
+            raise ValueError(f"Unknown price type: {price_type}")
+
+    def row(self, game_id: int) -> Dict[str, Optional[float]]:
+        """Prices of a single product as a dict, None for missing prices"""
+        values = self.prices[self.index[game_id]]
+        return {name: None if np.isnan(v) else float(v) for name, v in zip(self.COLUMNS, values)}
+
+    def select(self, mask: np.ndarray) -> 'PriceMatrix':
+        """Sub-matrix of the rows where mask is True"""
+        return PriceMatrix(self.ids[mask], self.prices[mask], self.regions[mask])
+
+    def in_region(self, region: str) -> 'PriceMatrix':
+        return self.select(self.regions == region)
+
+    def ids_where(self, price_type: str, minimum: Optional[float] = None,
+                  maximum: Optional[float] = None) -> np.ndarray:
+        """IDs whose price lies within [minimum, maximum], products without the price never match"""
+        column = self.column(price_type)
+        mask = ~np.isnan(column)
+        if minimum is not None:
+            mask &= column >= minimum
+        if maximum is not None:
+            mask &= column <= maximum
+        return self.ids[mask]
+
+    def percentile(self, price_type: str, q) -> np.ndarray:
+        """Percentile(s) of a price type over the products that have it"""
+        column = self.column(price_type)
+        if np.isnan(column).all():
+            return np.full(np.shape(q), np.nan)
+        return np.nanpercentile(column, q)
+
+    def percentile_by_region(self, price_type: str, q=50) -> Dict[str, float]:
+        """Percentile of a price type per region, e.g. the median CIB price by region"""
+        return {
+            region: float(self.in_region(region).percentile(price_type, q))
+            for region in sorted(set(self.regions))
+        }
+
+    def ratio(self, numerator: str, denominator: str) -> np.ndarray:
+        """Element-wise price ratio such as new/loose, NaN where either side is missing or zero"""
+        top = self.column(numerator)
+        bottom = self.column(denominator)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = top / bottom
+        result[~np.isfinite(result)] = np.nan
+        return result
+
+    def to_nok(self, rate: float, fixed: bool = True) -> np.ndarray:
+        """
+        Convert the whole matrix from USD to NOK
+
+        With fixed=True the result follows the price_nok_fixed rule of the
+        database (update_price_nok): rounded up to the next 10 NOK.
+        """
+        nok = self.prices * rate
+        if fixed:
+            # The database computes in NUMERIC; round away float noise such as
+            # 2.5 * 12 = 30.000000000000004 before rounding up
+            nok = np.ceil(np.round(nok, 6) / 10) * 10
+        return nok
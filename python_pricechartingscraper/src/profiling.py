@@ -0,0 +1,126 @@
+"""CPU and memory profiling of a whole run (--profile)"""
+
+import cProfile
+import functools
+import io
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+from .metrics import Histogram
+
+SNAPSHOT_INTERVAL = 30  # Seconds between tracemalloc snapshots
+TOP_ALLOCATIONS = 25  # Allocation sites listed per snapshot
+TRACEBACK_FRAMES = 10
+
+class RunProfiler:
+    """
+    Profiles everything between start() and stop() into a run-scoped directory
+
+    <output_root>/<name>-<timestamp>/ receives:
+    - cpu.prof: cProfile stats, loadable with pstats, snakeviz, gprof2dot etc.
+    - cpu.txt: the top functions by cumulative time
+    - memory-NNN.txt: top allocation sites of each tracemalloc snapshot, with
+      the growth since the previous snapshot
+    - phases.json: call counts and timings of the phases passed to start()
+    """
+
+    def __init__(self, name: str, output_root: Path = Path('./profiles'),
+                 snapshot_interval: float = SNAPSHOT_INTERVAL):
+        self.output_dir = Path(output_root) / f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        self.snapshot_interval = snapshot_interval
+        self.profile = cProfile.Profile()
+        self.phases = {}
+        self._patched: List[Tuple[object, str, object]] = []
+        self._snapshots = 0
+        self._previous_snapshot = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, phases: Iterable[Tuple[object, str]] = ()):
+        """Start profiling, timing each (owner, attribute) function or method in phases"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        for owner, attribute in phases:
+            self._time_phase(owner, attribute)
+        tracemalloc.start(TRACEBACK_FRAMES)
+        self._thread = threading.Thread(target=self._snapshot_loop, daemon=True)
+        self._thread.start()
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self._take_snapshot()
+        tracemalloc.stop()
+        for owner, attribute, original in reversed(self._patched):
+            setattr(owner, attribute, original)
+        self._patched = []
+        self._write_cpu()
+        self._write_phases()
+        print(f"Profile written to {self.output_dir}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _time_phase(self, owner, attribute: str):
+        original = getattr(owner, attribute)
+        histogram = self.phases.setdefault(attribute, Histogram())
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+
+        # Restore exactly what was defined on the owner (e.g. the staticmethod object)
+        defined = vars(owner).get(attribute, original)
+        setattr(owner, attribute, staticmethod(timed) if isinstance(defined, staticmethod) else timed)
+        self._patched.append((owner, attribute, defined))
+
+    def _snapshot_loop(self):
+        while not self._stop.wait(self.snapshot_interval):
+            self._take_snapshot()
+
+    def _take_snapshot(self):
+        if not tracemalloc.is_tracing():
+            return
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        self._snapshots += 1
+        lines = [f"# Snapshot {self._snapshots} at {datetime.now().isoformat(timespec='seconds')}",
+                 f"# Traced memory: {current / 1024 / 1024:.1f} MiB (peak {peak / 1024 / 1024:.1f} MiB)",
+                 "", f"Top {TOP_ALLOCATIONS} allocation sites:"]
+        lines += [str(stat) for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]]
+        if self._previous_snapshot is not None:
+            lines += ["", "Largest growth since previous snapshot:"]
+            lines += [str(stat) for stat in snapshot.compare_to(self._previous_snapshot, 'lineno')[:TOP_ALLOCATIONS]]
+        self._previous_snapshot = snapshot
+        path = self.output_dir / f"memory-{self._snapshots:03d}.txt"
+        path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+    def _write_cpu(self):
+        self.profile.dump_stats(str(self.output_dir / 'cpu.prof'))
+        report = io.StringIO()
+        pstats.Stats(self.profile, stream=report).sort_stats('cumulative').print_stats(50)
+        (self.output_dir / 'cpu.txt').write_text(report.getvalue(), encoding='utf-8')
+
+    def _write_phases(self):
+        if not self.phases:
+            return
+        with open(self.output_dir / 'phases.json', 'w', encoding='utf-8') as f:
+            json.dump({name: histogram.to_dict() for name, histogram in self.phases.items()}, f, indent=2)
@@ -2,22 +2,33 @@
 
 import time
 import random
-from typing import Optional
+from typing import Sequence
+from .metrics import metrics
 
 class RateLimiter:
-    def __init__(self, delay: float, variant_delay: float):
+    def __init__(self, delay: float, variant_delay: float, jitter: Sequence[float] = (2.0, 4.0)):
         self.delay = delay
         self.variant_delay = variant_delay
+        self.jitter = tuple(jitter)
         self.last_request: float = 0
+        self.paused_until: float = 0  # Set from Retry-After when the site throttles us
+        self.requests = 0  # Requests waited for, product and variant pages alike
 
     def wait(self, is_variant: bool = False):
         """Wait appropriate time between requests"""
-        # Add random delay between 5-10 seconds
-        random_delay = random.uniform(2.0, 4.0)
+        # Add random delay within the jitter range
+        random_delay = random.uniform(*self.jitter)
         delay = random_delay + (self.variant_delay if is_variant else self.delay)
         
         now = time.time()
         elapsed = now - self.last_request
-        if elapsed < delay:
-            time.sleep(delay - elapsed)
-        self.last_request = time.time() 
\ No newline at end of file
+        slept = max(delay - elapsed, self.paused_until - now, 0.0)
+        if slept:
+            time.sleep(slept)
+        metrics.observe('rate_limit_wait', slept)
+        self.last_request = time.time()
+        self.requests += 1
+
+    def pause_until(self, timestamp: float):
+        """Hold back the next request until timestamp"""
+        self.paused_until = max(self.paused_until, timestamp)
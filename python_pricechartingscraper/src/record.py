@@ -0,0 +1,103 @@
+"""Compact in-memory representation of a scraped product"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+# Price type mappings (page label -> field name), also PriceChartingScraper.PRICE_TYPE_MAP
+PRICE_TYPE_MAP = {
+    'Loose': 'loose',
+    'Item & Box': 'item_box',
+    'Item & Manual': 'item_manual',
+    'Complete': 'complete',
+    'New': 'new',
+    'Graded CIB': 'graded_cib',
+    'Graded New': 'graded_new',
+    'Box Only': 'box_only',
+    'Manual Only': 'manual_only'
+}
+
+# Fixed order of GameRecord.prices
+PRICE_FIELDS = tuple(PRICE_TYPE_MAP.values())
+
+@dataclass(slots=True)
+class GameRecord:
+    """
+    One product as scraped or cached
+
+    Prices are a tuple in PRICE_FIELDS order instead of a nested dict, and
+    __slots__ drop the per-instance __dict__. to_dict()/from_dict() convert
+    from and to the JSON shape of the <id>.json cache files.
+    """
+
+    success: bool
+    id: Optional[int] = None
+    product_name: Optional[str] = None
+    image_url: Optional[str] = None
+    # None when the record has no price block at all (error responses)
+    prices: Optional[Tuple[Optional[float], ...]] = None
+    details: Dict[str, Any] = field(default_factory=dict)
+    pricecharting_url: Optional[str] = None
+    variant_name: Optional[str] = None
+    combined_name: Optional[str] = None
+
+    @classmethod
+    def error(cls) -> 'GameRecord':
+        """The record stored for products that could not be scraped"""
+        return cls(success=False)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'GameRecord':
+        prices = data.get('prices')
+        return cls(
+            success=bool(data.get('success')),
+            id=data.get('id'),
+            product_name=data.get('product_name'),
+            image_url=data.get('image_url'),
+            prices=tuple(prices.get(name) for name in PRICE_FIELDS) if prices else None,
+            details=data.get('details') or {},
+            pricecharting_url=data.get('pricecharting_url'),
+            variant_name=data.get('variant_name'),
+            combined_name=data.get('combined_name')
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert back to the cache file shape, optional keys only when set"""
+        if not self.success:
+            return {
+                'success': False,
+                'image_url': None,
+                'pricecharting_url': None,
+                'prices': {},
+                'details': {}
+            }
+        data = {
+            'success': True,
+            'id': self.id,
+            'product_name': self.product_name,
+            'image_url': self.image_url,
+            'prices': self.prices_dict(),
+            'details': self.details
+        }
+        if self.pricecharting_url is not None:
+            data['pricecharting_url'] = self.pricecharting_url
+        if self.variant_name is not None:
+            data['variant_name'] = self.variant_name
+        if self.combined_name is not None:
+            data['combined_name'] = self.combined_name
+        return data
+
+    def prices_dict(self) -> Dict[str, Optional[float]]:
+        if self.prices is None:
+            return {}
+        return dict(zip(PRICE_FIELDS, self.prices))
+
+    def price(self, price_type: str) -> Optional[float]:
+        if self.prices is None:
+            return None
+        return self.prices[PRICE_FIELDS.index(price_type)]
+
+    def update_prices(self, prices: Dict[str, Optional[float]]) -> None:
+        """Overwrite the given price types, keeping the others"""
+        current = self.prices_dict() or dict.fromkeys(PRICE_FIELDS)
+        current.update(prices)
+        self.prices = tuple(current[name] for name in PRICE_FIELDS)
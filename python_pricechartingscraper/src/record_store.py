@@ -0,0 +1,222 @@
+"""Serializers and crash-safe batched writes for the <id> record cache"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+from .metrics import metrics
+
+class JSONSerializer:
+    """Standard library JSON, always available"""
+
+    name = 'json'
+    extension = '.json'
+
+    def __init__(self, pretty: bool = False):
+        self.pretty = pretty
+
+    def dumps(self, data: Dict[str, Any]) -> bytes:
+        if self.pretty:
+            return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def loads(self, raw: bytes) -> Dict[str, Any]:
+        return json.loads(raw)
+
+class OrjsonSerializer(JSONSerializer):
+    """orjson writes the same JSON files several times faster"""
+
+    name = 'orjson'
+
+    def __init__(self, pretty: bool = False):
+        import orjson
+        self.orjson = orjson
+        self.options = orjson.OPT_INDENT_2 if pretty else 0
+        self.pretty = pretty
+
+    def dumps(self, data: Dict[str, Any]) -> bytes:
+        return self.orjson.dumps(data, option=self.options)
+
+    def loads(self, raw: bytes) -> Dict[str, Any]:
+        return self.orjson.loads(raw)
+
+class MsgpackSerializer:
+    """Compact binary records, about half the size of JSON"""
+
+    name = 'msgpack'
+    extension = '.msgpack'
+
+    def __init__(self, pretty: bool = False):
+        import msgpack
+        self.msgpack = msgpack
+
+    def dumps(self, data: Dict[str, Any]) -> bytes:
+        return self.msgpack.packb(data, use_bin_type=True)
+
+    def loads(self, raw: bytes) -> Dict[str, Any]:
+        return self.msgpack.unpackb(raw, raw=False)
+
+SERIALIZERS = {
+    'json': JSONSerializer,
+    'orjson': OrjsonSerializer,
+    'msgpack': MsgpackSerializer
+}
+
+def get_serializer(name: str, pretty: bool = False):
+    """Serializer instance for a name, orjson falls back to the identical stdlib JSON when not installed"""
+    try:
+        serializer_class = SERIALIZERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown serializer: {name} (choose from {', '.join(SERIALIZERS)})")
+    try:
+        return serializer_class(pretty)
+    except ImportError:
+        if name == 'orjson':
+            return JSONSerializer(pretty)
+        raise ValueError(f"The {name} serializer needs the {name} package (pip install {name})")
+
+_readers: Dict[str, Any] = {}
+
+def _reader(extension: str):
+    """Serializer able to read files with this extension"""
+    if extension not in _readers:
+        _readers[extension] = get_serializer('msgpack' if extension == '.msgpack' else 'orjson')
+    return _readers[extension]
+
+RECORD_EXTENSIONS = ('.json', '.msgpack')
+
+def read_record_file(path: Path) -> Dict[str, Any]:
+    """Load a cache file written by any serializer, raises ValueError or OSError when unreadable"""
+    path = Path(path)
+    with open(path, 'rb') as f:
+        raw = f.read()
+    data = _reader(path.suffix).loads(raw)
+    if not isinstance(data, dict):
+        raise ValueError(f"Not a record: {path}")
+    return data
+
+def iter_record_files(json_dir: Path) -> Iterator[Tuple[int, Path]]:
+    """(game_id, path) of every <id> cache file in the directory, in no particular order"""
+    json_dir = Path(json_dir)
+    if not json_dir.exists():
+        return
+    with os.scandir(json_dir) as entries:
+        for entry in entries:
+            stem, extension = os.path.splitext(entry.name)
+            if extension in RECORD_EXTENSIONS and stem.isdigit():
+                yield int(stem), json_dir / entry.name
+
+class RecordStore:
+    """
+    Writes records through a temp file, fsync and rename
+
+    A crash leaves either the previous file or the new one, never a
+    truncated record. Writes within group_interval seconds of each other are
+    held back and committed together, up to group_size at a time, so a burst
+    shares one directory fsync. Held records are served by load() and written
+    by flush(), which also runs at exit.
+    """
+
+    def __init__(self, output_dir: Path, serializer, fsync: bool = True,
+                 group_size: int = 1, group_interval: float = 0.0):
+        self.output_dir = Path(output_dir)
+        self.serializer = serializer
+        self.fsync = fsync
+        self.group_size = max(group_size, 1)
+        self.group_interval = group_interval
+        self.pending: Dict[int, Tuple[float, bytes]] = {}  # game_id -> (time, encoded record)
+        self.group_started = 0.0
+        self.lock = threading.RLock()
+        self._dir_ready = False
+        atexit.register(self.flush)
+
+    def path(self, game_id: int) -> Path:
+        return self.output_dir / f"{game_id}{self.serializer.extension}"
+
+    def find(self, game_id: int) -> Optional[Path]:
+        """The existing cache file of game_id, preferring the configured serializer's"""
+        preferred = self.path(game_id)
+        if preferred.exists():
+            return preferred
+        for extension in RECORD_EXTENSIONS:
+            path = self.output_dir / f"{game_id}{extension}"
+            if path.exists():
+                return path
+        return None
+
+    def load(self, game_id: int, max_age: Optional[float] = None) -> Optional[Tuple[float, Dict[str, Any], Path]]:
+        """
+        (modified time, data, path) of the newest copy of a record, pending or
+        on disk, or None if there is none or it is older than max_age seconds.
+        Raises ValueError or OSError when the file is unreadable.
+        """
+        with self.lock:
+            entry = self.pending.get(game_id)
+        if entry:
+            return entry[0], self.serializer.loads(entry[1]), self.path(game_id)
+        path = self.find(game_id)
+        if path is None:
+            return None
+        modified = path.stat().st_mtime
+        if max_age is not None and time.time() - modified > max_age:
+            return None
+        return modified, read_record_file(path), path
+
+    def save(self, game_id: int, data: Dict[str, Any]) -> Path:
+        with metrics.timer('serialize'):
+            raw = self.serializer.dumps(data)
+        with self.lock:
+            now = time.time()
+            if self.pending and now - self.group_started > self.group_interval:
+                self.flush()
+            if not self.pending:
+                self.group_started = now
+            self.pending[game_id] = (now, raw)
+            if len(self.pending) >= self.group_size:
+                self.flush()
+        return self.path(game_id)
+
+    def flush(self) -> int:
+        """Commit every pending record, returns the number written"""
+        with self.lock:
+            if not self.pending:
+                return 0
+            pending, self.pending = self.pending, {}
+            with metrics.timer('save'):
+                if not self._dir_ready:
+                    self.output_dir.mkdir(parents=True, exist_ok=True)
+                    self._dir_ready = True
+                written = []
+                for game_id, (_, raw) in pending.items():
+                    path = self.path(game_id)
+                    temp_path = path.with_name(f".{path.name}.tmp")
+                    with open(temp_path, 'wb') as f:
+                        f.write(raw)
+                        if self.fsync:
+                            f.flush()
+                            os.fsync(f.fileno())
+                    written.append((temp_path, path))
+                for temp_path, path in written:
+                    os.replace(temp_path, path)
+                    # A copy written by another serializer is stale now
+                    for extension in RECORD_EXTENSIONS:
+                        if extension != path.suffix:
+                            path.with_suffix(extension).unlink(missing_ok=True)
+                if self.fsync:
+                    self._fsync_dir()
+            metrics.count('record_commits')
+            return len(written)
+
+    def _fsync_dir(self):
+        # Makes the renames durable, not available on Windows
+        if sys.platform == 'win32':
+            return
+        fd = os.open(self.output_dir, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
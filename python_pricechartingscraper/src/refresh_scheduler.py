@@ -0,0 +1,195 @@
+"""Value-weighted refresh scheduling under a daily request budget"""
+
+import csv
+import json
+import math
+import re
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from .price_history import PriceHistory
+from .record_store import iter_record_files, read_record_file
+
+# Price types that make up a product's value, the highest one counts
+VALUE_PRICE_TYPES = ('loose', 'complete', 'new')
+
+class RefreshEntry:
+    __slots__ = ('id', 'score', 'interval', 'age')
+
+    def __init__(self, game_id: int, score: float, interval: float, age: float):
+        self.id = game_id
+        self.score = score
+        self.interval = interval  # Seconds between refreshes
+        self.age = age  # Seconds since the last scrape, inf if never scraped
+
+    @property
+    def overdue(self) -> float:
+        """How many refresh intervals have passed since the last scrape"""
+        return self.age / self.interval
+
+class RefreshScheduler:
+    """
+    Spreads a daily request budget over the catalogue by value
+
+    Each product gets a score from its price level, how much its price moved
+    between earlier scrapes, an optional weight and whether it is in stock.
+    Refresh frequencies are proportional to the square root of the score,
+    the split of a fixed budget that minimises score-weighted staleness, and
+    clamped to [min_interval, max_interval].
+    """
+
+    def __init__(self, config, json_dir: Path):
+        self.json_dir = Path(json_dir)
+        self.daily_budget = config.get('refresh', 'daily_budget', default=2000)
+        self.min_interval = config.get('refresh', 'min_interval_hours', default=6) * 3600
+        self.max_interval = config.get('refresh', 'max_interval_days', default=90) * 86400
+        self.in_stock_weight = config.get('refresh', 'in_stock_weight', default=3.0)
+        self.volatility_weight = config.get('refresh', 'volatility_weight', default=10.0)
+        self.state_file = Path(config.get('refresh', 'state_file', default='./json/refresh_state.json'))
+        self.history_file = Path(config.get('output', 'history_file', default='./history/prices.bin'))
+        self.weights: Dict[int, float] = {}
+        self.in_stock: set = set()
+        self.paths: Dict[int, Path] = {}  # Cache file of every scraped ID
+
+    def load_weights(self, csv_file: str) -> int:
+        """
+        Read an inventory/products export: a pricecharting_id column (or an id
+        column holding PriceCharting IDs), optionally weight and in_stock
+        (true/yes/1 or a quantity)
+
+        In exports with a pricecharting_id column, id is the database ID and
+        rows without a PriceCharting ID are skipped.
+        """
+        count = 0
+        with open(csv_file, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.DictReader(f)
+            id_column = 'pricecharting_id' if 'pricecharting_id' in (reader.fieldnames or []) else 'id'
+            for row in reader:
+                raw_id = (row.get(id_column) or '').strip()
+                if not raw_id.isdigit():
+                    continue
+                game_id = int(raw_id)
+                try:
+                    self.weights[game_id] = float(row.get('weight') or 1.0)
+                except ValueError:
+                    self.weights[game_id] = 1.0
+                stock = (row.get('in_stock') or '').strip().lower()
+                if stock in ('true', 'yes', 'y') or (stock.replace('.', '', 1).isdigit() and float(stock) > 0):
+                    self.in_stock.add(game_id)
+                count += 1
+        return count
+
+    def _last_scraped(self) -> Dict[int, float]:
+        self.paths = dict(iter_record_files(self.json_dir))
+        return {game_id: path.stat().st_mtime for game_id, path in self.paths.items()}
+
+    def _price_stats(self):
+        """Latest value and mean relative price change per ID from the price history"""
+        rows = PriceHistory(self.history_file).rows()
+        if not len(rows):
+            return {}, {}
+        values = np.fmax.reduce([np.asarray(rows[name], dtype=np.float64) for name in VALUE_PRICE_TYPES])
+        order = np.lexsort((rows['timestamp'], rows['id']))
+        ids = np.asarray(rows['id'])[order]
+        values = values[order]
+
+        # Last row of each ID holds its latest value
+        last = np.r_[ids[1:] != ids[:-1], True]
+        latest = dict(zip(ids[last].tolist(), values[last].tolist()))
+
+        # Relative change between consecutive scrapes of the same ID
+        same = ids[1:] == ids[:-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = np.abs(values[1:] - values[:-1]) / values[:-1]
+        valid = same & np.isfinite(change)
+        change_ids = ids[1:][valid]
+        volatility = {}
+        if len(change_ids):
+            unique, inverse = np.unique(change_ids, return_inverse=True)
+            means = np.bincount(inverse, weights=change[valid]) / np.bincount(inverse)
+            volatility = dict(zip(unique.tolist(), means.tolist()))
+        return latest, volatility
+
+    def _cached_value(self, game_id: int) -> Optional[float]:
+        try:
+            prices = read_record_file(self.paths[game_id]).get('prices') or {}
+        except (ValueError, OSError):
+            return None
+        values = [prices[name] for name in VALUE_PRICE_TYPES if prices.get(name) is not None]
+        return max(values) if values else None
+
+    def plan(self, now: Optional[float] = None) -> List[RefreshEntry]:
+        """Every known ID with its refresh interval, most overdue and valuable first"""
+        now = time.time() if now is None else now
+        scraped = self._last_scraped()
+        latest, volatility = self._price_stats()
+        ids = set(scraped) | set(self.weights)
+
+        scores = {}
+        for game_id in ids:
+            value = latest.get(game_id)
+            if value is None or math.isnan(value):
+                value = self._cached_value(game_id) if game_id in scraped else None
+            score = math.log1p(value) if value else 1.0
+            score *= 1 + self.volatility_weight * volatility.get(game_id, 0.0)
+            score *= self.weights.get(game_id, 1.0)
+            if game_id in self.in_stock:
+                score *= self.in_stock_weight
+            scores[game_id] = max(score, 1e-6)
+
+        total = sum(math.sqrt(score) for score in scores.values())
+        entries = []
+        for game_id, score in scores.items():
+            per_day = self.daily_budget * math.sqrt(score) / total if total else 0
+            interval = 86400 / per_day if per_day else self.max_interval
+            interval = min(max(interval, self.min_interval), self.max_interval)
+            age = now - scraped[game_id] if game_id in scraped else math.inf
+            entries.append(RefreshEntry(game_id, score, interval, age))
+
+        due = [entry for entry in entries if entry.age >= entry.interval]
+        due.sort(key=lambda entry: (entry.overdue, entry.score), reverse=True)
+        return due
+
+    def remaining_budget(self, today: Optional[date] = None) -> int:
+        state = self._load_state()
+        today = (today or date.today()).isoformat()
+        spent = state.get('spent', 0) if state.get('date') == today else 0
+        return max(self.daily_budget - spent, 0)
+
+    def record_spent(self, requests: int, today: Optional[date] = None):
+        state = self._load_state()
+        today = (today or date.today()).isoformat()
+        spent = state.get('spent', 0) if state.get('date') == today else 0
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.state_file, 'w', encoding='utf-8') as f:
+            json.dump({'date': today, 'spent': spent + requests}, f)
+
+    def _load_state(self) -> Dict:
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return {}
+
+def parse_deadline(value: str, now: Optional[datetime] = None) -> float:
+    """
+    Deadline as a timestamp, from a clock time (06:00, the next one) or a
+    duration from now (90m, 4h, 3600s)
+    """
+    now = now or datetime.now()
+    if match := re.fullmatch(r'(\d{1,2}):(\d{2})', value.strip()):
+        deadline = now.replace(hour=int(match.group(1)), minute=int(match.group(2)), second=0, microsecond=0)
+        if deadline <= now:
+            deadline += timedelta(days=1)
+        return deadline.timestamp()
+    if match := re.fullmatch(r'(\d+(?:\.\d+)?)\s*([smh])', value.strip().lower()):
+        seconds = float(match.group(1)) * {'s': 1, 'm': 60, 'h': 3600}[match.group(2)]
+        return (now + timedelta(seconds=seconds)).timestamp()
+    raise ValueError(f"Invalid deadline: {value} (use HH:MM or a duration such as 90m or 4h)")
+
+def seconds_per_request(config) -> float:
+    """Expected time per product request: rate limit delay, mean jitter and the request itself"""
+    jitter = config.get('rate_limit', 'jitter', default=(2.0, 4.0))
+    return config.get('rate_limit', 'delay', default=1.0) + sum(jitter) / 2 + config.get('refresh', 'request_seconds', default=1.0)
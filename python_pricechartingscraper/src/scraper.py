@@ -1,29 +1,36 @@
 """Main scraper implementation"""
 
-import requests
-from bs4 import BeautifulSoup
+from __future__ import annotations
+
 import re
-import json
 import os
 import time
 from pathlib import Path
-from typing import Dict, Optional, Union, Tuple
+from typing import TYPE_CHECKING, Dict, Optional, TextIO, Tuple
 from .rate_limiter import RateLimiter
 from .date_normalizer import DateNormalizer
 from .utils.validators import clean_price, validate_page
+from .record import GameRecord, PRICE_TYPE_MAP
+from .metrics import metrics
+from .record_store import RecordStore, get_serializer
+
+# requests and bs4 are only imported once a page is actually fetched, so
+# runs answered from the cache start without them
+if TYPE_CHECKING:
+    import requests
+    from bs4 import BeautifulSoup
+    from .failure_cache import FailureCache
 
 class PriceChartingScraper:
-    # Price type mappings
-    PRICE_TYPE_MAP = {
-        'Loose': 'loose',
-        'Item & Box': 'item_box',
-        'Item & Manual': 'item_manual',
-        'Complete': 'complete',
-        'New': 'new',
-        'Graded CIB': 'graded_cib',
-        'Graded New': 'graded_new',
-        'Box Only': 'box_only',
-        'Manual Only': 'manual_only'
+    # Price type mappings (defined with the GameRecord price layout)
+    PRICE_TYPE_MAP = PRICE_TYPE_MAP
+
+    # Price columns of console listing pages, keyed by cell class and mapped
+    # onto the PRICE_TYPE_MAP labels used on product pages
+    LISTING_PRICE_CLASSES = {
+        'used_price': 'Loose',
+        'cib_price': 'Complete',
+        'new_price': 'New'
     }
 
     # List of values that should be treated as None
@@ -78,18 +85,34 @@ class PriceChartingScraper:
         }
     }
 
-    def __init__(self, config):
+    def __init__(self, config, manifest: Optional[TextIO] = None, keep_index: bool = False):
         self.config = config
-        self.base_url = "https://www.pricecharting.com/game"
+        self.site_url = config.get('scraper', 'base_url', default='https://www.pricecharting.com').rstrip('/')
+        self.base_url = f"{self.site_url}/game"
         self.headers = {'User-Agent': config.get('scraper', 'user_agent')}
         self.rate_limiter = RateLimiter(
             config.get('rate_limit', 'delay'),
-            config.get('rate_limit', 'variant_delay')
+            config.get('rate_limit', 'variant_delay'),
+            config.get('rate_limit', 'jitter', default=(2.0, 4.0))
         )
-        self.output_dir = Path('./json')
-        self.output_dir.mkdir(exist_ok=True)
-        self.saved_files = []  # Only tracks newly saved files
-        self.cached_files = []  # Tracks files loaded from cache
+        self.output_dir = Path('./json')  # Created on the first save
+        # Cache files go through temp file, fsync and rename, bursts are committed together
+        self.store = RecordStore(
+            self.output_dir,
+            get_serializer(config.get('output', 'serializer', default='orjson'),
+                           config.get('output', 'pretty_print', default=False)),
+            fsync=config.get('output', 'fsync', default=True),
+            group_size=config.get('output', 'group_size', default=64),
+            group_interval=config.get('output', 'group_interval', default=1.0)
+        )
+        self.saved_count = 0  # Newly saved files
+        self.cached_count = 0  # Files loaded from cache
+        self.manifest = manifest  # Optional stream receiving one "saved|cached<TAB>path" line per file
+        self.run_prices = {}  # Price tuples saved during this run, for the price history
+        # game_id -> (saved/modified time, record) of every record seen, for long-running processes
+        self.index: Optional[Dict[int, Tuple[float, GameRecord]]] = {} if keep_index else None
+        self._session = None  # Pooled HTTP session, created on the first request
+        self._failures = None  # Negative cache of failed requests, see the failures property
         self.file_age = config.get('output', 'file_age', default=86400)  # Default to 24 hours
         
         # Initialize detail fields with rating validators
@@ -134,71 +157,283 @@ class PriceChartingScraper:
                 return f"ESRB {abbrev}"
         return None
 
-    def _save_game_data(self, game_id: int, data: Dict) -> None:
-        """Save game data to a JSON file"""
-        output_path = self.output_dir / f"{game_id}.json"
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        self.saved_files.append(str(output_path))
+    def _record_file(self, kind: str, file_path: Path) -> None:
+        """Count a saved/cached file and stream it to the manifest if one is set"""
+        if kind == 'saved':
+            self.saved_count += 1
+        else:
+            self.cached_count += 1
+        if self.manifest:
+            self.manifest.write(f"{kind}\t{file_path}\n")
+
+    def _get(self, url: str, params: Optional[Dict] = None) -> requests.Response:
+        """GET a PriceCharting page, timing the request and counting its status"""
+        import requests
+        if self._session is None:
+            self._session = requests.Session()
+        try:
+            with metrics.timer('http_request'):
+                response = self._session.get(
+                    url,
+                    params=params,
+                    headers=self.headers,
+                    timeout=self.config.get('scraper', 'timeout', default=10)
+                )
+        except requests.RequestException:
+            metrics.count('errors', stage='http')
+            raise
+        metrics.count('http_responses', status=response.status_code)
+        return response
+
+    def _parse_page(self, page_html: str) -> BeautifulSoup:
+        from bs4 import BeautifulSoup
+        with metrics.timer('html_parse'):
+            return BeautifulSoup(page_html, 'html.parser')
+
+    def _save_game_data(self, game_id: int, record: GameRecord) -> None:
+        """Save game data to the record cache, committed with the rest of its burst"""
+        output_path = self.store.save(game_id, record.to_dict())
+        self._record_file('saved', output_path)
+        if not record.success:
+            metrics.count('errors', stage='scrape')
+        if record.success:
+            self.run_prices[game_id] = record.prices
+            self.failures.clear(game_id)
+        if self.index is not None:
+            self.index[game_id] = (time.time(), record)
         print(f"Saved game data to {output_path}")
 
-    def _check_existing_file(self, game_id: int) -> Tuple[bool, Optional[Dict]]:
+    def _check_existing_file(self, game_id: int) -> Tuple[bool, Optional[GameRecord]]:
         """
         Check if a file exists and is within the age limit
         Returns: (should_skip_scrape, existing_data)
         """
-        file_path = self.output_dir / f"{game_id}.json"
-        
-        if not file_path.exists():
+        if self.index is not None:
+            entry = self.index.get(game_id)
+            if entry and time.time() - entry[0] <= self.file_age:
+                self._record_file('cached', self.store.path(game_id))
+                return True, entry[1]
+
+        # Load the file if it exists and is fresh enough
+        try:
+            cached = self.store.load(game_id, self.file_age)
+        except (ValueError, OSError) as e:
+            print(f"Warning: Error reading existing file for game {game_id}: {e}")
             return False, None
-            
-        # Check file age
-        file_age = time.time() - file_path.stat().st_mtime
-        if file_age > self.file_age:
+        if cached is None:
             return False, None
-            
-        # File exists and is fresh enough, load its data
+        modified, data, file_path = cached
+        if not data.get('success'):
+            # Error record of an older version, the negative cache decides when to retry now
+            return False, None
+        # Count the file as loaded from cache
+        self._record_file('cached', file_path)
+        record = GameRecord.from_dict(data)
+        if self.index is not None:
+            self.index[game_id] = (modified, record)
+        return True, record
+
+    def fresh_record(self, game_id: int) -> Optional[GameRecord]:
+        """
+        The successful record of game_id if it is within the age limit, else None
+
+        Served from the index when possible. Unlike _check_existing_file this
+        neither counts nor reports the file, so any thread may call it.
+        """
+        if self.index is not None:
+            entry = self.index.get(game_id)
+            if entry and entry[1].success and time.time() - entry[0] <= self.file_age:
+                return entry[1]
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                # Add file to cached files list
-                self.cached_files.append(str(file_path))
-                return True, data
-        except (json.JSONDecodeError, IOError) as e:
+            cached = self.store.load(game_id, self.file_age)
+        except (ValueError, OSError):
+            return None
+        if cached is None:
+            return None
+        modified, data, _ = cached
+        if not data.get('success'):
+            # Error record of an older version, a miss like in _check_existing_file
+            return None
+        record = GameRecord.from_dict(data)
+        if self.index is not None:
+            self.index[game_id] = (modified, record)
+        return record
+
+    def _load_cached_data(self, game_id: int) -> Optional[GameRecord]:
+        """Load a cached record regardless of its age"""
+        try:
+            cached = self.store.load(game_id)
+        except (ValueError, OSError) as e:
             print(f"Warning: Error reading existing file for game {game_id}: {e}")
-            return False, None
+            return None
+        return GameRecord.from_dict(cached[1]) if cached else None
+
+    def flush(self) -> int:
+        """Commit the records held back for group commit and the negative cache"""
+        if self._failures is not None:
+            self._failures.save()
+        return self.store.flush()
+
+    def fetch_listing_page(self, listing_url: str, cursor: Optional[str] = None) -> BeautifulSoup:
+        """Fetch one page of a console listing (e.g. https://www.pricecharting.com/console/pal-xbox-360)"""
+        self.rate_limiter.wait()
+        response = self._get(listing_url, {'cursor': cursor} if cursor else None)
+        if response.status_code != 200:
+            raise ValueError(f"Failed to fetch listing page {listing_url}: HTTP {response.status_code}")
+        return self._parse_page(response.text)
+
+    def fetch_listing_prices(self, listing_url: str, max_pages: int = 100) -> Dict[int, Dict]:
+        """Collect listing prices for every product of a console, one request per page"""
+        products = {}
+        cursor = None
+        for _ in range(max_pages):
+            soup = self.fetch_listing_page(listing_url, cursor)
+            page_products = self._parse_listing(soup)
+            new_ids = set(page_products) - set(products)
+            products.update(page_products)
+            print(f"Listing page: {len(page_products)} products ({len(products)} total)")
+
+            # Further pages are requested with the cursor of the "load more" form
+            cursor_input = soup.find('input', attrs={'name': 'cursor'})
+            cursor = cursor_input.get('value') if cursor_input else None
+            if not cursor or not new_ids:
+                break
+        return products
+
+    def _parse_listing(self, soup: BeautifulSoup) -> Dict[int, Dict]:
+        """Parse the products table of a console listing page"""
+        products = {}
+        table = soup.find('table', id='games_table')
+        if not table:
+            return products
+        for row in table.find_all('tr', id=re.compile(r'^product-\d+$')):
+            try:
+                game_id = int(row['id'].split('-', 1)[1])
+            except (ValueError, KeyError):
+                continue
+            title_link = row.find('td', class_='title')
+            title_link = title_link.find('a') if title_link else None
+
+            prices = {}
+            for cell_class, price_type in self.LISTING_PRICE_CLASSES.items():
+                price_td = row.find('td', class_=cell_class)
+                if price_td:
+                    prices[self.PRICE_TYPE_MAP[price_type]] = clean_price(price_td.get_text())
 
-    def fetch_game_data(self, game_id: int, scrape_variants: bool = False) -> Dict[str, Union[float, str, None, dict, list]]:
-        """Fetch and parse game data"""
+            products[game_id] = {
+                'product_name': title_link.get_text(strip=True) if title_link else None,
+                'url': title_link.get('href') if title_link else None,
+                'prices': prices
+            }
+        return products
+
+    def update_prices_from_listing(self, listing_url: str, scrape_missing: bool = True) -> Dict[str, int]:
+        """
+        Update the prices of cached records from a console listing in bulk
+
+        Products without a usable cached record (missing, unreadable or an error
+        response) are scraped individually, unless scrape_missing is False.
+        """
+        products = self.fetch_listing_prices(listing_url)
+        counts = {'listed': len(products), 'updated': 0, 'scraped': 0, 'missing': 0}
+        for game_id, listed in products.items():
+            record = self._load_cached_data(game_id)
+            if record and record.success:
+                record.update_prices(listed['prices'])
+                self._save_game_data(game_id, record)
+                counts['updated'] += 1
+            elif scrape_missing:
+                self.fetch_game_data(game_id)
+                counts['scraped'] += 1
+            else:
+                counts['missing'] += 1
+        return counts
+
+    def resolve_url(self, url: str) -> Tuple[int, str, str]:
+        """
+        (ID, canonical URL, page) of a product URL without the ID in it
+
+        Downloading the page is a product request like any other: it waits for
+        the rate limiter (and a crawl's shared budget), and failures are
+        counted and classified; a throttled response pauses later requests.
+        """
+        import requests
+        self.rate_limiter.wait()
+        try:
+            response = self._get(url)
+        except requests.RequestException as e:
+            metrics.count('failures', kind='retryable')
+            raise ValueError(f"Failed to fetch URL: {url} ({e})") from e
+        if response.status_code != 200:
+            kind = self._classify_status(response.status_code)
+            metrics.count('errors', stage='resolve')
+            metrics.count('failures', kind=kind)
+            if kind == 'throttled':
+                retry_after = self._retry_after(response)
+                self.rate_limiter.pause_until(
+                    time.time() + (retry_after if retry_after is not None else self.failures.ttls['throttled'][0]))
+            raise ValueError(f"Failed to fetch URL: {url} ({kind} failure, status {response.status_code})")
+
+        soup = self._parse_page(response.text)
+        canonical_url = url
+        canonical_tag = soup.find('link', rel='canonical')
+        if canonical_tag and canonical_tag.get('href'):
+            canonical_url = canonical_tag['href']
+
+        id_row = soup.find('td', string='PriceCharting ID:')
+        if id_row and (details := id_row.find_next_sibling('td')):
+            try:
+                return int(details.text.strip()), canonical_url, response.text
+            except ValueError:
+                pass
+        metrics.count('errors', stage='resolve')
+        raise ValueError("Could not find PriceCharting ID in the page")
+
+    def fetch_game_data(self, game_id: int, scrape_variants: bool = False,
+                        page_html: Optional[str] = None) -> GameRecord:
+        """
+        Fetch and parse game data
+
+        page_html can carry the product page when the caller already downloaded
+        it (e.g. while resolving a URL to its ID), so it isn't fetched twice.
+        """
         # First, check if we have valid cached data
         should_use_cache, cached_data = self._check_existing_file(game_id)
+
+        # Recently failed products are not requested again before their retry time
+        if not should_use_cache and page_html is None and (blocked := self.failures.blocked(game_id)):
+            metrics.count('cache', result='negative')
+            print(f"Skipping game {game_id}: {blocked[0]} failure, retry after "
+                  f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(blocked[1]))}")
+            return self._get_error_response()
+        metrics.count('cache', result='hit' if should_use_cache else 'miss')
         
         # If we have valid cache and aren't scraping variants, return cached data immediately
         if should_use_cache and not scrape_variants:
             print(f"Using cached data for game {game_id}")
             return cached_data
         
-        try:
-            # Fetch the page (needed for variants or if no valid cache)
+        if page_html is None:
+            # Outside the try below: a crawl's shared limiter stops the worker by raising here
             self.rate_limiter.wait()
-            response = requests.get(
-                f"{self.base_url}/{game_id}",
-                headers=self.headers,
-                timeout=self.config.get('scraper', 'timeout', default=10)
-            )
-            
-            if response.status_code != 200:
-                error_response = self._get_error_response()
-                if not should_use_cache:
-                    self._save_game_data(game_id, error_response)
-                return error_response
+        try:
+            if page_html is None:
+                # Fetch the page (needed for variants or if no valid cache)
+                response = self._get(f"{self.base_url}/{game_id}")
+                
+                if response.status_code != 200:
+                    if not should_use_cache:
+                        self._record_failure(game_id, self._classify_status(response.status_code),
+                                             self._retry_after(response))
+                    return self._get_error_response()
+                page_html = response.text
 
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = self._parse_page(page_html)
             if not validate_page(soup, game_id):
-                error_response = self._get_error_response()
+                # Error page or another product: the ID doesn't exist (any more)
                 if not should_use_cache:
-                    self._save_game_data(game_id, error_response)
-                return error_response
+                    self._record_failure(game_id, 'permanent')
+                return self._get_error_response()
 
             # Get variants list if scraping variants is enabled
             variants = self._parse_variants(soup) if scrape_variants else []
@@ -212,24 +447,21 @@ class PriceChartingScraper:
                     if not variant_should_use_cache:
                         # Need to fetch the variant's page
                         self.rate_limiter.wait(True)  # Use variant delay
-                        variant_response = requests.get(
-                            f"{self.base_url}/{variant_id}",
-                            headers=self.headers,
-                            timeout=self.config.get('scraper', 'timeout', default=10)
-                        )
+                        variant_response = self._get(f"{self.base_url}/{variant_id}")
                         if variant_response.status_code == 200:
-                            variant_soup = BeautifulSoup(variant_response.text, 'html.parser')
+                            variant_soup = self._parse_page(variant_response.text)
                             if validate_page(variant_soup, variant_id):
-                                variant_data = self._parse_game_data(variant_soup, variant_id, False)
-                                variant_data['variant_name'] = variant['variant_name']
+                                with metrics.timer('extract'):
+                                    variant_data = self._parse_game_data(variant_soup, variant_id, False)
+                                variant_data.variant_name = variant['variant_name']
                                 # Add combined name for variant
-                                if variant_data['product_name'] and variant['variant_name']:
-                                    variant_data['combined_name'] = f"{variant_data['product_name']} ({variant['variant_name']})"
+                                if variant_data.product_name and variant['variant_name']:
+                                    variant_data.combined_name = f"{variant_data.product_name} ({variant['variant_name']})"
                                 self._save_game_data(variant_id, variant_data)
                                 # Download variant image if available
-                                if variant_data['success'] and variant_data.get('image_url'):
+                                if variant_data.success and variant_data.image_url:
                                     from src.utils.image_utils import download_image
-                                    download_image(variant_data['image_url'], variant_id, self.output_dir, self.headers)
+                                    download_image(variant_data.image_url, variant_id, self.output_dir, self.headers)
 
             # If we have valid cached data and we only needed to check variants, return cached data
             if should_use_cache:
@@ -237,18 +469,18 @@ class PriceChartingScraper:
                 return cached_data
 
             # If no valid cache, parse all data
-            result = self._parse_game_data(soup, game_id, False)
+            with metrics.timer('extract'):
+                result = self._parse_game_data(soup, game_id, False)
             self._save_game_data(game_id, result)
             return result
 
         except Exception as e:
             print(f"Error fetching game {game_id}: {e}")
-            error_response = self._get_error_response()
             if not should_use_cache:
-                self._save_game_data(game_id, error_response)
-            return error_response
+                self._record_failure(game_id, 'retryable')
+            return self._get_error_response()
 
-    def _parse_game_data(self, soup: BeautifulSoup, game_id: int, scrape_variants: bool) -> Dict:
+    def _parse_game_data(self, soup: BeautifulSoup, game_id: int, scrape_variants: bool) -> GameRecord:
         """Parse the game data from BeautifulSoup object"""
         results = {
             'success': True,
@@ -280,7 +512,7 @@ class PriceChartingScraper:
         if 'variant_name' in results and results['variant_name']:
             results['combined_name'] = f"{results['product_name']} ({results['variant_name']})"
         
-        return results
+        return GameRecord.from_dict(results)
 
     def _parse_product_name(self, soup: BeautifulSoup, results: Dict):
         """Parse the product name from the page"""
@@ -384,14 +616,44 @@ class PriceChartingScraper:
     def _get_initialized_prices(self) -> Dict:
         return {price_type: None for price_type in self.PRICE_TYPE_MAP.values()}
 
-    def _get_error_response(self) -> Dict:
-        return {
-            'success': False,
-            'image_url': None,
-            'pricecharting_url': None,
-            'prices': {},
-            'details': {}
-        }
+    @staticmethod
+    def _classify_status(status_code: int) -> str:
+        """Failure kind of a non-200 product page response"""
+        if status_code in (404, 410):
+            return 'permanent'
+        if status_code in (403, 429):
+            return 'throttled'
+        return 'retryable'
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> Optional[float]:
+        """Seconds from a Retry-After header, HTTP dates are left to the default TTL"""
+        value = response.headers.get('Retry-After', '').strip()
+        return float(value) if value.isdigit() else None
+
+    @property
+    def failures(self) -> FailureCache:
+        """Negative cache, loaded on the first cache miss"""
+        if self._failures is None:
+            from .failure_cache import FailureCache
+            ttls = self.config.get('negative_cache', 'ttls', default={}) or {}
+            self._failures = FailureCache(
+                Path(self.config.get('negative_cache', 'file', default='./json/failures.npy')),
+                {kind: tuple(ttl) for kind, ttl in ttls.items()}
+            )
+        return self._failures
+
+    def _record_failure(self, game_id: int, kind: str, retry_after: Optional[float] = None) -> None:
+        """Negative-cache a failed product request instead of caching an error record"""
+        retry_at = self.failures.record(game_id, kind, retry_after)
+        if kind == 'throttled':
+            # The site throttles the client, not the product: hold back every request
+            self.rate_limiter.pause_until(time.time() + retry_after if retry_after is not None else retry_at)
+        metrics.count('errors', stage='scrape')
+        metrics.count('failures', kind=kind)
+
+    def _get_error_response(self) -> GameRecord:
+        return GameRecord.error()
 
     def _propercase(self, text: str) -> str:
         """Convert text to proper case, respecting common title formatting rules"""
@@ -0,0 +1,79 @@
+"""Persistent PriceCharting URL to ID resolution cache"""
+
+import csv
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from .record_store import iter_record_files, read_record_file
+
+class UrlIdCache:
+    """
+    Maps game URLs (slug or canonical) to PriceCharting IDs
+
+    Entries live in an append-only tab separated file, so recording a newly
+    resolved URL is a single line write no matter how large the map grows.
+    """
+
+    def __init__(self, cache_file: Path):
+        self.cache_file = Path(cache_file)
+        self.ids: Dict[str, int] = {}
+        if self.cache_file.exists():
+            self._load()
+
+    @staticmethod
+    def normalize(url: str) -> str:
+        """Reduce a URL to its lowercase /game/... path, the key used in the map"""
+        url = url.strip()
+        if url.startswith('www.'):
+            url = 'https://' + url
+        elif not url.startswith(('http://', 'https://')):
+            url = 'https://www.pricecharting.com/' + url.lstrip('/')
+        return urlsplit(url).path.rstrip('/').lower()
+
+    def _load(self):
+        with open(self.cache_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                key, _, game_id = line.rstrip('\n').partition('\t')
+                if key and game_id.isdigit():
+                    self.ids[key] = int(game_id)
+
+    def get(self, url: str) -> Optional[int]:
+        return self.ids.get(self.normalize(url))
+
+    def put(self, url: str, game_id: int) -> None:
+        """Record a resolved URL, persisting it only if it is new or changed"""
+        if not url:
+            return
+        key = self.normalize(url)
+        if not key.startswith('/game/') or self.ids.get(key) == game_id:
+            return
+        self.ids[key] = game_id
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.cache_file, 'a', encoding='utf-8') as f:
+            f.write(f"{key}\t{game_id}\n")
+
+    def seed_from_json_cache(self, json_dir: Path) -> int:
+        """Add the pricecharting_url of every cached <id> record, creating the cache file"""
+        before = len(self.ids)
+        for game_id, file_path in iter_record_files(json_dir):
+            try:
+                url = read_record_file(file_path).get('pricecharting_url')
+            except (ValueError, OSError):
+                continue
+            if url:
+                self.put(url, game_id)
+        if json_dir.is_dir():
+            # Even empty, the file marks the cache as seeded so later runs don't scan again
+            self.cache_file.touch()
+        return len(self.ids) - before
+
+    def seed_from_products_csv(self, csv_file: str) -> int:
+        """Add pricecharting_url/pricecharting_id pairs from a CSV export of the products table"""
+        before = len(self.ids)
+        with open(csv_file, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                url = row.get('pricecharting_url')
+                game_id = row.get('pricecharting_id') or ''
+                if url and game_id.isdigit():
+                    self.put(url, int(game_id))
+        return len(self.ids) - before
@@ -2,38 +2,46 @@
 
 import sys
 import io
-import requests
 from pathlib import Path
-from PIL import Image
+from ..metrics import metrics
 
 def download_image(url: str, game_id: int, output_dir: Path, headers: dict) -> bool:
     """Download image from URL and save it as WebP"""
     if not url:
         return False
+
+    # Imported here so runs without image downloads don't load requests and Pillow
+    import requests
+    from PIL import Image
         
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        with metrics.timer('image_download'):
+            response = requests.get(url, headers=headers, timeout=10)
+        metrics.count('image_responses', status=response.status_code)
         if response.status_code != 200:
             print(f"Failed to download image for game {game_id}: HTTP {response.status_code}", file=sys.stderr)
+            metrics.count('errors', stage='image')
             return False
             
-        # Load image from response content
-        image = Image.open(io.BytesIO(response.content))
-        
-        # Convert to RGB if needed (WebP doesn't support RGBA)
-        if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'P':
-                image = image.convert('RGBA')
-            background.paste(image, mask=image.split()[-1])
-            image = background
-        
-        # Save as WebP
-        image_path = output_dir / f"{game_id}.webp"
-        image.save(str(image_path), 'WEBP', quality=90)
+        with metrics.timer('image_transcode'):
+            # Load image from response content
+            image = Image.open(io.BytesIO(response.content))
+            
+            # Convert to RGB if needed (WebP doesn't support RGBA)
+            if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                if image.mode == 'P':
+                    image = image.convert('RGBA')
+                background.paste(image, mask=image.split()[-1])
+                image = background
+            
+            # Save as WebP
+            image_path = output_dir / f"{game_id}.webp"
+            image.save(str(image_path), 'WEBP', quality=90)
         print(f"Saved image: {image_path}")
         return True
         
     except Exception as e:
         print(f"Error downloading/converting image for game {game_id}: {e}", file=sys.stderr)
+        metrics.count('errors', stage='image')
         return False 
\ No newline at end of file
@@ -1,9 +1,11 @@
 """Validation utilities for the scraper"""
 
-from typing import Optional
-from bs4 import BeautifulSoup
+from typing import TYPE_CHECKING, Optional
 import re
 
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
 def clean_price(price_str: str) -> Optional[float]:
     """
     Convert price string to float, handling various formats and invalid values
@@ -23,7 +25,7 @@ def clean_price(price_str: str) -> Optional[float]:
     except (ValueError, AttributeError):
         return None
 
-def validate_page(soup: BeautifulSoup, expected_id: int) -> bool:
+def validate_page(soup: 'BeautifulSoup', expected_id: int) -> bool:
     """
     Validate that the page contains the expected game ID
     
@@ -0,0 +1,299 @@
+"""Lease-based crawl queue shared by the workers of a sharded crawl"""
+
+import json
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+from .metrics import metrics
+
+class LeaseLost(Exception):
+    """The worker's lease on a shard expired and the shard went to another worker"""
+
+class BudgetExhausted(Exception):
+    """The crawl's request budget is spent"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    id INTEGER PRIMARY KEY,
+    state TEXT NOT NULL DEFAULT 'queued',  -- queued, leased or done
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,  -- product ID
+    shard INTEGER NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,  -- 1 scraped, -1 failed
+    worker TEXT
+);
+CREATE INDEX IF NOT EXISTS items_shard ON items (shard, done);
+CREATE INDEX IF NOT EXISTS shards_state ON shards (state, lease_expires);
+CREATE TABLE IF NOT EXISTS workers (
+    name TEXT PRIMARY KEY,
+    heartbeat REAL,
+    done INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS politeness (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    next_slot REAL NOT NULL DEFAULT 0,  -- earliest start of the next request of any worker
+    paused_until REAL NOT NULL DEFAULT 0,
+    delay REAL NOT NULL,
+    variant_delay REAL NOT NULL,
+    jitter_min REAL NOT NULL,
+    jitter_max REAL NOT NULL,
+    spent INTEGER NOT NULL DEFAULT 0,
+    budget INTEGER  -- NULL for no limit
+);
+"""
+
+class SQLiteLeaseQueue:
+    """
+    Shards of product IDs leased to workers through a SQLite file
+
+    A lease lasts lease_seconds and is extended by heartbeats; shards of
+    workers that stop heartbeating are queued again on the next lease call,
+    without the items already done. Every request of every worker takes a
+    slot from the single politeness row, so the configured delay and jitter
+    hold for the crawl as a whole and the budget is never exceeded. Safe for
+    any number of processes on one machine; remote workers reach the queue
+    through make_queue_server().
+    """
+
+    def __init__(self, path: Path, lease_seconds: float = 120):
+        self.path = Path(path)
+        self.lease_seconds = lease_seconds
+        self.local = threading.local()  # One connection per thread
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self.local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # IMMEDIATE takes the write lock up front, so read-then-update steps never interleave
+        db = self._connection()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def init(self, ids: Iterable[int], shard_size: int, delay: float, variant_delay: float,
+             jitter: Tuple[float, float], budget: Optional[int]) -> int:
+        """Queue the IDs (skipping queued ones) in shards of shard_size and set the politeness budget"""
+        with self._transaction() as db:
+            shard = db.execute('SELECT COALESCE(MAX(id), 0) FROM shards').fetchone()[0]
+            existing = {row[0] for row in db.execute('SELECT id FROM items')}
+            batch = []
+            added = 0
+            for game_id in ids:
+                if game_id in existing:
+                    continue
+                existing.add(game_id)
+                if added % shard_size == 0:
+                    shard += 1
+                    db.execute('INSERT INTO shards (id) VALUES (?)', (shard,))
+                batch.append((game_id, shard))
+                added += 1
+            db.executemany('INSERT INTO items (id, shard) VALUES (?, ?)', batch)
+            db.execute('INSERT OR REPLACE INTO politeness (id, next_slot, paused_until, delay, variant_delay, '
+                       'jitter_min, jitter_max, spent, budget) VALUES (1, 0, 0, ?, ?, ?, ?, '
+                       'COALESCE((SELECT spent FROM politeness WHERE id = 1), 0), ?)',
+                       (delay, variant_delay, jitter[0], jitter[1], budget))
+        return added
+
+    def lease(self, worker: str) -> Optional[Tuple[int, List[int]]]:
+        """(shard, IDs not yet done) of a shard leased to worker, None when nothing is left to lease"""
+        now = time.time()
+        with self._transaction() as db:
+            db.execute('INSERT INTO workers (name, heartbeat) VALUES (?, ?) '
+                       'ON CONFLICT (name) DO UPDATE SET heartbeat = excluded.heartbeat', (worker, now))
+            # Shards of workers that stopped heartbeating go back to the queue
+            db.execute("UPDATE shards SET state = 'queued', worker = NULL WHERE state = 'leased' AND lease_expires < ?", (now,))
+            while True:
+                row = db.execute("SELECT id FROM shards WHERE state = 'queued' ORDER BY attempts, id LIMIT 1").fetchone()
+                if row is None:
+                    return None
+                shard = row[0]
+                ids = [item[0] for item in db.execute('SELECT id FROM items WHERE shard = ? AND done = 0 ORDER BY id', (shard,))]
+                if ids:
+                    db.execute("UPDATE shards SET state = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                               "WHERE id = ?", (worker, now + self.lease_seconds, shard))
+                    return shard, ids
+                db.execute("UPDATE shards SET state = 'done', worker = NULL WHERE id = ?", (shard,))
+
+    def heartbeat(self, worker: str) -> int:
+        """Extend the worker's leases, returns how many it still holds"""
+        now = time.time()
+        with self._transaction() as db:
+            db.execute('UPDATE workers SET heartbeat = ? WHERE name = ?', (now, worker))
+            return db.execute("UPDATE shards SET lease_expires = ? WHERE worker = ? AND state = 'leased'",
+                              (now + self.lease_seconds, worker)).rowcount
+
+    def acquire(self, worker: str, shard: int, is_variant: bool = False) -> float:
+        """
+        Start time of the worker's next request, to be slept until
+
+        Raises LeaseLost when the shard is no longer leased to the worker, and
+        BudgetExhausted when the request budget is spent.
+        """
+        with self._transaction() as db:
+            owner = db.execute("SELECT worker FROM shards WHERE id = ? AND state = 'leased'", (shard,)).fetchone()
+            if owner is None or owner[0] != worker:
+                raise LeaseLost(f"Shard {shard} is no longer leased to {worker}")
+            next_slot, paused_until, delay, variant_delay, jitter_min, jitter_max, spent, budget = db.execute(
+                'SELECT next_slot, paused_until, delay, variant_delay, jitter_min, jitter_max, spent, budget '
+                'FROM politeness WHERE id = 1').fetchone()
+            if budget is not None and spent >= budget:
+                raise BudgetExhausted(f"Request budget of {budget} spent")
+            slot = max(time.time(), next_slot, paused_until)
+            interval = (variant_delay if is_variant else delay) + random.uniform(jitter_min, jitter_max)
+            db.execute('UPDATE politeness SET next_slot = ?, spent = spent + 1 WHERE id = 1', (slot + interval,))
+            return slot
+
+    def pause_until(self, timestamp: float):
+        """Hold back every worker's requests, e.g. after a 429 with Retry-After"""
+        with self._transaction() as db:
+            db.execute('UPDATE politeness SET paused_until = MAX(paused_until, ?) WHERE id = 1', (timestamp,))
+
+    def item_done(self, worker: str, game_id: int, success: bool):
+        with self._transaction() as db:
+            db.execute('UPDATE items SET done = ?, worker = ? WHERE id = ?', (1 if success else -1, worker, game_id))
+            db.execute(f"UPDATE workers SET {'done' if success else 'failed'} = {'done' if success else 'failed'} + 1 "
+                       "WHERE name = ?", (worker,))
+
+    def complete(self, worker: str, shard: int) -> bool:
+        """Mark the worker's shard done, False if the lease was lost meanwhile"""
+        with self._transaction() as db:
+            return db.execute("UPDATE shards SET state = 'done', worker = NULL WHERE id = ? AND worker = ? AND state = 'leased'",
+                              (shard, worker)).rowcount == 1
+
+    def release(self, worker: str, shard: int):
+        """Give a shard back without finishing it, e.g. when the worker stops"""
+        with self._transaction() as db:
+            db.execute("UPDATE shards SET state = 'queued', worker = NULL WHERE id = ? AND worker = ? AND state = 'leased'",
+                       (shard, worker))
+
+    def stats(self) -> Dict:
+        db = self._connection()
+        shards = dict(db.execute('SELECT state, COUNT(*) FROM shards GROUP BY state').fetchall())
+        items = dict(db.execute('SELECT done, COUNT(*) FROM items GROUP BY done').fetchall())
+        politeness = db.execute('SELECT spent, budget FROM politeness WHERE id = 1').fetchone() or (0, None)
+        alive_after = time.time() - self.lease_seconds
+        workers = db.execute('SELECT name, heartbeat, done, failed FROM workers ORDER BY name').fetchall()
+        return {
+            'shards': {state: shards.get(state, 0) for state in ('queued', 'leased', 'done')},
+            'items': {'pending': items.get(0, 0), 'done': items.get(1, 0), 'failed': items.get(-1, 0)},
+            'requests': {'spent': politeness[0], 'budget': politeness[1]},
+            'workers': [{'name': name, 'alive': heartbeat >= alive_after, 'done': done, 'failed': failed}
+                        for name, heartbeat, done, failed in workers]
+        }
+
+    def finished(self) -> bool:
+        """True when every item is done or the budget is spent"""
+        stats = self.stats()
+        budget = stats['requests']['budget']
+        return stats['items']['pending'] == 0 or (budget is not None and stats['requests']['spent'] >= budget)
+
+# Queue methods remote workers may call, and the exceptions carried over HTTP
+REMOTE_METHODS = ('lease', 'heartbeat', 'acquire', 'pause_until', 'item_done', 'complete', 'release', 'stats', 'finished')
+REMOTE_ERRORS = {'LeaseLost': LeaseLost, 'BudgetExhausted': BudgetExhausted}
+
+class QueueHandler(BaseHTTPRequestHandler):
+    """POST /<method> with the keyword arguments as a JSON object, answers {"result": ...} or {"error": ...}"""
+
+    queue: SQLiteLeaseQueue = None
+
+    def do_POST(self):
+        method = self.path.strip('/')
+        if method not in REMOTE_METHODS:
+            self._send(404, {'error': 'NotFound', 'message': f"Unknown method {method}"})
+            return
+        try:
+            kwargs = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            self._send(200, {'result': getattr(self.queue, method)(**kwargs)})
+        except (LeaseLost, BudgetExhausted) as e:
+            self._send(409, {'error': type(e).__name__, 'message': str(e)})
+        except (TypeError, ValueError) as e:
+            self._send(400, {'error': 'BadRequest', 'message': str(e)})
+
+    def _send(self, status: int, payload: Dict):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def make_queue_server(queue: SQLiteLeaseQueue, listen: str) -> ThreadingHTTPServer:
+    """Serve the queue to workers on other machines on host:port"""
+    handler = type('Handler', (QueueHandler,), {'queue': queue})
+    host, _, port = listen.rpartition(':')
+    server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), handler)
+    server.daemon_threads = True
+    return server
+
+class HttpLeaseQueue:
+    """Client of a queue served by make_queue_server(), with the same methods as SQLiteLeaseQueue"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip('/')
+
+    def __getattr__(self, method: str):
+        if method not in REMOTE_METHODS:
+            raise AttributeError(method)
+
+        def call(**kwargs):
+            request = Request(f"{self.url}/{method}", data=json.dumps(kwargs).encode('utf-8'),
+                              headers={'Content-Type': 'application/json'})
+            try:
+                with urlopen(request, timeout=60) as response:
+                    return json.load(response)['result']
+            except HTTPError as e:
+                error = json.load(e)
+                raise REMOTE_ERRORS.get(error['error'], ValueError)(error['message'])
+
+        return call
+
+def open_queue(spec: str, lease_seconds: float = 120):
+    """A coordinator URL (http://host:port) or the path of a local SQLite queue file"""
+    if spec.startswith(('http://', 'https://')):
+        return HttpLeaseQueue(spec)
+    return SQLiteLeaseQueue(Path(spec), lease_seconds)
+
+class SharedRateLimiter:
+    """Drop-in for RateLimiter that takes every request slot from the crawl queue"""
+
+    def __init__(self, queue, worker: str):
+        self.queue = queue
+        self.worker = worker
+        self.shard: Optional[int] = None  # Set by the worker for each leased shard
+
+    def wait(self, is_variant: bool = False):
+        slot = self.queue.acquire(worker=self.worker, shard=self.shard, is_variant=is_variant)
+        delay = max(slot - time.time(), 0.0)
+        if delay:
+            time.sleep(delay)
+        metrics.observe('rate_limit_wait', delay)
+
+    def pause_until(self, timestamp: float):
+        self.queue.pause_until(timestamp=timestamp)